@@ -0,0 +1,42 @@
+"""
+Benchmark DiffPointing: wall time per alert at several nside values.
+
+The first alert at each nside includes building the ICRS-to-GCRS
+pixel map in CelestialPixels, so it is reported separately from the
+mean over the following alerts (which reuse the cached map).
+"""
+import argparse, time
+import numpy as np
+from snewpdag.plugins import DiffPointing
+
+def make_dts(t):
+  return { ('IC','SK'): { 'dt': 0.011, 't1': t, 't2': t - 0.011 },
+           ('SK','JUNO'): { 'dt': -0.004, 't1': t - 0.011, 't2': t - 0.007 },
+           ('KM3','IC'): { 'dt': 0.021, 't1': t + 0.021, 't2': t },
+         }
+
+def run():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--nside', type=int, nargs='+', default=[16, 32, 64, 128])
+  parser.add_argument('-n', '--number', type=int, default=10,
+                      help='number of alerts per nside')
+  parser.add_argument('--chunk', type=int, default=None,
+                      help='DiffPointing chunk_size')
+  parser.add_argument('--detectors', default='snewpdag/data/detector_location.csv')
+  args = parser.parse_args()
+
+  t = 1600000000.0
+  print('{:>6} {:>9} {:>12} {:>12}'.format('nside', 'npix', 'first [s]', 'mean [s]'))
+  for nside in args.nside:
+    node = DiffPointing(args.detectors, nside, 3, chunk_size=args.chunk,
+                        name='DiffPointing')
+    ts = []
+    for i in range(args.number + 1):
+      t0 = time.perf_counter()
+      node.alert({ 'action': 'alert', 'dts': make_dts(t) })
+      ts.append(time.perf_counter() - t0)
+    print('{:>6} {:>9} {:>12.4f} {:>12.4f}'.format(nside, node.npix,
+          ts[0], np.mean(ts[1:]) if len(ts) > 1 else ts[0]))
+
+if __name__ == '__main__':
+  run()
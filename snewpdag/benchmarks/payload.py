@@ -0,0 +1,78 @@
+"""
+Benchmark payload passing: alerts per second through
+  chain:  a chain of nodes, every few of which add a field to the payload
+  fanout:  one node notifying many observers
+The injected payload has a number of fields (--fields), as the alert
+messages and generated truth information do.
+"""
+import argparse, time
+from snewpdag.dag import Node
+
+class Writer(Node):
+  """
+  Node which adds one field to the payload.
+  """
+  def alert(self, data):
+    data[self.name] = 1.0
+    return True
+
+def chain(n, every):
+  nodes = [ Writer(name='n{}'.format(i)) if every > 0 and i % every == 0
+            else Node(name='n{}'.format(i)) for i in range(n) ]
+  for i in range(1, n):
+    nodes[i-1].attach(nodes[i])
+  return nodes[0], nodes[-1]
+
+def fanout(n):
+  src = Node(name='src')
+  leaves = [ Node(name='leaf{}'.format(i)) for i in range(n) ]
+  for leaf in leaves:
+    src.attach(leaf)
+  return src, leaves[-1]
+
+def rate(head, nfields, duration, repeat):
+  """
+  Best rate over several runs, since other load on the machine
+  only ever slows things down.
+  """
+  payload = { 'field{}'.format(i): float(i) for i in range(nfields) }
+  payload['action'] = 'alert'
+  best = 0.0
+  for r in range(repeat):
+    count = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < duration / repeat:
+      for i in range(10):
+        head.update(payload)
+      count += 10
+    best = max(best, count / (time.perf_counter() - t0))
+  return best
+
+def run():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--length', type=int, default=50,
+                      help='number of nodes in the chain')
+  parser.add_argument('--every', type=int, default=5,
+                      help='every n-th node in the chain writes a field')
+  parser.add_argument('--width', type=int, default=200,
+                      help='number of observers in the fan-out')
+  parser.add_argument('--fields', type=int, default=20,
+                      help='number of fields in the injected payload')
+  parser.add_argument('--duration', type=float, default=2.0,
+                      help='seconds per measurement')
+  parser.add_argument('--repeat', type=int, default=5,
+                      help='runs per measurement (best is reported)')
+  args = parser.parse_args()
+
+  head, tail = chain(args.length, args.every)
+  r = rate(head, args.fields, args.duration, args.repeat)
+  print('chain of {} ({} writers): {:.0f} alerts/s, history length {}'.format(
+        args.length, args.length // args.every if args.every > 0 else 0,
+        r, len(tail.last_data['history'].emit())))
+  head, tail = fanout(args.width)
+  r = rate(head, args.fields, args.duration, args.repeat)
+  print('fan-out to {}: {:.0f} alerts/s'.format(args.width, r))
+
+if __name__ == '__main__':
+  run()
+
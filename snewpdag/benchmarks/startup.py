@@ -0,0 +1,118 @@
+"""
+Benchmark cold start: time from launching python to the end of the first
+alert, for each configuration shipped in snewpdag/data.
+
+Each configuration runs in a fresh interpreter, which imports the app,
+configures the DAG, and injects one alert into the Control node (or the
+first node if there is none).  The time is split into
+  import:  interpreter start-up and importing snewpdag.dag.app
+  config:  configure(), which imports the plugins the DAG uses
+  alert:  the first alert through the DAG
+The alert runs in a scratch directory, so renderer output doesn't land
+in output/.  Files which aren't DAG configurations (or can't be
+configured here) are listed at the end.  --eager imports every plugin
+before configuring, for comparison with loading plugins on first use.
+"""
+import argparse, glob, json, os, subprocess, sys, time
+
+CHILD = '''
+import sys, os, time, json, ast, logging, tempfile, shutil, atexit
+t_launch = float(sys.argv[1])
+config = sys.argv[2]
+eager = sys.argv[3] == '1'
+sys.argv = [ 'snewpdag', config ]
+logging.disable(logging.CRITICAL)
+from snewpdag.dag import app, Node
+if eager:
+  import importlib
+  for p in [ 'snewpdag.plugins', 'snewpdag.plugins.gen',
+             'snewpdag.plugins.ops', 'snewpdag.plugins.renderers' ]:
+    m = importlib.import_module(p)
+    for name in m.__all__:
+      getattr(m, name)
+import numpy as np
+t_import = time.time()
+result = { 'import': t_import - t_launch }
+Node.rng = np.random.default_rng(0)
+try:
+  with open(config) as f:
+    if config.endswith('.csv'):
+      specs = app.csv_eval(f)
+    else:
+      specs = ast.literal_eval(f.read())
+  if not isinstance(specs, list) or len(specs) == 0 or \\
+     not all([ isinstance(s, dict) and 'class' in s for s in specs ]):
+    raise ValueError('not a configuration')
+  nodes = app.configure(specs)
+  if nodes == None:
+    raise ValueError('configure failed')
+  t_config = time.time()
+  scratch = tempfile.mkdtemp()
+  atexit.register(shutil.rmtree, scratch, True)
+  os.mkdir(os.path.join(scratch, 'output'))
+  os.symlink(os.path.abspath('snewpdag'), os.path.join(scratch, 'snewpdag'))
+  os.chdir(scratch)
+  name = 'Control' if 'Control' in nodes else specs[0]['name']
+  nodes[name].update({ 'action': 'alert', 'name': name, 'burst_id': 0 })
+  t_alert = time.time()
+  result.update({ 'config': t_config - t_import, 'alert': t_alert - t_config,
+                  'total': t_alert - t_launch })
+except SystemExit:
+  result['error'] = 'exit'
+except Exception as e:
+  result['error'] = '{}: {}'.format(type(e).__name__, e)
+print(json.dumps(result))
+'''
+
+def run_one(config, eager, timeout):
+  t_launch = time.time()
+  try:
+    p = subprocess.run([ sys.executable, '-c', CHILD, repr(t_launch), config,
+                         '1' if eager else '0' ],
+                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                       text=True, timeout=timeout)
+  except subprocess.TimeoutExpired:
+    return { 'error': 'timed out after {} s'.format(timeout) }
+  lines = p.stdout.strip().split('\n')
+  try:
+    return json.loads(lines[-1])
+  except ValueError:
+    return { 'error': 'exit status {}'.format(p.returncode) }
+
+def run():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('configs', nargs='*',
+                      help='configuration files (default all in snewpdag/data)')
+  parser.add_argument('--eager', action='store_true',
+                      help='import all plugins before configuring')
+  parser.add_argument('--timeout', type=float, default=60.0,
+                      help='maximum time per configuration (s)')
+  args = parser.parse_args()
+
+  configs = args.configs
+  if len(configs) == 0:
+    configs = sorted([ f for x in ('csv', 'json', 'py')
+                       for f in glob.glob('snewpdag/data/*.' + x) ])
+
+  print('{:<40} {:>8} {:>8} {:>8} {:>8}'.format('config', 'import',
+        'config', 'alert', 'total'))
+  failed = []
+  totals = []
+  for config in configs:
+    r = run_one(config, args.eager, args.timeout)
+    if 'error' in r:
+      failed.append((config, r['error']))
+      continue
+    totals.append(r['total'])
+    print('{:<40} {:>8.3f} {:>8.3f} {:>8.3f} {:>8.3f}'.format(
+          os.path.basename(config), r['import'], r['config'], r['alert'],
+          r['total']))
+  if len(totals) > 0:
+    print('{} configurations, median time to first alert {:.3f} s'.format(
+          len(totals), sorted(totals)[len(totals) // 2]))
+  for config, err in failed:
+    print('skipped {}: {}'.format(os.path.basename(config), err))
+
+if __name__ == '__main__':
+  run()
+
@@ -0,0 +1,87 @@
+"""
+Benchmark MC trials per second through a small generator DAG:
+  GenPoint -> SmearTimes -> Accumulator (smeared times)
+  GenPoint -> Histogram1D (pair time differences)
+  NewTimeSeries -> Uniform -> Accumulator (background series)
+in three modes:
+  jsonlines:  each trial serialized and parsed, as when piping
+              trials/Simple.py into the application
+  trials:  SimpleTrials.trials(), one trial per alert
+  batch:  SimpleTrials.trials() with batches of --batch trials
+  farm:  FarmTrials.farm() on --workers processes, one trial per alert
+"""
+import argparse, json, sys, time
+
+def spec():
+  dl = 'snewpdag/data/detector_location.csv'
+  return [
+    { 'name': 'Control', 'class': 'Pass', 'kwargs': { 'line': 0 } },
+    { 'name': 'Gen', 'class': 'gen.GenPoint', 'observe': [ 'Control' ],
+      'kwargs': { 'detector_location': dl, 'ra': -60.0, 'dec': -30.0,
+                  'time': '2021-11-01 05:22:36.328',
+                  'pair_list': [ ('IC', 'JUNO'), ('HK', 'KM3') ] } },
+    { 'name': 'Smear', 'class': 'gen.SmearTimes', 'observe': [ 'Gen' ],
+      'kwargs': { 'detector_location': dl } },
+    { 'name': 'Times', 'class': 'Accumulator', 'observe': [ 'Smear' ],
+      'kwargs': { 'title': 'IC', 'clear_on': [],
+                  'in_field': ('observed', 'dets', 'IC', 'neutrino_time') } },
+    { 'name': 'Dt', 'class': 'Histogram1D', 'observe': [ 'Gen' ],
+      'kwargs': { 'nbins': 100, 'xlow': -0.1, 'xhigh': 0.1, 'in_field': 'dts',
+                  'in_index': ('IC', 'JUNO'), 'in_index2': 'dt' } },
+    { 'name': 'New', 'class': 'ops.NewTimeSeries', 'observe': [ 'Control' ],
+      'kwargs': { 'out_field': 'bg' } },
+    { 'name': 'Bg', 'class': 'gen.Uniform', 'observe': [ 'New' ],
+      'kwargs': { 'field': 'bg', 'rate': 100.0, 'tmin': 0.0, 'tmax': 1.0 } },
+    { 'name': 'Series', 'class': 'Accumulator', 'observe': [ 'Bg' ],
+      'kwargs': { 'title': 'bg', 'in_field': 'bg', 'clear_on': [] } },
+  ]
+
+def run_jsonlines(s, n):
+  from snewpdag.dag.app import configure, inject
+  dags = {}
+  lines = []
+  for i in range(n):
+    lines.append(json.dumps({ 'action': 'alert', 'burst_id': 0,
+                              'trial_id': i, 'name': 'Control' }))
+    lines.append(json.dumps({ 'action': 'reset', 'burst_id': 0,
+                              'trial_id': i, 'name': 'Control' }))
+  lines.append(json.dumps({ 'action': 'report', 'burst_id': 0,
+                            'name': 'Control' }))
+  for line in lines:
+    inject(dags, json.loads(line), s)
+  return dags[0]
+
+def run():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('-n', '--number', type=int, default=2000,
+                      help='number of trials')
+  parser.add_argument('--batch', type=int, default=1000,
+                      help='trials per alert in batch mode')
+  parser.add_argument('--workers', type=int, default=4,
+                      help='number of processes in farm mode')
+  parser.add_argument('--modes', nargs='+',
+                      default=[ 'jsonlines', 'trials', 'batch', 'farm' ])
+  args = parser.parse_args()
+
+  sys.argv = [ 'snewpdag', 'benchmark' ] # app parses arguments on import
+  from snewpdag.trials.SimpleTrials import trials
+  from snewpdag.trials.FarmTrials import farm
+  s = spec()
+  trials(s, 1, seed=0) # load detector tables, plugins etc.
+
+  for mode in args.modes:
+    t0 = time.perf_counter()
+    if mode == 'jsonlines':
+      dag = run_jsonlines(s, args.number)
+    elif mode == 'trials':
+      dag = trials(s, args.number, seed=1)
+    elif mode == 'batch':
+      dag = trials(s, args.number, seed=1, batch=args.batch)
+    else:
+      dag = farm(s, args.number, seed=1, workers=args.workers)
+    dt = time.perf_counter() - t0
+    print('{:<10} {:>8.0f} trials/s  (dt histogram count {}, mean {:.5f})'.format(
+          mode, args.number / dt, dag['Dt'].count, dag['Dt'].mean()))
+
+if __name__ == '__main__':
+  run()
@@ -0,0 +1,88 @@
+"""
+AdaptiveMap - coarse-to-fine evaluation of a chi2-like skymap
+
+Only the region near the minimum matters for confidence regions,
+so rather than evaluating every pixel at the target resolution,
+  1. evaluate all pixels at a coarse nside,
+  2. keep the pixels within margin of the minimum (plus their neighbours),
+  3. evaluate their four nested children at twice the nside,
+and repeat until the target nside is reached.
+Pixels which weren't refined keep their coarse value.
+
+The evaluation function is func(nside, ipix) -> values, where ipix
+are nested pixel indices at that nside.
+
+To use,
+  am = AdaptiveMap(nside, coarse_nside, margin)
+  m = am.evaluate(func) # full nested map at nside
+  uniq, values = am.moc() # multi-order map (NUNIQ pixel indices)
+"""
+import logging
+import numpy as np
+import healpy as hp
+
+class AdaptiveMap:
+
+  def __init__(self, nside, coarse_nside, margin, neighbours=True):
+    """
+    nside:  target healpix resolution
+    coarse_nside:  resolution of the first pass
+    margin:  refine pixels with value - minimum <= margin
+    neighbours:  also refine the neighbours of those pixels (default True)
+    """
+    if coarse_nside > nside or nside % coarse_nside != 0 or \
+       not hp.isnsideok(nside, nest=True) or \
+       not hp.isnsideok(coarse_nside, nest=True):
+      raise ValueError('AdaptiveMap: cannot refine nside {} to {}'.format(
+                       coarse_nside, nside))
+    self.nside = nside
+    self.coarse_nside = coarse_nside
+    self.margin = margin
+    self.neighbours = neighbours
+    self.leaves = [] # [ (nside, ipix, values) ] of unrefined pixels
+    self.nevals = 0 # number of pixel evaluations
+
+  def evaluate(self, func):
+    """
+    Evaluate func coarse-to-fine. Returns full nested map at nside.
+    """
+    self.leaves = []
+    nside = self.coarse_nside
+    ipix = np.arange(hp.nside2npix(nside))
+    vals = np.asarray(func(nside, ipix), dtype=np.float64)
+    self.nevals = len(ipix)
+    while nside < self.nside:
+      sel = vals - np.min(vals) <= self.margin
+      if self.neighbours:
+        nb = hp.get_all_neighbours(nside, ipix[sel], nest=True).ravel()
+        sel |= np.isin(ipix, nb[nb >= 0])
+      self.leaves.append((nside, ipix[~sel], vals[~sel]))
+      ipix = (4 * ipix[sel][:,np.newaxis] + np.arange(4)).ravel()
+      nside *= 2
+      vals = np.asarray(func(nside, ipix), dtype=np.float64)
+      self.nevals += len(ipix)
+      logging.debug('AdaptiveMap: nside {}, {} pixels'.format(nside, len(ipix)))
+    self.leaves.append((nside, ipix, vals))
+    return self.full_map()
+
+  def full_map(self):
+    """
+    Expand the unrefined pixels to the target nside.
+    """
+    m = np.empty(hp.nside2npix(self.nside))
+    for nside, ipix, vals in self.leaves:
+      f = (self.nside // nside)**2 # target pixels per pixel
+      idx = (f * ipix[:,np.newaxis] + np.arange(f)).ravel()
+      m[idx] = np.repeat(vals, f)
+    return m
+
+  def moc(self):
+    """
+    Multi-order map: returns (uniq, values), where uniq = 4*nside^2 + ipix
+    identifies each pixel at its own resolution.
+    """
+    uniq = np.concatenate([ 4 * nside * nside + ipix
+                            for nside, ipix, vals in self.leaves ])
+    vals = np.concatenate([ vals for nside, ipix, vals in self.leaves ])
+    return uniq, vals
+
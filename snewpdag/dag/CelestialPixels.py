@@ -5,27 +5,60 @@ to use, just instantiate and call get_map().
 If the same (nside,time) is requested, where time is a Unix timestamp to
 integer precision (any fractional part is lopped off), then this will
 just return one that was created before.
+
+Maps are kept in a least-recently-used cache shared by all instances.
+It holds at most CelestialPixels.max_maps maps and, if max_bytes is set,
+at most that many bytes of maps.  hits and misses count lookups.
+Lookups hold a lock, so nodes in different threads can share the cache.
+
+By default (fast = True) a new map is made from a cached array of ICRS
+pixel directions for each nside, by applying the light deflection and
+aberration for the time tag, which only need one ephemeris lookup.
+(GCRS axes are aligned with ICRS, so these are the only differences for
+directions to distant sources.)  This agrees with the full astropy
+transformation to 1e-14 rad, except for directions behind the disk of
+the Sun, where the light deflection is modelled differently (up to
+3e-7 rad apart).  Set fast = False to use astropy.
 """
 import logging
+import threading
 import numpy as np
 import healpy as hp
+import erfa
+from collections import OrderedDict
 from astropy import units as u
 from astropy.time import Time
 from astropy.coordinates import GCRS, SkyCoord, CartesianRepresentation
 
 class CelestialPixels:
 
-  maps = {}
+  maps = OrderedDict() # { (nside, time_tag): rs }, least recent first
+  icrs = {} # { nside: ICRS unit vectors, shape (npix,3) }
+  max_maps = 32 # maximum number of cached maps
+  max_bytes = None # maximum total size of cached maps, None for no limit
+  fast = True # apply aberration to cached ICRS vectors instead of astropy
+  hits = 0
+  misses = 0
+  lock = threading.RLock()
 
   def __init__(self):
     pass
 
   def delete_all_maps(self):
-    CelestialPixels.maps = {}
+    CelestialPixels.maps = OrderedDict()
 
   def list_maps(self):
     return CelestialPixels.maps.keys()
 
+  def stats(self):
+    """
+    Return cache statistics as a dictionary.
+    """
+    return { 'maps': len(CelestialPixels.maps),
+             'bytes': sum([ rs.nbytes for rs in CelestialPixels.maps.values() ]),
+             'hits': CelestialPixels.hits,
+             'misses': CelestialPixels.misses }
+
   def get_map(self, nside, time):
     """
     Get an array of unit vectors pointing to ICRS skymap pixel centers.
@@ -36,25 +69,111 @@ class CelestialPixels:
     """
     time_tag = int(time)
     tag = (nside, time_tag)
-    if tag in CelestialPixels.maps:
-      return CelestialPixels.maps[tag]
+    with CelestialPixels.lock:
+      if tag in CelestialPixels.maps:
+        CelestialPixels.hits += 1
+        CelestialPixels.maps.move_to_end(tag)
+        return CelestialPixels.maps[tag]
+
+      # need to create a map
+      CelestialPixels.misses += 1
+      if CelestialPixels.fast:
+        rs = self.make_map(nside, time_tag)
+      else:
+        rs = self.transform_map(nside, time_tag)
+      rs.flags.writeable = False
+      CelestialPixels.maps[tag] = rs
+      self.evict()
+      return rs
+
+  def get_pixels(self, nside, time, ipix):
+    """
+    Like get_map(), but only for the nested pixel indices ipix.
+    Returns shape (3,len(ipix)).  If the map isn't cached,
+    only the directions of these pixels are calculated.
+    """
+    ipix = np.asarray(ipix, dtype=np.int64)
+    if len(ipix) == hp.nside2npix(nside):
+      return self.get_map(nside, time)[:,ipix]
+    time_tag = int(time)
+    tag = (nside, time_tag)
+    with CelestialPixels.lock:
+      if tag in CelestialPixels.maps:
+        CelestialPixels.hits += 1
+        CelestialPixels.maps.move_to_end(tag)
+        return CelestialPixels.maps[tag][:,ipix]
+    if CelestialPixels.fast:
+      v = np.transpose(hp.pixelfunc.pix2vec(nside, ipix, nest=True))
+      return self.apparent(v, time_tag)
+    else:
+      return self.transform_map(nside, time_tag, ipix)
+
+  def evict(self):
+    """
+    Drop least recently used maps until the cache is within its limits.
+    The most recent map is always kept.
+    """
+    maps = CelestialPixels.maps
+    nbytes = sum([ rs.nbytes for rs in maps.values() ])
+    while len(maps) > 1 and (len(maps) > CelestialPixels.max_maps or
+          (CelestialPixels.max_bytes != None and
+           nbytes > CelestialPixels.max_bytes)):
+      tag, rs = maps.popitem(last=False)
+      nbytes -= rs.nbytes
+      logging.debug('CelestialPixels: evicted map {}'.format(tag))
 
-    # need to create a map
+  def icrs_vectors(self, nside):
+    """
+    ICRS unit vectors of pixel centers, shape (npix,3).  Cached per nside.
+    """
+    if nside not in CelestialPixels.icrs:
+      v = hp.pixelfunc.pix2vec(nside, np.arange(hp.nside2npix(nside)),
+                               nest=True)
+      v = np.ascontiguousarray(np.transpose(v))
+      v.flags.writeable = False
+      CelestialPixels.icrs[nside] = v
+    return CelestialPixels.icrs[nside]
+
+  def make_map(self, nside, time_tag):
+    """
+    Apply light deflection by the Sun and aberration at the time tag
+    to the ICRS pixel directions.  Returns shape (3,npix).
+    """
+    return self.apparent(self.icrs_vectors(nside), time_tag)
+
+  def apparent(self, v, time_tag):
+    """
+    Apply light deflection and aberration at the time tag
+    to ICRS unit vectors v, shape (n,3).  Returns shape (3,n).
+    """
+    t = Time(time_tag, format='unix').tdb
+    pvh, pvb = erfa.epv00(t.jd1, t.jd2) # Earth heliocentric, barycentric
+    em = np.sqrt(np.sum(pvh['p']**2)) # Sun-Earth distance (au)
+    eh = pvh['p'] / em
+    vb = pvb['v'] / (erfa.CMPS * erfa.DAYSEC / erfa.DAU) # velocity / c
+    bm1 = np.sqrt(1.0 - np.sum(vb**2))
+    p = erfa.ldsun(v, eh, em)
+    p = erfa.ab(p, vb, em, bm1)
+    return np.ascontiguousarray(p.T)
+
+  def transform_map(self, nside, time_tag, ipix=None):
+    """
+    Transform each pixel direction (or those of ipix) to GCRS with astropy.
+    Returns shape (3,npix).
+    """
     t = Time(time_tag, format='unix')
-    npix = hp.nside2npix(nside)
+    if ipix is None:
+      ipix = range(hp.nside2npix(nside))
     # pixel centers in ICRS coordinates.
     # c will an array of lon,lat with shape (2,npix).
-    c = hp.pixelfunc.pix2ang(nside, range(npix), nest=True, lonlat=True)
+    c = hp.pixelfunc.pix2ang(nside, ipix, nest=True, lonlat=True)
     sc = SkyCoord(ra=c[0], dec=c[1], unit=u.deg, frame='icrs', \
                   representation_type='unitspherical', obstime=t)
     gc = sc.transform_to(GCRS)
     # gc is now an array of SkyCoord, but in (ra,dec) in GCRS
     n = gc.represent_as(CartesianRepresentation)
     # n is an array of (x,y,z) unit vectors
-    rs = np.stack( (n.x, n.y, n.z) ) # shape (3,npix)
-    rs.flags.writeable = False
-    CelestialPixels.maps[tag] = rs
-    return rs
+    return np.stack( (n.x.value, n.y.value, n.z.value) ) # shape (3,npix)
 
   def delete_map(self, nside, time):
     time_tag = int(time)
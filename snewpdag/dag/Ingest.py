@@ -0,0 +1,172 @@
+"""
+Ingest - asyncio ingestion of alerts into per-burst DAGs
+
+Messages are read from a source (an async iterator of payloads)
+and routed by burst key to a queue for each burst.  Each queue is
+drained by its own task, which runs the DAG work for one message at a time
+in a thread pool, so the messages of a burst are processed in order,
+while different bursts (e.g., a slow skymap for one coincidence and
+a revoke for another) are processed at the same time.
+
+For every message, the end-to-end latency (from being read to the DAG
+being done with it) is logged, and written as a JSON line to
+a latency file if one is given:
+  key:  burst key
+  action:  payload action
+  queued:  seconds waiting behind earlier messages of the same burst
+  latency:  seconds from being read to being processed
+
+Sources:
+  from_iterable(it):  a blocking iterator (e.g., a hop stream),
+                      read in a separate thread
+  tail(filename):  JSON lines appended to a file
+  listen(host, port):  JSON lines sent to a TCP socket
+"""
+import asyncio
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class Ingest:
+  def __init__(self, key, process, threads=None, latency=None):
+    """
+    key:  function giving the burst key of a payload
+    process:  function to inject a payload into its DAG (called in a thread)
+    threads:  maximum number of bursts processed at once (None for default)
+    latency:  file object for per-message latency records, or None
+    """
+    self.key = key
+    self.process = process
+    self.threads = threads
+    self.latency = latency
+    self.queues = {} # { burst key: asyncio.Queue of (read time, payload) }
+    self.tasks = {} # { burst key: task draining the queue }
+    self.executor = None
+
+  async def run(self, source):
+    """
+    Ingest all the payloads from source, then wait for them to be processed.
+    """
+    self.executor = ThreadPoolExecutor(self.threads)
+    try:
+      async for data in source:
+        self.put(data)
+      while len(self.tasks) > 0:
+        await asyncio.gather(*self.tasks.values())
+    finally:
+      self.executor.shutdown()
+
+  def put(self, data):
+    """
+    Queue a payload for its burst, starting a task to drain the queue
+    if there isn't one already.
+    """
+    k = self.key(data)
+    if k not in self.queues:
+      self.queues[k] = asyncio.Queue()
+      self.tasks[k] = asyncio.ensure_future(self.drain(k))
+    self.queues[k].put_nowait((time.monotonic(), data))
+
+  def busy(self, k):
+    """
+    True if payloads of burst k are queued or being processed.
+    """
+    return k in self.tasks
+
+  async def drain(self, k):
+    loop = asyncio.get_running_loop()
+    q = self.queues[k]
+    try:
+      while not q.empty():
+        t0, data = q.get_nowait()
+        t1 = time.monotonic()
+        try:
+          await loop.run_in_executor(self.executor, self.process, data)
+        except Exception:
+          logging.error('Burst {}: {}'.format(k, sys.exc_info()))
+        self.record(k, data, t0, t1, time.monotonic())
+    finally:
+      # the queue is empty, so the next payload starts a new task
+      del self.queues[k]
+      del self.tasks[k]
+
+  def record(self, k, data, t0, t1, t2):
+    action = data.get('action', None)
+    logging.info('Burst {}: {} latency {:.6f} s (queued {:.6f} s)'.format(
+                 k, action, t2 - t0, t1 - t0))
+    if self.latency != None:
+      self.latency.write(json.dumps({ 'key': str(k), 'action': action,
+                                      'queued': t1 - t0,
+                                      'latency': t2 - t0 }) + '\n')
+      self.latency.flush()
+
+#
+# sources
+#
+
+async def from_iterable(it):
+  """
+  Payloads from a blocking iterator, read in a separate thread
+  so the event loop can carry on while waiting for the next one.
+  """
+  loop = asyncio.get_running_loop()
+  it = iter(it)
+  end = object()
+  with ThreadPoolExecutor(1) as reader:
+    while True:
+      data = await loop.run_in_executor(reader, next, it, end)
+      if data is end:
+        return
+      yield data
+
+def parse(line):
+  try:
+    return json.loads(line)
+  except:
+    logging.error('While parsing json line: {}'.format(sys.exc_info()))
+    return None
+
+async def tail(filename, poll=0.5, follow=True):
+  """
+  Payloads from JSON lines in filename, waiting poll seconds
+  for more to be appended when the end is reached (unless follow is False).
+  """
+  with open(filename, 'r') as f:
+    buf = ''
+    while True:
+      line = f.readline()
+      if line == '':
+        if not follow:
+          return
+        await asyncio.sleep(poll)
+        continue
+      buf += line
+      if not buf.endswith('\n'):
+        continue # partly written line
+      data = parse(buf)
+      buf = ''
+      if data != None:
+        yield data
+
+async def listen(host, port):
+  """
+  Payloads from JSON lines sent by any number of clients to host:port.
+  """
+  q = asyncio.Queue()
+  async def client(reader, writer):
+    while True:
+      line = await reader.readline()
+      if line == b'':
+        break
+      data = parse(line)
+      if data != None:
+        await q.put(data)
+    writer.close()
+  server = await asyncio.start_server(client, host, port)
+  logging.info('Listening on {}'.format(
+               [ s.getsockname() for s in server.sockets ]))
+  async with server:
+    while True:
+      yield await q.get()
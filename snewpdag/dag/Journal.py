@@ -0,0 +1,45 @@
+"""
+Journal - append-only record of messages, one JSON object per line
+
+Each message is appended and flushed as it arrives, so the journal costs
+the same for every message however long it gets, and nothing is lost
+if the application stops.  The file is also synced to disk (fsync)
+every sync seconds, and when it's closed.
+
+A journal can be replayed through the application, e.g.,
+  python -m snewpdag --jsonlines config.py < SNEWS_MSGs/subscribed_messages.jsonl
+"""
+import json
+import os
+import threading
+import time
+
+class Journal:
+  def __init__(self, filename, sync=1.0):
+    """
+    filename:  file to append to (its directory is made if needed)
+    sync:  seconds between syncs to disk (0 to sync every message)
+    """
+    d = os.path.dirname(filename)
+    if d != '':
+      os.makedirs(d, exist_ok=True)
+    self.f = open(filename, 'a')
+    self.sync = sync
+    self.synced = time.monotonic()
+    self.lock = threading.Lock()
+
+  def write(self, message):
+    line = json.dumps(message) + '\n'
+    with self.lock:
+      self.f.write(line)
+      self.f.flush()
+      if time.monotonic() - self.synced >= self.sync:
+        os.fsync(self.f.fileno())
+        self.synced = time.monotonic()
+
+  def close(self):
+    with self.lock:
+      if not self.f.closed:
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
@@ -0,0 +1,72 @@
+"""
+LagScan - histograms of one time series over a scan of shifted windows
+
+The times are sorted once on construction (unless they come from an
+IndexedTimeSeries, which keeps them sorted).  Each window of a scan is then
+binned by looking up its bin edges in the sorted times with searchsorted,
+so a whole lag scan costs one searchsorted over an (nlags, nbins+1) grid
+rather than one np.histogram per lag.
+
+Bin edges and edge handling are the same as np.histogram with a range,
+i.e., bins are [low, high) except for the last one, which is [low, high].
+
+To use,
+  s1 = LagScan(series1) # TimeSeries or array of times
+  s2 = LagScan(series2)
+  h1 = s1.histogram(nbins, start, start + width) # shape (nbins,)
+  h2 = s2.histograms(nbins, start - dts, width) # shape (len(dts), nbins)
+"""
+import numpy as np
+from snewpdag.values import IndexedTimeSeries
+
+class LagScan:
+
+  def __init__(self, series):
+    if isinstance(series, IndexedTimeSeries):
+      self.times = series.times # already sorted
+    else:
+      times = series.times if hasattr(series, 'times') else series
+      self.times = np.sort(np.asarray(times, dtype=np.float64))
+
+  def __len__(self):
+    return len(self.times)
+
+  def first(self):
+    """
+    Return the earliest time, or None if there are no times.
+    """
+    return self.times[0] if len(self.times) > 0 else None
+
+  def counts(self, edges):
+    """
+    Count times between consecutive edges along the last axis.
+    edges:  array of bin edges, shape (..., nbins+1), increasing
+    Returns integer array of shape (..., nbins).
+    """
+    n = np.searchsorted(self.times, edges, side='left')
+    # last bin includes its upper edge, as in np.histogram
+    n[...,-1] = np.searchsorted(self.times, edges[...,-1], side='right')
+    return np.diff(n, axis=-1)
+
+  def histogram(self, nbins, start, stop):
+    """
+    Histogram of times in a single window [start, stop].
+    """
+    return self.counts(np.linspace(start, stop, nbins + 1))
+
+  def histograms(self, nbins, starts, width):
+    """
+    Histograms of times for windows [starts[i], starts[i] + width].
+    Returns integer array of shape (len(starts), nbins).
+    """
+    st = np.asarray(starts, dtype=np.float64)
+    return self.windows(nbins, st, st + width)
+
+  def windows(self, nbins, starts, stops):
+    """
+    Histograms of times for windows [starts[...], stops[...]].
+    Returns integer array of shape starts.shape + (nbins,).
+    """
+    edges = np.linspace(starts, stops, nbins + 1, axis=-1)
+    return self.counts(edges)
+
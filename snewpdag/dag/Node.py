@@ -3,16 +3,45 @@ Node in the directed acyclic graph.
 Implemented on observer-observable pattern.
 
 Plugins should subclass Node and override alert, revoke, reset, report.
+
+Each node logs through its own logger, self.log (named snewpdag.<name>),
+so its level can be set per node.  On hot paths, pass arguments to the
+logger %-style rather than formatting the message first, e.g.,
+  self.log.debug('%s: dt = %s', self.name, dt)
+and guard anything costly to compute with self.log.isEnabledFor(level).
 """
+import copy
 import logging
 
-from snewpdag.values import History
+from snewpdag.values import History, Payload
+from snewpdag.values.Batch import unbatch
 
 class Node:
 
   # shared random number generator - initialized by app
   rng = None
 
+  # Trace of node events (if any) - initialized by app
+  trace = None
+
+  # Profile of node timing (if any) - initialized by app
+  profile = None
+
+  # Scheduler queueing notifications (if any) - set while it runs
+  scheduler = None
+
+  # True if alert() can handle a batch of MC trials (see values/Batch.py)
+  batch = False
+
+  # names of attributes which don't change after __init__ (e.g., detector
+  # tables, model histograms), so clones can share rather than copy them
+  shared = ()
+
+  # False if __init__ draws random numbers (or otherwise sets values which
+  # should differ from burst to burst), so a DAG with this node is
+  # configured afresh for each burst instead of being cloned
+  clonable = True
+
   def __init__(self, name, **kwargs):
     """
     Initialize the node.
@@ -20,6 +49,7 @@ class Node:
     At the end call super().__init__(**kwargs) to continue initialization.
     """
     self.name = name     # name of the Node
+    self.log = logging.getLogger('snewpdag.' + name) # logger for this Node
     self.observers = []  # observers of this Node
     self.watch_list = [] # nodes this Node is observing
     self.last_data = {}  # data after last update
@@ -35,6 +65,23 @@ class Node:
     for n in self.watch_list:
       n.detach(self)
 
+  def clone(self):
+    """
+    Copy this node for another instance of the DAG (e.g., another burst),
+    without its observers and watch list.  Attributes named in shared
+    are referenced by the copy; everything else is deep-copied.
+    """
+    skip = ('observers', 'watch_list')
+    memo = { id(self.__dict__[k]): self.__dict__[k]
+             for k in self.shared if k in self.__dict__ }
+    c = copy.copy(self)
+    for k, v in self.__dict__.items():
+      if k not in skip:
+        setattr(c, k, copy.deepcopy(v, memo))
+    c.observers = []
+    c.watch_list = []
+    return c
+
   def attach(self, observer):
     """
     Register observer (of type Node).
@@ -59,7 +106,8 @@ class Node:
     Notify all observers that they need to update.
     Update history by appending name of current node.
     """
-    self.last_data = data.copy() # shallow copy (copies refs of objects)
+    # shallow copy (copies refs of objects), copy-on-write if large
+    self.last_data = Payload.of(data)
     # record action
     self.last_data['action'] = action
     # append to history (tuple, so remember that tuples are immutable)
@@ -78,9 +126,16 @@ class Node:
     #h2 = (self.name,)
     #self.last_data['history'] = h1 + h2
     # notify all observers
+    if Node.trace != None:
+      Node.trace.record(self.name, 'notify', action)
     for obs in self.observers:
-      logging.debug('DEBUG:{0}: notify {1}'.format(self.name, obs.name))
-      obs.update(self.last_data)
+      self.log.debug('%s: notify %s', self.name, obs.name)
+      if Node.scheduler != None:
+        Node.scheduler.send(self, obs, self.last_data)
+      elif Node.profile != None:
+        Node.profile.call(obs, self.last_data)
+      else:
+        obs.update(self.last_data)
 
 #
 # entry points
@@ -143,6 +198,29 @@ class Node:
                   self.name, data['action']))
     return False
 
+#
+# merging
+#   Nodes which accumulate over trials (histograms, series) can be run
+#   in several copies of the DAG, e.g., in different processes, and
+#   combined before the report (see snewpdag/trials/FarmTrials.py).
+#   state() returns what has been accumulated, as plain picklable values,
+#   and merge() adds a state from another copy of the node to this one.
+#   Copies are merged in trial order.
+#
+
+  def state(self):
+    """
+    Accumulated state to merge into another copy of this node,
+    or None if there's nothing to merge.  Override with merge().
+    """
+    return None
+
+  def merge(self, state):
+    """
+    Add state (from state() of another copy of this node) to this node.
+    """
+    pass
+
   def update(self, data):
     """
     Update this object with provided data.
@@ -156,10 +234,20 @@ class Node:
     calling the action methods.  So it should be all right for an
     action to add to the payload and return it for notification
     (which will make another shallow copy as self.last_data).
+    Large payloads are copied as Payload objects, which share
+    unmodified fields.
     """
-    logging.debug('{0}: update({1})'.format(self.name,
-                  data['action'] if 'action' in data else 'None'))
-    cdata = data.copy() # local shallow copy
+    if Node.trace != None:
+      Node.trace.record(self.name, 'update',
+                        data['action'] if 'action' in data else None)
+    if self.log.isEnabledFor(logging.DEBUG):
+      self.log.debug('%s: update(%s)', self.name,
+                     data['action'] if 'action' in data else 'None')
+    if 'batch' in data and not self.batch:
+      self.split(data)
+      return
+    # local shallow copy
+    cdata = Payload.of(data)
     if 'history' in cdata:
       cdata['history'] = data['history'].copy() # local copy of history
       self.last_source = cdata['history'].last()
@@ -182,7 +270,7 @@ class Node:
         self.notify(action, cdata) # notify() will update history
       elif v == False:
         return
-      elif type(v) is dict:
+      elif isinstance(v, (dict, Payload)):
         self.notify(v['action'] if 'action' in v else action, v)
       else:
         logging.error('{0}: empty action response'.format(self.name))
@@ -194,6 +282,22 @@ class Node:
 # utility functions
 #
 
+  def split(self, data):
+    """
+    Update with each trial of a batch in turn.  Alerts are separated
+    by resets, as they would be if the trials were injected one by one
+    (the reset after the last one comes with the batch).
+    Each node splits on its own, so a node joining two inputs which
+    both split the batch would get all of one input's trials first
+    (SimpleTrials.batch_safe() checks for this).
+    """
+    for i, d in enumerate(unbatch(data)):
+      if i > 0 and d['action'] == 'alert':
+        r = dict(d)
+        r['action'] = 'reset'
+        self.update(r)
+      self.update(d)
+
   def watch_index(self, source):
     """
     Utility function to find index in watch_list for given source.
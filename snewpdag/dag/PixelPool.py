@@ -0,0 +1,140 @@
+"""
+PixelPool - evaluate skymap pixels in chunks, optionally on a process pool
+
+Skymap nodes evaluate each pixel independently of the others, so the
+pixel index range can be split into chunks and evaluated in parallel.
+
+The work for a chunk is a module-level function (so it can be pickled)
+  func(rs, i0, i1, *args) -> np.array of shape (i1-i0,)
+where rs is the slice [:, i0:i1] of the direction array (or None if
+no directions were given), and args are plain values (arrays, numbers)
+which don't change during the evaluation.  Don't pass Node objects
+in args, since they would be pickled along with the rest of the DAG.
+
+The direction array (e.g., from CelestialPixels) and the pickled args
+are copied once into shared memory for each evaluation.  Each worker
+unpickles the args once per evaluation and reads its slices of the
+directions from there, rather than receiving a pickled copy of both
+with every task.
+
+The default number of workers is PixelPool.workers, which is set by
+the application from the --workers option.  1 (the default) means
+evaluate in this process.  Nodes can override it with their own
+'workers' argument.
+
+To use,
+  pool = PixelPool(workers, chunk_size)
+  m = pool.evaluate(func, npix, args, rs)
+"""
+import atexit
+import logging
+import pickle
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+class PixelPool:
+
+  workers = 1 # default number of worker processes, initialized by app
+  executors = {} # { nworkers: ProcessPoolExecutor } shared by all nodes
+
+  def __init__(self, workers=None, chunk_size=None):
+    """
+    workers:  number of worker processes, None for the default
+    chunk_size:  number of pixels per task, None to split the pixels
+      evenly into a few tasks per worker (or a single one if serial)
+    """
+    self.nworkers = workers
+    self.chunk_size = chunk_size
+
+  def get_workers(self):
+    n = PixelPool.workers if self.nworkers is None else self.nworkers
+    return max(1, int(n))
+
+  def chunks(self, npix, nworkers):
+    if self.chunk_size is None:
+      step = npix if nworkers == 1 else -(-npix // (4 * nworkers))
+    else:
+      step = int(self.chunk_size)
+    step = max(1, step)
+    return [ (i0, min(i0 + step, npix)) for i0 in range(0, npix, step) ]
+
+  def evaluate(self, func, npix, args=(), rs=None):
+    """
+    Evaluate func over pixels [0, npix) in chunks.
+    rs = direction array, shape (3, npix), or None.
+    Returns np.array of shape (npix,), in pixel order.
+    """
+    if rs is not None:
+      rs = np.asarray(getattr(rs, 'value', rs))
+    nworkers = self.get_workers()
+    chunks = self.chunks(npix, nworkers)
+    m = np.empty(npix)
+    if nworkers == 1 or len(chunks) == 1:
+      for i0, i1 in chunks:
+        m[i0:i1] = func(None if rs is None else rs[:,i0:i1], i0, i1, *args)
+      return m
+
+    executor = PixelPool.get_executor(nworkers)
+    pargs = pickle.dumps(args, pickle.HIGHEST_PROTOCOL)
+    nrs = 0 if rs is None else rs.nbytes
+    shm = shared_memory.SharedMemory(create=True, size=nrs + len(pargs))
+    try:
+      if rs is not None:
+        a = np.ndarray(rs.shape, dtype=rs.dtype, buffer=shm.buf)
+        a[:] = rs
+        del a
+      shm.buf[nrs:nrs + len(pargs)] = pargs
+      ref = (shm.name, None if rs is None else (rs.shape, rs.dtype.str),
+             nrs, len(pargs))
+      futures = [ executor.submit(run_chunk, func, ref, i0, i1)
+                  for i0, i1 in chunks ]
+      for (i0, i1), f in zip(chunks, futures):
+        m[i0:i1] = f.result()
+    finally:
+      shm.close()
+      shm.unlink()
+    return m
+
+  @staticmethod
+  def get_executor(nworkers):
+    if nworkers not in PixelPool.executors:
+      logging.info('PixelPool: starting {} workers'.format(nworkers))
+      PixelPool.executors[nworkers] = ProcessPoolExecutor(nworkers)
+    return PixelPool.executors[nworkers]
+
+  @staticmethod
+  def shutdown():
+    for ex in PixelPool.executors.values():
+      ex.shutdown()
+    PixelPool.executors = {}
+
+atexit.register(PixelPool.shutdown)
+
+#
+# worker side
+#
+
+current = {} # shared memory, directions and args of the current evaluation
+
+def run_chunk(func, ref, i0, i1):
+  """
+  Evaluate one chunk in a worker process.
+  ref = (shared memory name, (shape, dtype) of the direction array or None,
+         size of the directions, size of the pickled args).
+  """
+  name, rsdesc, nrs, nargs = ref
+  if current.get('name') != name:
+    # directions and args of earlier evaluations are no longer needed
+    if 'shm' in current:
+      current['rs'] = None
+      current['shm'].close()
+    current.clear()
+    shm = shared_memory.SharedMemory(name=name)
+    current['name'] = name
+    current['shm'] = shm
+    current['args'] = pickle.loads(shm.buf[nrs:nrs + nargs])
+    current['rs'] = None if rsdesc is None else \
+      np.ndarray(rsdesc[0], dtype=np.dtype(rsdesc[1]), buffer=shm.buf)
+  rs = current['rs']
+  return func(None if rs is None else rs[:,i0:i1], i0, i1, *current['args'])
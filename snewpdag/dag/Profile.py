@@ -0,0 +1,104 @@
+"""
+Profile - per-node timing of a DAG run
+
+When profiling is on (Node.profile is a Profile), every update() call
+goes through Profile.call(), which records for each (node, action)
+  calls:  number of update() calls
+  total:  wall time (s) including the nodes it notified
+  self:  wall time (s) excluding the nodes it notified
+  fields:  total number of payload fields received
+  forwarded:  number of notifications sent to observers
+The self time is also accumulated by the path the payload took,
+following its History, and can be written as collapsed stacks
+(one "node;node;node microseconds" line per path) for flame graph tools,
+e.g., flamegraph.pl or speedscope.
+(Under a Scheduler, nodes aren't called from within their sources,
+so total and self time are the same, and forwarded counts are 0.)
+"""
+import csv
+import json
+import threading
+import time
+
+from snewpdag.values import History
+
+class Profile:
+  columns = ('node', 'action', 'calls', 'total', 'self', 'fields', 'forwarded')
+
+  def __init__(self):
+    self.stats = {} # { (node, action): [calls, total, self, fields, forwarded] }
+    self.stacks = {} # { path: self time }
+    self.local = threading.local() # frames of calls in progress
+    self.lock = threading.Lock()
+
+  def clear(self):
+    self.stats.clear()
+    self.stacks.clear()
+
+  def call(self, node, data):
+    """
+    Call node.update(data), recording its time.
+    """
+    action = data['action'] if 'action' in data else None
+    if not hasattr(self.local, 'frames'):
+      self.local.frames = [] # [child time, forwarded] of each call
+    frames = self.local.frames
+    if len(frames) > 0:
+      frames[-1][1] += 1 # a notification from the calling node
+    frame = [ 0.0, 0 ]
+    frames.append(frame)
+    t0 = time.perf_counter()
+    try:
+      return node.update(data)
+    finally:
+      dt = time.perf_counter() - t0
+      frames.pop()
+      if len(frames) > 0:
+        frames[-1][0] += dt
+      key = (node.name, action)
+      path = self.path(node, data)
+      with self.lock:
+        if key not in self.stats:
+          self.stats[key] = [ 0, 0.0, 0.0, 0, 0 ]
+        s = self.stats[key]
+        s[0] += 1
+        s[1] += dt
+        s[2] += dt - frame[0]
+        s[3] += len(data)
+        s[4] += frame[1]
+        self.stacks[path] = self.stacks.get(path, 0.0) + dt - frame[0]
+
+  def path(self, node, data):
+    h = data['history'] if 'history' in data else None
+    names = h.val if isinstance(h, History) else []
+    # combined histories (tuples) don't fit in a single stack
+    return ';'.join([ n for n in names if isinstance(n, str) ] + [ node.name ])
+
+  def rows(self):
+    """
+    Statistics as a list of dictionaries, most self time first.
+    """
+    rows = [ dict(zip(Profile.columns, k + tuple(v)))
+             for k, v in self.stats.items() ]
+    rows.sort(key=lambda r: r['self'], reverse=True)
+    return rows
+
+  def dump(self, filename):
+    """
+    Write statistics to filename, as CSV if it ends in .csv, else JSON.
+    """
+    with open(filename, 'w', newline='') as f:
+      if filename.endswith('.csv'):
+        writer = csv.DictWriter(f, Profile.columns)
+        writer.writeheader()
+        writer.writerows(self.rows())
+      else:
+        json.dump(self.rows(), f, indent=1)
+
+  def dump_stacks(self, filename):
+    """
+    Write self times (in integer microseconds) as collapsed stacks.
+    """
+    with open(filename, 'w') as f:
+      for path, t in sorted(self.stacks.items()):
+        f.write('{} {}\n'.format(path, int(round(t * 1e6))))
@@ -0,0 +1,144 @@
+"""
+Scheduler - run a DAG from a work queue instead of by recursion
+
+By default, Node.notify() calls each observer's update() directly,
+so an alert travels depth-first through the DAG, one branch after
+another, as nested calls.  While a Scheduler is running (Node.scheduler
+is set), notify() puts the payload in the observer's inbox instead,
+and the scheduler runs nodes whose inboxes are complete, i.e., which
+have no ancestors with work left to do.  So
+  * the call stack doesn't grow with the depth of the DAG;
+  * a node sees all the payloads from one injection together,
+    in a fixed order (by the topological rank of the sender, then
+    the order in which the sender sent them);
+  * with threads > 1, nodes on independent branches (e.g., the generator
+    chains of different detectors) run at the same time in a thread pool.
+Each node still handles one payload at a time through update(), so
+alert/revoke/reset/report work as they do without the scheduler.
+
+Nodes sharing the class random number generator (Node.rng) would draw
+from it in whatever order the threads run, so seed_nodes() gives every
+node its own stream, derived from a seed, the node name and the DAG key.
+The results then don't depend on the number of threads.
+
+Threads help when nodes spend their time in numpy or I/O, which release
+the GIL.  For pure-python pixel loops, use PixelPool workers (processes).
+"""
+import logging
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+
+from .Node import Node
+
+def order(nodes):
+  """
+  Set the topological rank (length of the longest path from an input)
+  and the names of all ancestors of each node in a dictionary of nodes.
+  Returns the node names in topological order.
+  """
+  names = []
+  pending = { name: len(node.watch_list) for name, node in nodes.items() }
+  ready = [ name for name, n in pending.items() if n == 0 ]
+  for node in nodes.values():
+    node.rank = 0
+    node.ancestors = frozenset()
+  while len(ready) > 0:
+    name = ready.pop(0)
+    names.append(name)
+    node = nodes[name]
+    for obs in node.observers:
+      obs.rank = max(obs.rank, node.rank + 1)
+      obs.ancestors = obs.ancestors | node.ancestors | { name }
+      pending[obs.name] -= 1
+      if pending[obs.name] == 0:
+        ready.append(obs.name)
+  if len(names) < len(nodes):
+    logging.error('Cycle among nodes {}'.format(sorted(set(nodes) - set(names))))
+  return names
+
+def seed_nodes(nodes, seed, key=0):
+  """
+  Give each node its own random number generator, so its random numbers
+  depend only on seed, its name and key (e.g., the burst id).
+  """
+  kh = zlib.crc32(str(key).encode())
+  for name, node in nodes.items():
+    ss = np.random.SeedSequence(seed,
+           spawn_key=(zlib.crc32(name.encode()), kh))
+    node.rng = np.random.default_rng(ss)
+
+class Scheduler:
+  def __init__(self, threads=1):
+    """
+    threads:  number of nodes which can run at the same time
+    """
+    self.threads = threads
+    self.inbox = {} # { node: [ (sender rank, sender name, count, payload) ] }
+    self.running = set()
+    self.sent = {} # { sender name: count of payloads sent }
+    self.lock = threading.Lock()
+
+  def send(self, sender, node, data):
+    """
+    Called by Node.notify() to queue a payload for an observer.
+    """
+    with self.lock:
+      k = self.sent.get(sender.name, 0)
+      self.sent[sender.name] = k + 1
+      self.inbox.setdefault(node, []).append((sender.rank, sender.name, k, data))
+
+  def ready(self):
+    """
+    Nodes whose inboxes are complete, in topological order.
+    """
+    busy = { n.name for n in self.inbox } | { n.name for n in self.running }
+    return sorted([ n for n in self.inbox if n not in self.running and
+                    getattr(n, 'ancestors', frozenset()).isdisjoint(busy) ],
+                  key=lambda n: (getattr(n, 'rank', 0), n.name))
+
+  def process(self, node, messages):
+    for m in sorted(messages, key=lambda m: m[:3]):
+      if Node.profile != None:
+        Node.profile.call(node, m[3])
+      else:
+        node.update(m[3])
+
+  def run(self, node, data):
+    """
+    Inject data into node and run until there's nothing left to do.
+    """
+    if Node.scheduler != None:
+      # already running (e.g., a plugin which injects), so just queue it
+      Node.scheduler.inbox.setdefault(node, []).append((-1, '', 0, data))
+      return
+    self.inbox = { node: [ (-1, '', 0, data) ] }
+    self.sent = {}
+    Node.scheduler = self
+    try:
+      if self.threads > 1:
+        self.run_pool()
+      else:
+        while len(self.inbox) > 0:
+          n = self.ready()[0]
+          self.process(n, self.inbox.pop(n))
+    finally:
+      Node.scheduler = None
+      self.inbox = {}
+      self.running = set()
+
+  def run_pool(self):
+    with ThreadPoolExecutor(self.threads) as pool:
+      futures = {}
+      while len(self.inbox) > 0 or len(futures) > 0:
+        with self.lock:
+          for n in self.ready():
+            self.running.add(n)
+            futures[pool.submit(self.process, n, self.inbox.pop(n))] = n
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for f in done:
+          n = futures.pop(f)
+          with self.lock:
+            self.running.discard(n)
+          f.result() # raise any exception from the node
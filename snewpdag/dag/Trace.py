@@ -0,0 +1,36 @@
+"""
+Trace - ring buffer of node events
+
+When tracing is on (Node.trace is a Trace), nodes record each update
+and notify as a tuple (time, node name, event, action) instead of
+formatting log messages.  Only the last size events are kept,
+so a trace can be left on for a long run and dumped afterwards
+(or when something goes wrong) to see what the DAG was doing.
+"""
+import json
+import time
+from collections import deque
+
+class Trace:
+  def __init__(self, size=10000):
+    """
+    size:  number of events to keep
+    """
+    self.events = deque(maxlen=size)
+
+  def record(self, node, event, action):
+    self.events.append((time.time(), node, event, action))
+
+  def clear(self):
+    self.events.clear()
+
+  def dump(self, f):
+    """
+    Write events, oldest first, to file object f, one JSON object per line.
+    """
+    for t, node, event, action in self.events:
+      f.write(json.dumps({ 'time': t, 'node': node, 'event': event,
+                           'action': action }) + '\n')
+
+  def __len__(self):
+    return len(self.events)
@@ -1,5 +1,13 @@
-from .Node import Node
-from .Detector import Detector
-from .DetectorDB import DetectorDB
-from .CelestialPixels import CelestialPixels
-from .LogTable import LogTable
+"""
+DAG framework classes, each imported on first use
+(see snewpdag.dag.lib.lazy_import)
+"""
+from .lib import lazy_import
+
+__all__ = [
+  'Node', 'Detector', 'DetectorDB', 'CelestialPixels', 'LogTable',
+  'LagScan', 'PixelPool', 'AdaptiveMap', 'Trace',
+  'Profile', 'Scheduler', 'Ingest', 'Journal',
+]
+
+__getattr__, __dir__ = lazy_import(__name__, __all__)
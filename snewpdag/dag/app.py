@@ -4,10 +4,13 @@ SNEWPDAG application.
 See README for details of the configuration and input data files.
 """
 
-import os, sys, argparse, json, logging, importlib, ast, csv
+import os, sys, argparse, json, logging, importlib, ast, csv, time, atexit
+from collections import OrderedDict
 #from SNEWS_PT.snews_sub import Subscriber
+import threading
 import numpy as np
-from . import Node
+from . import Node, PixelPool, Trace, Profile, Scheduler, Journal
+from .Scheduler import order, seed_nodes
 
 parser = argparse.ArgumentParser()
 parser.add_argument('config', help='configuration py/json/csv file')
@@ -20,6 +23,39 @@ parser.add_argument('--action', help='default action (alert by default)',
                     default='alert')
 parser.add_argument('--inject', help='name of default injection module',
                     default='Control')
+parser.add_argument('--workers', help='number of processes for skymap pixel evaluation',
+                    default=1)
+parser.add_argument('--pixel-cache', help='number of skymap direction maps to cache (default 32)')
+parser.add_argument('--max-dags', type=int,
+                    help='maximum number of burst DAGs to keep (default no limit)')
+parser.add_argument('--dag-idle', type=float,
+                    help='drop burst DAGs idle for this many seconds (default never)')
+parser.add_argument('--trace', type=int,
+                    help='record the last TRACE node events (default no tracing)')
+parser.add_argument('--trace-file', default='trace.jsonl',
+                    help='file to write the trace to on exit (default trace.jsonl)')
+parser.add_argument('--profile',
+                    help='write per-node timing to this json/csv file on exit and after each report')
+parser.add_argument('--profile-stacks',
+                    help='write per-node self time as collapsed stacks (for flame graphs) to this file')
+parser.add_argument('--scheduler', action='store_true',
+                    help='run the DAG from a work queue in topological order')
+parser.add_argument('--threads', type=int, default=1,
+                    help='number of nodes the scheduler can run at once (default 1)')
+parser.add_argument('--async', dest='use_async', action='store_true',
+                    help='ingest input with asyncio, processing different bursts concurrently')
+parser.add_argument('--tail',
+                    help='follow JSON lines appended to this file (implies --async)')
+parser.add_argument('--listen',
+                    help='read JSON lines from a TCP socket at [HOST:]PORT (implies --async)')
+parser.add_argument('--bursts', type=int,
+                    help='number of bursts --async can process at once (default depends on cores)')
+parser.add_argument('--journal', default='SNEWS_MSGs/subscribed_messages.jsonl',
+                    help='append stream messages to this JSON lines file, which --jsonlines can replay')
+parser.add_argument('--journal-sync', type=float, default=1.0,
+                    help='seconds between syncs of the journal to disk (default 1)')
+parser.add_argument('--latency',
+                    help='write the latency of each message to this file (with --async)')
 args = parser.parse_args()
 if args.stream:
   try:
@@ -28,34 +64,23 @@ if args.stream:
     logging.info('Cannot import the hop client')
     pass
 
+journal = None # Journal of subscribed messages, opened by run()
+
 # Consider using snews_pt subscribe method in a near future
 def save_message(message):
-  """ Save hop alert messages to a json file.
+  """ Add the fields needed to run the DAGs to a hop alert message,
+  and append it to the journal.  Returns the message.
   """
-  path = f'SNEWS_MSGs/'
-  os.makedirs(path, exist_ok=True)
-  file = path + 'subscribed_messages.json'
-  # read the existing file
-  try:
-    data = json.load(open(file, 'w'))
-    if not isinstance(data, dict):
-      print('Incompatible file format!')
-      return None
-
-  except:
-    data = {}
-
   # Adding fields to the alert message (which are needed to run the dags)
   if message['_id'].split("_")[1].split("-")[1] == 'ALERT':
     message['action'] = args.action
   message['name'] = args.inject
   message['number_of_coinc_dets'] = len(message['detector_names'])
   message['coinc_id'] = 'coinc' + str(message['sub list number'])
-  data['coinc' + str(message['sub list number'])] = message
-
-  with open(file, 'w') as outfile:
-    json.dump(data, outfile)
 
+  if journal != None:
+    journal.write(message)
+  return message
 
 def run():
   """
@@ -80,6 +105,16 @@ def run():
     if not isinstance(numeric_level, int):
       raise ValueError('Invalid log level {}'.format(args.log))
     logging.basicConfig(level=numeric_level)
+  else:
+    logging.basicConfig() # so per-node log levels below WARNING show
+
+  if args.trace:
+    Node.trace = Trace(args.trace)
+    atexit.register(write_trace, Node.trace, args.trace_file)
+
+  if args.profile or args.profile_stacks:
+    Node.profile = Profile()
+    atexit.register(write_profile)
 
   # initialize random number generator
   if args.seed:
@@ -87,6 +122,24 @@ def run():
   else:
     Node.rng = np.random.default_rng()
 
+  # scheduler, with a random number stream for each node
+  global scheduler, node_seed
+  use_async = args.use_async or args.tail or args.listen
+  if args.scheduler or args.threads > 1:
+    if use_async:
+      logging.error('--scheduler/--threads cannot be used with --async')
+      sys.exit(2)
+    scheduler = Scheduler(args.threads)
+  if args.scheduler or args.threads > 1 or use_async:
+    node_seed = int(args.seed) if args.seed else \
+                np.random.SeedSequence().entropy
+
+  # default number of processes for skymap nodes
+  PixelPool.workers = int(args.workers)
+  if args.pixel_cache:
+    from . import CelestialPixels # only import astropy/healpy if needed
+    CelestialPixels.max_maps = int(args.pixel_cache)
+
   cfn, cfx = os.path.splitext(args.config)
   if cfx == '.csv':
     # name, class, observe
@@ -101,21 +154,20 @@ def run():
         sys.exit(2)
     #nodes = configure(nodespecs)
 
-  dags = {}
+  dags = DagStore(args.max_dags, args.dag_idle)
 
   if args.stream:
+    global journal
+    journal = Journal(args.journal, args.journal_sync)
+    atexit.register(journal.close)
+
+  if use_async:
+    async_input(dags, nodespecs, alert_topic)
+  elif args.stream:
       s = stream.open(alert_topic, "r")
       for message in s:
-        save_message(message)
-        with open('SNEWS_MSGs/subscribed_messages.json') as f:
-          try:
-            #data = ast.literal_eval(f.read())
-            data = json.load(f)
-          except:
-            logging.error('While parsing stream: {}'.format(sys.exc_info()))
-          else:
-            # Injecting this data into a dag:
-            inject(dags, data['coinc' + str(message['sub list number'])], nodespecs)
+        # Injecting this message into a dag:
+        inject(dags, save_message(message), nodespecs)
   elif args.input:
     with open(args.input) as f:
       json_input(dags, nodespecs, f)
@@ -123,6 +175,59 @@ def run():
   else:
     json_input(dags, nodespecs, sys.stdin)
 
+def async_input(dags, nodespecs, alert_topic):
+  """
+  Ingest input with asyncio (see Ingest.py), from the hop stream,
+  a file being appended to, a socket, the input file or stdin.
+  """
+  import asyncio
+  from . import Ingest
+  from .Ingest import from_iterable, tail, listen, parse
+  if args.stream:
+    s = stream.open(alert_topic, "r")
+    source = from_iterable(save_message(m) for m in s)
+  elif args.tail:
+    source = tail(args.tail)
+  elif args.listen:
+    host, _, port = args.listen.rpartition(':')
+    source = listen(host if host else None, int(port))
+  else:
+    f = open(args.input) if args.input else sys.stdin
+    if args.jsonlines:
+      source = from_iterable(d for d in map(parse, f) if d != None)
+    else:
+      data = json.load(f)
+      source = from_iterable(data if type(data) is list else [ data ])
+  # renderers draw on report, with pyplot, which isn't thread-safe
+  report_lock = threading.Lock()
+  def process(data):
+    if data.get('action', args.action) == 'report':
+      with report_lock:
+        inject_one(dags, data, nodespecs)
+    else:
+      inject_one(dags, data, nodespecs)
+  latency = open(args.latency, 'w') if args.latency else None
+  ingest = Ingest(dag_key, process, args.bursts, latency)
+  if isinstance(dags, DagStore):
+    dags.busy = ingest.busy # don't drop DAGs of bursts still in progress
+  try:
+    asyncio.run(ingest.run(source))
+  except KeyboardInterrupt:
+    pass
+  finally:
+    if latency != None:
+      latency.close()
+
+def write_trace(trace, filename):
+  with open(filename, 'w') as f:
+    trace.dump(f)
+
+def write_profile():
+  if args.profile:
+    Node.profile.dump(args.profile)
+  if args.profile_stacks:
+    Node.profile.dump_stacks(args.profile_stacks)
+
 def json_input(dags, nodespecs, file):
   if args.jsonlines:
     for jsonline in file:
@@ -188,7 +293,7 @@ def find_class(name):
   path = '.'.join(base+s[0:-1])
   cl = s[-1]
   mod = importlib.import_module(path)
-  if hasattr(mod, cl):
+  if hasattr(mod, cl): # imports the plugin module on first use
     return getattr(mod, cl)
   else:
     logging.error('Unknown class {} in {}'.format(cl, path))
@@ -225,6 +330,13 @@ def configure(nodespecs):
       logging.error('While creating node {0}: {1}'.format(name, sys.exc_info()))
       return None
 
+    if 'log' in spec:
+      level = getattr(logging, str(spec['log']).upper(), None)
+      if not isinstance(level, int):
+        logging.error('Invalid log level {} for node {}'.format(spec['log'], name))
+        return None
+      nodes[name].log.setLevel(level)
+
     if 'observe' in spec:
       for obs in spec['observe']:
         if obs == name:
@@ -236,8 +348,110 @@ def configure(nodespecs):
           logging.error('{0} observing unknown node {1}'.format(name, obs))
           return None
 
+  order(nodes) # topological rank and ancestors, for Scheduler
   return nodes
 
+templates = {} # { id(nodespecs): (nodespecs, template DAG, clonable) }
+scheduler = None # Scheduler, if not notifying observers recursively
+node_seed = None # seed for per-node random number generators
+
+def clone_dag(nodes):
+  """
+  Make a new DAG with the same structure as nodes, using Node.clone().
+  Observers are attached in the same order as in the original.
+  """
+  clones = { name: node.clone() for name, node in nodes.items() }
+  for name, node in nodes.items():
+    for src in node.watch_list:
+      clones[src.name].attach(clones[name])
+  return clones
+
+def instantiate(nodespecs):
+  """
+  Make a DAG for a new burst.  The first call for a configuration builds
+  a template with configure(), which is never sent any data;
+  this and later calls return clones of the template.
+  If the template has a node which isn't clonable (see Node.clonable),
+  the first call returns the DAG it configured, and later calls
+  configure new ones.
+  """
+  key = id(nodespecs)
+  if key not in templates:
+    template = configure(nodespecs)
+    if template != None and \
+       not all([ n.clonable for n in template.values() ]):
+      templates[key] = (nodespecs, None, False)
+      return template
+    templates[key] = (nodespecs, template, True)
+  template, clonable = templates[key][1:]
+  if not clonable:
+    return configure(nodespecs)
+  if template == None:
+    return None
+  try:
+    return clone_dag(template)
+  except:
+    logging.warning('Cannot clone DAG, configuring a new one: {}'.format(
+                    sys.exc_info()[1]))
+    return configure(nodespecs)
+
+class DagStore(dict):
+  """
+  DAGs keyed by burst (or coincidence) identifier.
+  DAGs which haven't been used for max_idle seconds are dropped,
+  and the least recently used ones beyond max_dags.
+  A burst which comes back after being dropped starts with a new DAG.
+  DAGs for which busy(key) is true (e.g., with alerts queued or being
+  processed by Ingest) aren't dropped.
+  """
+  def __init__(self, max_dags=None, max_idle=None, busy=None):
+    super().__init__()
+    self.max_dags = max_dags
+    self.max_idle = max_idle
+    self.busy = busy
+    self.used = OrderedDict() # { key: last use time }, least recent first
+
+  def touch(self, key):
+    self.used[key] = time.monotonic()
+    self.used.move_to_end(key)
+    self.evict(key)
+
+  def evict(self, keep=None):
+    now = time.monotonic()
+    for key in list(self.used.keys()):
+      if key == keep or (self.busy != None and self.busy(key)):
+        continue
+      if (self.max_idle != None and now - self.used[key] > self.max_idle) or \
+         (self.max_dags != None and len(self) > self.max_dags):
+        self.drop(key)
+
+  def drop(self, key):
+    logging.info('Dropping DAG {}'.format(key))
+    del self.used[key]
+    for node in self.pop(key).values():
+      node.dispose()
+
+dag_lock = threading.Lock() # for DAGs of bursts processed concurrently
+
+def get_dag(dags, key, nodespecs):
+  """
+  Get the DAG for key, instantiating a new one if needed.
+  """
+  with dag_lock:
+    return new_dag(dags, key, nodespecs)
+
+def new_dag(dags, key, nodespecs):
+  if key not in dags:
+    dags[key] = instantiate(nodespecs)
+    if dags[key] == None:
+      logging.error('Invalid configuration for burst id {}'.format(key))
+      sys.exit(2)
+    if node_seed != None:
+      seed_nodes(dags[key], node_seed, key)
+  if isinstance(dags, DagStore):
+    dags.touch(key)
+  return dags[key]
+
 def inject(dags, data, nodespecs):
   """
   Send data through DAG.
@@ -253,27 +467,30 @@ def inject(dags, data, nodespecs):
     logging.error('What is this input data?')
     sys.exit(2)
 
+def dag_key(data):
+  """
+  Key of the DAG for data:  dag_coinc<n> for hop alerts (sub list number n),
+  otherwise the burst_id (0 if none).
+  """
+  if 'sub list number' in data:
+    # e.g. dag_coinc1, dag_coinc2
+    return 'dag_coinc' + str(data['sub list number'])
+  else:
+    return data['burst_id'] if 'burst_id' in data else 0
+
 def inject_one(dags, data, nodespecs):
   # add an action if none already exists (default 'alert')
   if 'action' not in data:
     data['action'] = args.action
   if 'name' not in data:
     data['name'] = args.inject
-  if 'sub list number' in data:
-    index_coincidence = str(data['sub list number'])
-    if 'dag_coinc' + index_coincidence not in dags: # e.g. dag_coinc1, dag_coinc2
-      dags['dag_coinc' + index_coincidence] = configure(nodespecs)
-    dag = dags['dag_coinc' + index_coincidence]
-    dag[data['name']].update(data)
+  dag = get_dag(dags, dag_key(data), nodespecs)
+  if scheduler != None:
+    scheduler.run(dag[data['name']], data)
+  elif Node.profile != None:
+    Node.profile.call(dag[data['name']], data)
   else:
-    burst_id = 0
-    if 'burst_id' in data:
-      burst_id = data['burst_id']
-    if burst_id not in dags:
-      dags[burst_id] = configure(nodespecs)
-      if dags[burst_id] == None:
-        logging.error('Invalid configuration for burst id {}'.format(burst_id))
-        sys.exit(2)
-    dag = dags[burst_id]
     dag[data['name']].update(data)
+  if Node.profile != None and data['action'] == 'report':
+    write_profile()
 
@@ -3,6 +3,10 @@ DAG library routines
 """
 import logging
 import numbers
+import importlib
+import sys
+import types
+from collections.abc import Mapping
 import numpy as np
 
 # deprecated: ns_per_second
@@ -28,7 +32,7 @@ def fetch_field(data, fields):
   if isinstance(fs, (list, tuple)):
     d = data
     for f in fs:
-      if isinstance(d, dict) and f in d:
+      if isinstance(d, Mapping) and f in d:
         d = d[f]
       elif isinstance(d, (list, tuple, np.ndarray)) and f < len(d):
         d = d[f]
@@ -46,7 +50,7 @@ def store_field(data, field, value):
   if isinstance(fs, (list, tuple)):
     d = data
     for f in fs[:-1]:
-      if isinstance(d, dict) and f in d:
+      if isinstance(d, Mapping) and f in d:
         d = d[f]
       else:
         d[f] = {}
@@ -75,3 +79,40 @@ def fill_filename(pattern, module_name, count, data):
   fn = ps.format(module_name, count, data.get('burst_id', 0))
   return fn
 
+
+class LazyPackage(types.ModuleType):
+  """
+  Module type for packages set up by lazy_import().
+  Importing a submodule binds its name in the package to the submodule,
+  which would hide the class of the same name, so bind the class instead.
+  """
+  def __setattr__(self, name, value):
+    if isinstance(value, types.ModuleType) and \
+       name in self.__dict__.get('__all__', ()) and hasattr(value, name):
+      value = getattr(value, name)
+    super().__setattr__(name, value)
+
+def lazy_import(package, names):
+  """
+  Module __getattr__ and __dir__ for a package whose classes live in
+  submodules of the same name (e.g., package.Pass.Pass), so that each
+  submodule is only imported the first time its class is asked for.
+  package = __name__ of the package
+  names = list of class names
+  Use at the end of the package's __init__.py as
+    __all__ = [ <class names> ]
+    __getattr__, __dir__ = lazy_import(__name__, __all__)
+  """
+  names = set(names)
+  sys.modules[package].__class__ = LazyPackage
+  def __getattr__(name):
+    if name not in names:
+      raise AttributeError('module {} has no attribute {}'.format(
+                           package, name))
+    mod = importlib.import_module('{}.{}'.format(package, name))
+    obj = getattr(mod, name)
+    setattr(sys.modules[package], name, obj)
+    return obj
+  def __dir__():
+    return sorted(names | set(vars(sys.modules[package])))
+  return __getattr__, __dir__
@@ -34,6 +34,20 @@ class AccHistogram(Node):
       self.m += data[self.in_field]
     return False
 
+  def state(self):
+    return { 'm': self.m.copy() }
+
+  def merge(self, state):
+    m = state['m']
+    if len(m) == 0:
+      return
+    if len(self.m) == 0:
+      self.m = np.zeros(len(m))
+    elif len(m) != len(self.m):
+      self.log.warning('%s: unequal histogram sizes', self.name)
+      return
+    self.m += m
+
   def report(self, data):
     data[self.out_field] = self.m
     return data
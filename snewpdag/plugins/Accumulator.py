@@ -4,14 +4,22 @@ Accumulator:  a plugin which simply accumulates a list of numbers
 
 In general, assumes only a single source, so revoke and reset are
 the same.
+
+Series from copies of the DAG running other trials can be merged
+in trial order (see Node.merge()).
+
+A batch of trials appends one value per trial (or, if reset clears
+the series, keeps only the last, as resets between the trials would).
 """
 import logging
 import numpy as np
 
 from snewpdag.dag import Node
 from snewpdag.dag.lib import fetch_field
+from snewpdag.values import Batch
 
 class Accumulator(Node):
+  batch = True
   def __init__(self, title, in_field, **kwargs):
     self.title = title
     self.in_field = in_field
@@ -30,9 +38,28 @@ class Accumulator(Node):
       if not exists:
         return False
     # append
-    self.series.append(x)
+    if 'batch' in data:
+      if isinstance(x, Batch):
+        xs = list(np.asarray(x))
+      else:
+        xs = [ x ] * data['batch'] # same for every trial
+      if 'reset' in self.clear_on:
+        xs = xs[-1:]
+      self.series.extend(xs)
+    else:
+      self.series.append(x)
     return self.alert_pass != False
 
+  def state(self):
+    return { 'series': list(self.series) }
+
+  def merge(self, state):
+    if 'reset' in self.clear_on:
+      # a later copy's trials reset what this one accumulated
+      self.series = list(state['series'])
+    else:
+      self.series.extend(state['series'])
+
   def report(self, data):
     a = np.array(self.series)
     a.flags.writeable = False
@@ -1,5 +1,9 @@
 """
 Bayes: Bayesian block method.  It's now set to always run in hybrid mode.  To run a pure Bayesian block, set division to be lower than h_low
+
+The blocks of each series are found once per comparison, and histogrammed
+for all the dt shifts of the scan at once.  For large numbers of values,
+set prune=True, which gives the same blocks faster (see blocks()).
 """
 import logging
 import math
@@ -21,10 +25,10 @@ class BayesianBlocks(Node):
     self.fit_range = shape.fit_range # metric-dt fit range, fitting +-dt_range around the point of minimum metric
     self.gamma = gamma # prior probability used in the Bayesian block method, larger gamma means finer bins
     self.division = division # division between uniform bins and Bayesian blocks
+    self.prune = kwargs.pop('prune', False) # prune the block search (for large numbers of values)
     self.valid = [ False, False ] # flags indicating valid data from sources
     self.h = [ (), () ] # histories from each source
     self.history_data = []
-    self.hybrid_bin_value = []
     super().__init__(**kwargs)
 
     if self.dt0 > 0:
@@ -68,162 +72,91 @@ class BayesianBlocks(Node):
 
 
   def metric_list(self, values1, values2):
-    mlist = [0] * self.dt_N
-
-    block2 = self.bayesian_block(values2)
-    hist2 = self.block_hist(block2[0], block2[1], 0)
-    for i in range(self.dt_N):
-      block1 = self.bayesian_block(values1)
-      hist1 = self.block_hist(block1[0], block1[1], self.dt0 + i*self.dt_step)
-      metric = SHF.diff_hist(hist1, hist2, self.scale)
-      mlist[i] = metric
-
-    return mlist
+    # blocks of each series are found once, then shifted for the whole scan
+    dts = self.dt0 + np.arange(self.dt_N) * self.dt_step
+    hist2 = self.block_hist(self.bayesian_block(values2), [ 0.0 ])[0]
+    hists1 = self.block_hist(self.bayesian_block(values1), dts)
+    return SHF.diff_metric(hists1, hist2, self.scale)
 
 
   def bayesian_block(self, values):
-    log_prior = math.log(self.gamma)
-
-    svalues = []
-    for iv in range(len(values)):
-      if float(values[iv]) >= self.h_low and float(values[iv]) < self.h_up:
-        self.hybrid_bin_value.append(float(values[iv]))           
-        if float(values[iv]) > self.division:
-          svalues.append(float(values[iv]))
-      else:
-        values.remove(values[iv])
-    svalues.sort()
-
-    edge = [(svalues[i] + svalues[i-1])/2 for i in range(len(svalues)) if i > 0]
-    edge.insert(0, 1.5*svalues[0] - 0.5*svalues[1]) #lower edge of the first cell
-    edge.append(1.5*svalues[-1] - 0.5*svalues[-2]) #upper edge of the last cell
-
-    width = [(edge[ii] - edge[ii-1]) for ii in range(len(edge)) if ii > 0]
-
-    best = [] #best[N] = the likelihood of the best combination when there are N+1 data points
-    best_count = [] #best_count[N] = the number of data points in the last block when there are N+1 data points
-
-    for n in range(1, len(svalues) + 1): #start from 1 data point and add one point a time
-      last_n = n #number of data points in the last block 
-
-      if n == 1: #for only one data point the best partition is certainly one block
-        block_width = width[0]
-        max_like = 1 * (math.log(1/block_width)) + log_prior
-        best.append(max_like)
-        best_count.append(1)
-      else:
-        block_width = 0
-        for nn in range(0, last_n):
-          block_width += width[nn]
-        max_like = last_n * (math.log(last_n/block_width)) + log_prior
-        best_n = last_n
-        last_n -= 1
-        while last_n > 0:
-          block_width = 0
-          for nn in range(0, last_n):
-            block_width += width[n-1-nn]
-          like = last_n * (math.log(last_n/block_width)) #likelihood for the last block
-          like += best[n-last_n-1] #likelihood of the best partition for the data points not in the last block
-          like += log_prior #suppresion prior for creating a new block
-          if like > max_like:
-            max_like = like
-            best_n = last_n
-          last_n -= 1
-        best.append(max_like)
-        best_count.append(best_n)
-
-    best_edge = []
-    best_content = []
-    bayes_block = []
-
-    best_edge.append(edge[-1])
-    dataN = len(svalues)
-    edge_index = -1
-    while dataN > 0:
-      best_content.append(best_count[dataN-1])
-      edge_index -= best_count[dataN-1]
-      best_edge.append(edge[edge_index])
-      dataN -= best_count[dataN-1]
-
-    best_content.reverse()
-    best_edge.reverse()
-
-    best_content = [x/float(len(values)) for x in best_content]
-
-    bayes_block.append(best_edge)
-    bayes_block.append(best_content)
-
-    return bayes_block
-
-
-  def block_hist(self, block_edge, block_content, dt_offset):
+    """
+    Partition values in [h_low, h_up) into Bayesian blocks (those above
+    division), leaving the rest to be binned uniformly.
+    Returns (block edges, block contents, uniform values, weight of each
+    uniform value), normalised to the number of values in range.
+    """
+    v = np.asarray(values, dtype=np.float64)
+    v = v[(v >= self.h_low) & (v < self.h_up)]
+    svalues = np.sort(v[v > self.division])
+    uniform = v[v <= self.division]
+    weight = 1.0 / len(v) if len(v) > 0 else 0.0
+    if len(svalues) < 2:
+      return np.zeros(0), np.zeros(0), uniform, weight
+    edges, counts = blocks(svalues, math.log(self.gamma), self.prune)
+    return edges, counts * weight, uniform, weight
+
+
+  def block_hist(self, block, dt_offsets):
+    """
+    Histograms (one row per offset) of block (from bayesian_block())
+    shifted by each offset.  Each bin gets the part of the block contents
+    which overlaps it, and the uniform values with
+    low edge < value + offset <= high edge.
+    """
+    block_edge, block_content, uniform, weight = block
     bin_width = (float(self.h_up) - float(self.h_low)) / float(self.h_bins)
-    hist = [0] * (self.h_bins)
-
-    block_width = [block_edge[ie] - block_edge[ie-1] for ie in range(len(block_edge)) if ie > 0]
-
-    edge_index = 0
-    for i in range(self.h_bins): #fill in the bins of the histogram
-      bin_edge = self.h_low + (i+1) * bin_width #upper edge of the bin
-
-      if edge_index == 0 and bin_edge <= block_edge[edge_index]+dt_offset: #if the bin is below the lower end of the blocks
-        hist[i] = 0
-        continue
-
-      reach_end = False
-      while block_edge[edge_index]+dt_offset < bin_edge: #loop until there's a block whose upper edge covers the bin
-        edge_index += 1
-
-        if edge_index == len(block_edge): #flag when the upper bin edge exceeds the upper end of the blocks
-          reach_end = True
-          break
-
-      if reach_end == True: #when the upper bin edge exceeds the upper end of the blocks
-        if bin_edge - bin_width >= block_edge[-2]+dt_offset: #if the bin doesn't include any full blocks
-          hist[i] += (block_content[-1]/block_width[-1]) * ( (block_edge[-1]+dt_offset) - bin_edge + bin_width)
-          break
-        else: #if the bin includes full blocks
-          ib = 1 #number of block edges included in the bin
-          while bin_edge - bin_width < block_edge[-1-ib]+dt_offset:
-            ib += 1
-
-          hist[i] += (block_content[-ib]/block_width[-ib]) * ( (block_edge[-ib]+dt_offset) - bin_edge + bin_width)
-          for iib in range(ib-1):
-            hist[i] += (block_content[-1-iib]/block_width[-1-iib]) * (block_edge[-1-iib] - block_edge[-2-iib])
-          break
-
-      if block_edge[edge_index]+dt_offset >= bin_edge:
-        if edge_index == 1: #if the bin is completely or partially in the first block
-          if bin_edge - bin_width < block_edge[edge_index-1]+dt_offset: #if the bin is partially in the first block
-            hist[i] += (block_content[edge_index-1]/block_width[edge_index-1]) * (bin_edge - (block_edge[edge_index-1]+dt_offset) )
-            continue
-          else: #if the bin is completely in the first block
-            hist[i] += (block_content[edge_index-1]/block_width[edge_index-1]) * bin_width
-            continue
-        elif bin_edge - bin_width >= block_edge[edge_index-1]+dt_offset: #if the bin is completely within one single block
-          hist[i] += (block_content[edge_index-1]/block_width[edge_index-1]) * bin_width
-          continue
-        else: #if the bin is only partially in a block or even contains several blocks
-          ib = 1 #number of block edges included in the bin
-          while bin_edge - bin_width < block_edge[edge_index-1-ib]+dt_offset:
-            ib += 1
-
-          hist[i] += (block_content[edge_index-1]/block_width[edge_index-1]) * (bin_edge - (block_edge[edge_index-1]+dt_offset))
-          for iib in range(ib-1):
-            hist[i] += (block_content[edge_index-2-iib]/block_width[edge_index-2-iib]) * (block_edge[edge_index-1-iib] - block_edge[edge_index-2-iib])
-          hist[i] += (block_content[edge_index-1-ib]/block_width[edge_index-1-ib]) * ( (block_edge[edge_index-ib]+dt_offset) - bin_edge + bin_width)
-          continue
-
-    for i in range(self.h_bins):
-      bin_up_edge = self.h_low + (i+1) * bin_width #upper edge of the bin
-      bin_low_edge = self.h_low + i * bin_width #lower edge of the bin
-
-      for ii in range(len(self.hybrid_bin_value)):
-        if self.hybrid_bin_value[ii]+dt_offset > bin_low_edge and self.hybrid_bin_value[ii]+dt_offset <= bin_up_edge and self.hybrid_bin_value[ii] <= self.division:
-          hist[i] += 1/float(len(self.hybrid_bin_value))
-    self.hybrid_bin_value.clear()
-
+    edges = self.h_low + np.arange(self.h_bins + 1) * bin_width
+    dts = np.asarray(dt_offsets, dtype=np.float64)[:, np.newaxis]
+    nr = len(dts)
+    hist = np.zeros((nr, self.h_bins))
+    if len(block_content) > 0:
+      # integral of the (piecewise constant) block density up to each edge
+      cum = np.concatenate(([ 0.0 ], np.cumsum(block_content)))
+      hist += np.diff(np.interp(edges - dts, block_edge, cum), axis=1)
+    if len(uniform) > 0:
+      x = uniform[np.newaxis, :] + dts
+      ix = np.searchsorted(edges, x, side='left') - 1
+      inside = (ix >= 0) & (ix < self.h_bins)
+      rows = np.broadcast_to(np.arange(nr)[:, np.newaxis], x.shape)
+      h = np.bincount(rows[inside] * self.h_bins + ix[inside],
+                      minlength=nr * self.h_bins)
+      hist += h.reshape(nr, self.h_bins) * weight
     return hist
 
 
-
+def blocks(svalues, log_prior, prune=False):
+  """
+  Optimal partition of sorted values into Bayesian blocks (Scargle et al.
+  2013), by dynamic programming over cumulative sums of the cell widths,
+  O(N^2) in the number of values.  With prune, block starts which can
+  no longer begin the last block of an optimal partition are dropped
+  as soon as that's known (PELT, Killick et al. 2012).  The result is
+  the same, but the cost is close to O(N) when there are many blocks.
+  Returns (block edges, number of values in each block).
+  """
+  n = len(svalues)
+  edge = np.concatenate(([ 1.5*svalues[0] - 0.5*svalues[1] ],
+                         (svalues[1:] + svalues[:-1]) / 2,
+                         [ 1.5*svalues[-1] - 0.5*svalues[-2] ]))
+  cw = edge - edge[0] # cumulative widths of the cells
+  best = np.zeros(n + 1) # best[m] = likelihood of best partition of first m
+  last = np.zeros(n + 1, dtype=int) # start of the last block of that partition
+  cand = np.zeros(0, dtype=int) # possible starts of the last block
+  with np.errstate(divide='ignore'):
+    for m in range(1, n + 1):
+      cand = np.append(cand, m - 1) if prune else np.arange(m)
+      k = m - cand # number of values in the last block
+      fit = k * np.log(k / (cw[m] - cw[cand])) + best[cand]
+      i = np.argmax(fit) # first, i.e., largest last block on ties
+      best[m] = fit[i] + log_prior
+      last[m] = cand[i]
+      if prune:
+        # a block from these can't do better than a new one from m
+        cand = cand[fit >= best[m]]
+  # trace back the starts of the blocks
+  starts = [ n ]
+  while starts[-1] > 0:
+    starts.append(last[starts[-1]])
+  bounds = np.array(starts[::-1])
+  return edge[bounds], np.diff(bounds).astype(np.float64)
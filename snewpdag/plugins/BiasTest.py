@@ -49,8 +49,8 @@ class BiasTest(Node):
       if tf1 == None or tf2 == None:
         return False
     else:
-      tf1 = np.min(ts1.times)
-      tf2 = np.min(ts2.times)
+      tf1 = ts1.first()
+      tf2 = ts2.first()
     dtf = tf1 - tf2
     store_field(data, self.out_delta_field, dtf)
 
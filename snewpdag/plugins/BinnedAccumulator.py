@@ -78,6 +78,20 @@ class BinnedAccumulator(Node):
     self.changed = True
     return False
 
+  def state(self):
+    return { 'bins': self.bins.copy(), 'edges': self.edges,
+             'overflow': self.overflow, 'underflow': self.underflow,
+             'sum': self.sum, 'sum2': self.sum2, 'count': self.count }
+
+  def merge(self, state):
+    if state['count'] == 0:
+      return
+    self.bins = self.bins + state['bins']
+    self.edges = state['edges']
+    for k in [ 'overflow', 'underflow', 'sum', 'sum2', 'count' ]:
+      setattr(self, k, getattr(self, k) + state[k])
+    self.changed = True
+
   def reset(self, data):
     return False
 
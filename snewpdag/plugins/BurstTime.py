@@ -45,8 +45,8 @@ class BurstTime(Node):
       return False
 
     # bin the time series
-    t1 = np.min(ts.times)
-    t2 = np.max(ts.times)
+    t1 = ts.first()
+    t2 = ts.last()
     nb = int((t2 - t1) / self.twidth) + 1
     t2a = t1 + nb * self.twidth
     h, edges = ts.histogram(nb, start=t1, stop=t2a)
@@ -56,7 +56,7 @@ class BurstTime(Node):
     if max_height < self.min_height:
       return False
 
-    logging.debug('{}: nb = {}, max_height = {}'.format(self.name, nb, max_height))
+    self.log.debug('%s: nb = %s, max_height = %s', self.name, nb, max_height)
 
     # find first event which gets max_height - one sigma (sqrt(max_height))
     top = max_height - self.height_margin * np.sqrt(max_height)
@@ -64,7 +64,7 @@ class BurstTime(Node):
       if h[i] > top:
         break
     tf = t1 + (i + 1) * self.twidth
-    logging.debug('{}:  i = {}, h = {}'.format(self.name, i, h[:i+1]))
+    self.log.debug('%s:  i = %s, h = %s', self.name, i, h[:i+1])
     evs = np.sort(ts.times[ts.times < tf]) # only sort those events before tf
 
     # if lead_time > 0, estimate background rate/s; otherwise 0
@@ -76,7 +76,7 @@ class BurstTime(Node):
       tbg = t1 + self.lead_time
       nbg = np.sum([ts.times < tbg])
       bg_rate = nbg / self.lead_time
-      logging.debug('{}:  nbg = {}, bg_rate = {}'.format(self.name, nbg, bg_rate))
+      self.log.debug('%s:  nbg = %s, bg_rate = %s', self.name, nbg, bg_rate)
 
       # assign time at fraction to burst time
       #
@@ -92,11 +92,11 @@ class BurstTime(Node):
       nbgt = dtt * bg_rate
       sigma_nbgt = np.sqrt(nbg) * dtt / self.lead_time
       nsigt = ntot - nbgt - self.bg_margin * sigma_nbgt
-      logging.debug('{}:  dtt = {}, lead_time = {}, sigma_nbgt = {}'.format(self.name, dtt, self.lead_time, sigma_nbgt))
+      self.log.debug('%s:  dtt = %s, lead_time = %s, sigma_nbgt = %s', self.name, dtt, self.lead_time, sigma_nbgt)
       if nsigt < self.min_height:
         return False
       target = (1.0 - self.fraction) * nsigt
-      logging.debug('{}:  ntot = {}, nbgt = {}, nsigt = {}, target = {}'.format(self.name, ntot, nbgt, nsigt, target))
+      self.log.debug('%s:  ntot = %s, nbgt = %s, nsigt = %s, target = %s', self.name, ntot, nbgt, nsigt, target)
 
       # scan from right
       #   choose the rigthmost event which meets the target
@@ -106,7 +106,7 @@ class BurstTime(Node):
         dta = evs[-1] - evs[i]
         nbga = dta * bg_rate
         nsiga = neva - nbga
-        logging.debug('{}:    scan neva = {}, dta = {}, nbga = {}, nsiga = {}'.format(self.name, neva, dta, nbga, nsiga))
+        self.log.debug('%s:    scan neva = %s, dta = %s, nbga = %s, nsiga = %s', self.name, neva, dta, nbga, nsiga)
         if nsiga > target:
           nf = i
           break
@@ -130,13 +130,13 @@ class BurstTime(Node):
       #  else:
       #    nf -= step
 
-    logging.debug('{}:  top = {}, tf = {}'.format(self.name, top, tf))
+    self.log.debug('%s:  top = %s, tf = %s', self.name, top, tf)
     tb = evs[nf]
-    logging.debug('tb = {}'.format(tb))
+    self.log.debug('tb = %s', tb)
     store_field(data, self.out_field, tb)
     t0, valid = fetch_field(data, self.in_truth_field)
     if valid:
-      logging.debug('t0 = {}'.format(t0))
+      self.log.debug('t0 = %s', t0)
       dt = tb - t0
       store_field(data, self.out_delta_field, dt)
     return True
@@ -7,6 +7,7 @@ Constructor Arguments:
                 options: "HK", "IC", "JUNO", "KM3", "SK"                           / same as in NeutrinoArrivalTime
     detector_location: csv file name ('detector_location.csv')                  __/
     NSIDE: (int) healpy map parameter, it describes map resolution (32 is a reasonable number)
+    workers: (int) number of processes evaluating pixels (default from --workers)
 
 Output:
     adds hp map (np.array) in nested ordering as 'chi2' and number of DOF (int) as 'ndof' to data
@@ -20,10 +21,33 @@ from numpy.core.numeric import Inf
 from scipy.stats import chi2
 from datetime import datetime
 
-from snewpdag.dag import Node
+from snewpdag.dag import Node, PixelPool
+
+
+# Generates unit vectors pointing from the earth towards the supernova
+# for the given pixels, in the same convention as the original per-pixel
+# map generation. Returns an array of shape (3, len(ipix))
+def pixel_vectors(nside, ipix):
+    delta, alpha = hp.pixelfunc.pix2ang(nside, ipix, nest=True)
+    delta = delta - np.pi/2
+    alpha = alpha - np.pi
+    return -1 * np.stack((np.cos(alpha)*np.cos(delta),
+                          np.sin(alpha)*np.cos(delta),
+                          np.sin(delta)))
+
+
+# Evaluates chi2 = d^T W d for pixels [i0, i1).
+# d = offsets - baselines . n / c, see Chi2Calculator.generate_map
+def chi2_block(rs, i0, i1, nside, offsets, baselines, precision):
+    c = 3.0e8  # speed of light /m*s^-1
+    d = offsets[:, np.newaxis] \
+        - (baselines @ pixel_vectors(nside, np.arange(i0, i1))) / c
+    return np.einsum('ip,ij,jp->p', d, precision, d)
 
 
 class Chi2Calculator(Node):
+    shared = ('detector_info',)
+
     def __init__(self, detector_list, detector_location,
                 NSIDE, **kwargs):
         self.detector_info = {}
@@ -42,6 +66,7 @@ class Chi2Calculator(Node):
         self.NSIDE = NSIDE
         self.NPIX = hp.nside2npix(NSIDE)
         self.map = {}
+        self.workers = kwargs.pop('workers', None)
 
         self.measured_times = {}
         for detector in detector_list:
@@ -145,23 +170,33 @@ class Chi2Calculator(Node):
 
         return np.matrix(d).getT()
 
-    # Generates chi2 map
-    def generate_map(self, measured, measured_det_info, det0_time, det0_info):
-        map = np.zeros(self.NPIX)
-
-        for i in range(self.NPIX):
-            delta, alpha = hp.pixelfunc.pix2ang(self.NSIDE, i, nest=True)
-
-            delta -= np.pi/2
-            alpha -= np.pi
-
-            n_pointing = -1*self.angles_to_unit_vec(alpha, delta)
-            map[i] = self.chi2(self.d_vec(n_pointing, measured, measured_det_info, det0_time, det0_info))
-
-        chi2_min = map.min()
-        for i in range(self.NPIX):
-            map[i] -= chi2_min
+    # Generates unit vectors for every pixel, shape (3, NPIX)
+    def pixel_vectors(self):
+        return pixel_vectors(self.NSIDE, np.arange(self.NPIX))
 
+    # Generates chi2 map.
+    # Detector positions are computed once, then the time residuals d
+    # and the quadratic form d^T W d are evaluated for blocks of pixels
+    # at once (spread over worker processes if there are several).
+    def generate_map(self, measured, measured_det_info, det0_time, det0_info):
+        dets = list(measured.keys())
+
+        det0_pos = np.asarray(self.det_cartesian_position(det0_info)).ravel()
+        offsets = np.zeros(len(dets))
+        baselines = np.zeros((len(dets), 3))
+        for i, det in enumerate(dets):
+            offsets[i] = measured[det][0] + measured[det][1] / 1e9 \
+                       - det0_time[0] - det0_time[1] / 1e9 \
+                       - measured_det_info[det][4] + det0_info[4]
+            det_pos = self.det_cartesian_position(measured_det_info[det])
+            baselines[i] = np.asarray(det_pos).ravel() - det0_pos
+
+        pool = PixelPool(self.workers)
+        map = pool.evaluate(chi2_block, self.NPIX,
+                            (self.NSIDE, offsets, baselines,
+                             np.asarray(self.precision_matrix)))
+
+        map -= map.min()
         return map
 
 
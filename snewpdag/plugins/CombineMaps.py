@@ -14,6 +14,12 @@ The finest-grained healpix pixellation is chosen.
 We use the healpy.ud_grade() function to upgrade.
 The map is always assumed to be in nested order.
 
+Each source's map is cached once upgraded (and converted to CL if
+needed), and the combined map is kept between updates.  A new source
+is added to (or multiplied into) the combined map, while a revocation,
+a replaced map or a change of resolution or form combines the cached
+maps again.
+
 May also add a function to input.
 """
 import logging
@@ -27,6 +33,9 @@ class CombineMaps(Node):
   def __init__(self, force_cl, **kwargs):
     self.force_cl = force_cl # force output in CL
     self.map = {}
+    self.cache = {} # { source: { 'chi2' or 'cl': upgraded map } }
+    self.total = None # combined map and the sources in it
+    self.npix = 0
     super().__init__(**kwargs)
 
   def alert(self, data):
@@ -38,7 +47,8 @@ class CombineMaps(Node):
       self.map[source] = data.copy()
       self.map[source]['history'] = data['history'].copy() # keep local copy
       self.map[source]['valid'] = True
-      return self.reevaluate(data)
+      self.cache.pop(source, None)
+      return self.reevaluate(data, source)
     else:
       logging.error('[{}] Expected either CL or chi2 in map'.format(self.name))
       return False
@@ -59,9 +69,37 @@ class CombineMaps(Node):
       if self.map[k]['valid']:
         newrevoke = True
         self.map[k]['valid'] = False
+    self.total = None
     return newrevoke
 
-  def reevaluate(self, data):
+  def upgraded(self, source, form):
+    """
+    Map of a source in the given form ('chi2' or 'cl'),
+    upgraded to the working resolution.
+    """
+    c = self.cache.setdefault(source, {})
+    if form not in c:
+      v = self.map[source]
+      if form == 'chi2':
+        ma = np.array(v['chi2'], dtype=np.float64)
+      elif 'chi2' in v:
+        rv = chi2(v['ndof'])
+        ma = rv.cdf(np.array(v['chi2']))
+      else:
+        ma = np.array(v['cl'], dtype=np.float64)
+      if len(ma) != self.npix:
+        ma = hp.ud_grade(ma, hp.npix2nside(self.npix),
+                         order_in='NESTED', order_out='NESTED')
+      c[form] = ma
+    return c[form]
+
+  def combine(self, m, ma, form):
+    if form == 'chi2':
+      m += ma
+    else:
+      m *= ma
+
+  def reevaluate(self, data, added=None):
     # if all maps are chi2, then can output chi2
     use_chi2 = not self.force_cl
     if use_chi2:
@@ -69,6 +107,7 @@ class CombineMaps(Node):
         if self.map[k]['valid'] and 'cl' in self.map[k]:
           use_chi2 = False
           break
+    form = 'chi2' if use_chi2 else 'cl'
 
     # find finest binning.
     # for nested ordering, nside values can only be powers of 2,
@@ -77,46 +116,34 @@ class CombineMaps(Node):
               else len(self.map[k]['cl'])
               for k in self.map ]
     maxnpix = max(npixs)
-    nside = hp.npix2nside(maxnpix)
+    if maxnpix != self.npix:
+      self.npix = maxnpix
+      self.cache = {}
+      self.total = None
+
+    # do the calculation, only adding the new source if possible
+    valid = [ k for k in self.map if self.map[k]['valid'] ]
+    t = self.total
+    if t != None and t['form'] == form and added != None and \
+       added not in t['sources'] and t['sources'] + [ added ] == valid:
+      self.combine(t['m'], self.upgraded(added, form), form)
+      t['sources'].append(added)
+      if use_chi2:
+        t['ndof'] += self.map[added]['ndof']
+    else:
+      m = np.zeros(maxnpix) if use_chi2 else np.ones(maxnpix)
+      for k in valid:
+        self.combine(m, self.upgraded(k, form), form)
+      t = { 'form': form, 'm': m, 'sources': valid,
+            'ndof': sum([ self.map[k]['ndof'] for k in valid ])
+                    if use_chi2 else 0 }
+      self.total = t
 
-    # do the calculation
     if use_chi2:
-      m = np.zeros(maxnpix)
-      df = 0
-      for k in self.map:
-        v = self.map[k]
-        if v['valid']:
-          if len(v['chi2']) != len(m):
-            ma = hp.ud_grade(np.array(v['chi2']), nside,
-                             order_in='NESTED', order_out='NESTED')
-          else:
-            ma = np.array(v['chi2'])
-          m += ma
-          df += v['ndof']
-      data['chi2'] = m
-      data['ndof'] = df
-
+      data['chi2'] = t['m'].copy()
+      data['ndof'] = t['ndof']
     else:
-      m = np.ones(maxnpix)
-      for k in self.map:
-        v = self.map[k]
-        if v['valid']:
-          if 'chi2' in v:
-            rv = chi2(v['ndof'])
-            mp = rv.cdf(np.array(v['chi2']))
-            if len(v['chi2']) != len(m):
-              ma = hp.ud_grade(mp, nside,
-                               order_in='NESTED', order_out='NESTED')
-            else:
-              ma = mp
-          else:
-            if len(v['cl']) != len(m):
-              ma = hp.ud_grade(np.array(v['cl']), nside,
-                               order_in='NESTED', order_out='NESTED')
-            else:
-              ma = np.array(v['cl'])
-          m *= ma
-      data['cl'] = m
+      data['cl'] = t['m'].copy()
 
     # notify
     hlist = []
@@ -127,4 +154,3 @@ class CombineMaps(Node):
     data['action'] = 'revoke' if len(hlist) == 0 else 'alert'
     #data['history'] = tuple(hlist)
     return data
-
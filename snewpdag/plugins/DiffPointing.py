@@ -7,6 +7,14 @@ Arguments:
   nside: healpix nside parameter, i.e., skymap resolution
   min_dts: minimum number of time differences in order to do calculation
   dt_field_name: default time difference field, default 'dt'
+  chunk_size: number of pixels evaluated at once (default None, all pixels).
+    Set to bound peak memory at high nside.
+  workers: number of processes evaluating pixels (default from --workers)
+  adaptive_nside: if given, evaluate the map at this coarse nside first,
+    then refine only pixels near the minimum down to nside (see AdaptiveMap)
+  adaptive_margin: refine pixels within this chi2 of the minimum (default 20)
+  adaptive_output: 'map' (default) for a full map at nside,
+    or 'moc' for a multi-order map
 
 Input payload:
   dts: a dictionary of time differences. Keys are of form (det1,det2),
@@ -26,23 +34,52 @@ Output payload:
   map: healpix map with specified nside, nested ordering.
   ndof: 2
   map_zeroes: indices of bins with 0 value (min chi2)
+  For adaptive_output 'moc', instead of map:
+    moc_uniq: pixel identifiers, 4*nside**2 + nested pixel index
+    moc_map: values of those pixels (map_zeroes indexes these)
 """
 import sys
 import logging
 import numpy as np
 import healpy as hp
 
-from snewpdag.dag import Node, Detector, DetectorDB, CelestialPixels
+from snewpdag.dag import Node, Detector, DetectorDB, CelestialPixels, PixelPool
+from snewpdag.dag import AdaptiveMap
 from astropy import units as u
 from astropy.time import Time
 
+def chi2_block(rs, i0, i1, dp, ddt, w):
+  """
+  Evaluate d^T W d for a block of directions rs, shape [3,nv].
+  dp, ddt = baselines, w = weight matrix (see DiffPointing).
+  """
+  d = np.transpose(dp @ rs) + ddt # [nv,nkeys]
+  return np.einsum('ij,ij->i', d @ w, d)
+
 class DiffPointing(Node):
+  shared = ('db',)
+
   def __init__(self, detector_location, nside, min_dts, **kwargs):
     self.db = DetectorDB(detector_location)
     self.nside = nside
     self.npix = hp.nside2npix(nside)
     self.min_dts = min_dts
     self.dt_field_name = kwargs.pop('dt_field_name', 'dt')
+    self.chunk_size = kwargs.pop('chunk_size', None)
+    self.workers = kwargs.pop('workers', None)
+    self.adaptive = None
+    if 'adaptive_nside' in kwargs:
+      try:
+        self.adaptive = AdaptiveMap(nside, kwargs.pop('adaptive_nside'),
+                                    kwargs.pop('adaptive_margin', 20.0))
+      except ValueError as e:
+        logging.error('{}: {}'.format(kwargs.get('name'), e))
+        sys.exit(2)
+    self.adaptive_output = kwargs.pop('adaptive_output', 'map')
+    if self.adaptive_output not in ('map', 'moc'):
+      logging.error('{}: unknown adaptive_output {}'.format(
+                    kwargs.get('name'), self.adaptive_output))
+      sys.exit(2)
     self.cache = {} # (det1, det2): dt, t1, t2, bias, var, dsig1, dsig2
     super().__init__(**kwargs)
 
@@ -68,7 +105,7 @@ class DiffPointing(Node):
              'dsig1': dsig1,
              'dsig2': dsig2,
            }
-    logging.info('cache ({}, {}): {}'.format(k1, k2, nrow))
+    self.log.info('cache (%s, %s): %s', k1, k2, nrow)
     return nrow
 
   def average_time(self):
@@ -92,13 +129,13 @@ class DiffPointing(Node):
     #return Time(tu, format='unix')
     return tu
 
-  def d_vectors(self, keys, directions):
+  def baselines(self, keys):
     """
-    Calculate difference vectors (nv = number of vectors)
+    Calculate detector baselines and corrected time differences.
     Arguments:
       keys = ordered list of keys of (det1, det2).
-      directions = direction hypotheses, Cartesian unit vector, shape [3,nv]
-    Returns vector as np.array with shape [nv,nkeys]
+    Returns (dp, ddt), dp with shape [nkeys,3] in seconds
+    and ddt with shape [nkeys].
     """
     rc = 1.0 / 3.0e8 # 1/(m/s)
     nkeys = len(keys) # number of detector pairs
@@ -115,10 +152,22 @@ class DiffPointing(Node):
       p2[i] = det2.get_xyz(Time(dts['t2'], format='unix'))
       i += 1
     dp = (p1 - p2) * rc # s, shape [nkeys,3]
+    self.log.info('ddt = %s', ddt)
+    self.log.info('dp = %s', dp)
+    return dp, ddt
+
+  def d_vectors(self, keys, directions, baselines=None):
+    """
+    Calculate difference vectors (nv = number of vectors)
+    Arguments:
+      keys = ordered list of keys of (det1, det2).
+      directions = direction hypotheses, Cartesian unit vector, shape [3,nv]
+      baselines = (dp, ddt) from baselines(keys), calculated if None
+    Returns vector as np.array with shape [nv,nkeys]
+    """
+    dp, ddt = self.baselines(keys) if baselines is None else baselines
     d = np.transpose(dp @ directions) # [nv,nkeys]
     d = d + ddt # broadcast adding ddt to each column
-    logging.info('ddt = {}'.format(ddt))
-    logging.info('dp = {}'.format(dp))
     return d
 
   def weight_matrix(self, keys):
@@ -129,28 +178,20 @@ class DiffPointing(Node):
     Returns matrix as np.array, columns/rows ordered as in keys.
     """
     dim = len(self.cache)
-    v = np.zeros([dim, dim])
-    i = 0
-    for k1 in keys:
-      d1 = self.cache[k1]
-      j = 0
-      for k2 in keys:
-        d2 = self.cache[k2]
-        if i == j:
-          v[i,j] = d2['var']
-        else:
-          if k1[0] == k2[0]:
-            v[i,j] = d1['dsig1'] * d2['dsig1']
-          elif k1[1] == k2[1]:
-            v[i,j] = d1['dsig2'] * d2['dsig2']
-          elif k1[0] == k2[1]:
-            v[i,j] = d1['dsig1'] * d2['dsig2']
-          elif k1[1] == k2[0]:
-            v[i,j] = d1['dsig2'] * d2['dsig1']
-        j += 1
-      i += 1
+    rows = [ self.cache[k] for k in keys ]
+    var = np.array([ r['var'] for r in rows ])
+    s1 = np.array([ r['dsig1'] for r in rows ])
+    s2 = np.array([ r['dsig2'] for r in rows ])
+    a = np.array([ k[0] for k in keys ])
+    b = np.array([ k[1] for k in keys ])
+    # off-diagonal covariance comes from the detector shared by two pairs
+    v = np.select([ a[:,np.newaxis] == a, b[:,np.newaxis] == b,
+                    a[:,np.newaxis] == b, b[:,np.newaxis] == a ],
+                  [ np.outer(s1, s1), np.outer(s2, s2),
+                    np.outer(s1, s2), np.outer(s2, s1) ], 0.0)
+    v[np.diag_indices(dim)] = var
     # then invert the matrix
-    logging.info('covariance matrix = {}'.format(v))
+    self.log.info('covariance matrix = %s', v)
     try:
       res = np.linalg.inv(v)
     except:
@@ -165,11 +206,26 @@ class DiffPointing(Node):
       res = 0
     return res
 
+  def chi2_map(self, keys, w, rs):
+    """
+    Evaluate the quadratic form d^T W d for every direction.
+    Arguments:
+      keys = ordered list of keys of (det1, det2).
+      w = weight matrix, shape [nkeys,nkeys]
+      rs = direction hypotheses, Cartesian unit vectors, shape [3,nv]
+    Directions are processed in blocks of chunk_size to bound memory,
+    spread over worker processes if there is more than one.
+    Returns np.array with shape [nv]
+    """
+    dp, ddt = self.baselines(keys)
+    pool = PixelPool(self.workers, self.chunk_size)
+    return pool.evaluate(chi2_block, rs.shape[1], (dp, ddt, np.asarray(w)), rs)
+
   def reevaluate(self, data):
     """
     Reevaluate direction based on available time differences
     """
-    keys = self.cache.keys() # keep list to preserve order
+    keys = list(self.cache.keys()) # keep list to preserve order
     w = self.weight_matrix(keys) # shape [nkeys,nkeys]
 
     # Get the average time of the observing detectors.
@@ -191,21 +247,27 @@ class DiffPointing(Node):
     ## xyz is an array of (x,y,z) unit vectors
     #rs = np.stack( (xyz.x, xyz.y, xyz.z) ) # shape (3,npix)
     cp = CelestialPixels()
-    rs = cp.get_map(self.nside, t0)
 
     # the following was used when we assumed skymap was in GCRS
     #rs = hp.pixelfunc.pix2vec(self.nside, range(self.npix), nest=True)
     # rs will be an np.array of x,y,z values, each triple a unit vector.
     # however, it'll be returned in shape (3,npix)
-    d = self.d_vectors(keys, rs) # returns shape (npix,nkeys)
-    dw = d @ w # returns shape (npix,nkeys)
-    m = np.zeros(self.npix)
-    for i in range(self.npix):
-      m[i] = np.dot(dw[i], d[i])
+    if self.adaptive == None:
+      rs = cp.get_map(self.nside, t0)
+      m = self.chi2_map(keys, w, rs) # returns shape (npix)
+    else:
+      m = self.adaptive.evaluate(lambda nside, ipix:
+            self.chi2_map(keys, w, cp.get_pixels(nside, t0, ipix)))
+      self.log.info('%s: %s pixel evaluations', self.name, self.adaptive.nevals)
+
+    map_field = 'map'
+    if self.adaptive != None and self.adaptive_output == 'moc':
+      data['moc_uniq'], m = self.adaptive.moc()
+      map_field = 'moc_map'
 
     chi2_min = m.min()
     m -= chi2_min
-    data['map'] = m
+    data[map_field] = m
     data['ndof'] = 2
     data['map_zeroes'] = np.flatnonzero(m == 0.0)
     return data
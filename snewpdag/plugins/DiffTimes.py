@@ -29,6 +29,8 @@ from snewpdag.dag import Node, Detector, DetectorDB
 from astropy.time import Time
 
 class DiffTimes(Node):
+  shared = ('db',)
+
   def __init__(self, detector_location, **kwargs):
     self.db = DetectorDB(detector_location)
     super().__init__(**kwargs)
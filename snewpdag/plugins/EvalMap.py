@@ -6,6 +6,7 @@ Arguments:
   in_field:  input field for a new time series
   in_det_field:  field containing detector identifier
   in_det_list_field:  field containing list of detectors to match
+  workers:  number of processes evaluating pixels (default from --workers)
 """
 import logging
 import numpy as np
@@ -13,11 +14,109 @@ import healpy as hp
 import scipy.special as sc
 from astropy.time import Time
 
-from snewpdag.dag import Node, CelestialPixels
+from snewpdag.dag import Node, CelestialPixels, PixelPool
 from snewpdag.dag import DetectorDB
 from snewpdag.values import Hist1D, TimeSeries
 
+def compare_profiles(cache, keys, tdelay):
+  """
+  Compare timing profiles for one sky position (set of time offsets)
+  cache = { <det> : <TimeSeries or Hist1D> }
+  keys = list of detectors
+  tdelay = time offsets in s, shape (nkeys,)
+  Return chi2-like measure.
+  """
+  # Choose Hist1D with coarsest binning to set t=0
+  # so we don't have to rebin it.
+  # if there were no Hist1D, then we'll just use first.
+  kc = None
+  max_width = 0.0
+  for k in keys:
+    if kc == None:
+      kc = k
+    v = cache[k]
+    if isinstance(v, Hist1D):
+      bin_width = v.xwidth / v.nbins # seconds
+      if bin_width > max_width:
+        max_width = bin_width
+        kc = k
+
+  # choose binning
+  v = cache[kc]
+  if max_width > 0.0:
+    ref_nbins = v.nbins
+    ref_duration = v.xwidth
+    ref_start = v.xlow # TODO: not all TimeSeries have something like this.
+    ref_reference = v.reference
+  else:
+    ref_nbins = 100
+    ref_duration = 10.0 # should really choose shortest duration TimeSeries
+    ref_start = v.start
+    ref_reference = v.reference # TODO: no such field anymore
+
+  # rebin all the time profiles, subtracting signals.
+  # Estimate signals with 1s data before reference time.
+  i = 0
+  hs = []
+  sigs = []
+  bgrs = [] # per bin
+  areas = []
+  for k in keys:
+    v = cache[k]
+    # TODO: no reference field anymore.
+    # also should use everything before burst time.
+    t0 = subtract_time(v.reference, (1,0))
+    bg = v.integral(t0, v.reference) * ref_duration / ref_nbins
+    dt = tdelay[i]
+    tstart = ref_start - dt
+    h = v.histogram(ref_nbins, tstart, tstart + ref_duration)
+    sig = h - bg
+    hs.append(h) # total counts, shape (nkeys,nbins)
+    sigs.append(sig) # shape (nkeys,nbins)
+    bgrs.append(bg)
+    a = np.sum(sig) # signal area. Could be zero or negative.
+    areas.append(a)
+    i += 1
+  nn = np.array(hs)
+  ss = np.array(sigs)
+  bb = np.array(bgrs)
+  aa = np.array(areas)
+
+  # evaluate reference signal profile
+  sigsum = np.sum(ss, 0)
+  ref = sigsum / np.sum(sigsum)
+  logging.debug('observed  = {}'.format(nn))
+  logging.debug('signal    = {}'.format(ss))
+  logging.debug('reference = {}'.format(sigsum))
+
+  # compare 
+  chi2 = 0.0
+  for i in range(len(bb)): # loop over detectors
+    for j in range(len(ref)): # loop over time bins
+      if aa[i] > 0:
+        pp = aa[i]*ref[j] + bb[i]
+        if pp > 0:
+          x = nn[i,j] * np.log(pp) - pp - sc.gammaln(nn[i,j] + 1)
+          chi2 += x
+          #logging.debug('  {},{}:  a={}, ref={}, b={}, n={} -> pp={} x={} chi2={}'.format(j,i,aa[i],ref[j],bb[i],nn[i,j],pp,x,chi2))
+  chi2 *= -2.0
+  return chi2
+
+def compare_block(rs, i0, i1, cache, keys, pd):
+  """
+  Evaluate directions rs (shape (3,nv)) for PixelPool.
+  pd = detector positions (GCRS, m), shape (nkeys, 3)
+  """
+  tdet = pd @ rs / 3.0e8 # time offsets in s, rel to Earth center
+  m = np.zeros(i1 - i0)
+  for i in range(i1 - i0):
+    logging.debug('i={} tdelays = {}'.format(i0 + i, tdet[...,i]))
+    m[i] = compare_profiles(cache, keys, tdet[...,i])
+  return m
+
 class EvalMap(Node):
+  shared = ('db',)
+
   def __init__(self, detector_location, nside, in_field, in_det_field, in_det_list_field, **kwargs):
     self.db = DetectorDB(detector_location)
     self.nside = nside
@@ -26,6 +125,7 @@ class EvalMap(Node):
     self.in_det_field = in_det_field
     self.in_det_list_field = in_det_list_field
     self.cache = {} # { <det> : <TimeSeries or Hist1D> }
+    self.workers = kwargs.pop('workers', None)
     super().__init__(**kwargs)
 
   def reference_time(self):
@@ -47,81 +147,7 @@ class EvalMap(Node):
     tdelay = time offsets in s, shape (nkeys,)
     Return chi2-like measure.
     """
-    # Choose Hist1D with coarsest binning to set t=0
-    # so we don't have to rebin it.
-    # if there were no Hist1D, then we'll just use first.
-    kc = None
-    max_width = 0.0
-    for k in keys:
-      if kc == None:
-        kc = k
-      v = self.cache[k]
-      if isinstance(v, Hist1D):
-        bin_width = v.xwidth / v.nbins # seconds
-        if bin_width > max_width:
-          max_width = bin_width
-          kc = k
-
-    # choose binning
-    v = self.cache[kc]
-    if max_width > 0.0:
-      ref_nbins = v.nbins
-      ref_duration = v.xwidth
-      ref_start = v.xlow # TODO: not all TimeSeries have something like this.
-      ref_reference = v.reference
-    else:
-      ref_nbins = 100
-      ref_duration = 10.0 # should really choose shortest duration TimeSeries
-      ref_start = v.start
-      ref_reference = v.reference # TODO: no such field anymore
-
-    # rebin all the time profiles, subtracting signals.
-    # Estimate signals with 1s data before reference time.
-    i = 0
-    hs = []
-    sigs = []
-    bgrs = [] # per bin
-    areas = []
-    for k in keys:
-      v = self.cache[k]
-      # TODO: no reference field anymore.
-      # also should use everything before burst time.
-      t0 = subtract_time(v.reference, (1,0))
-      bg = v.integral(t0, v.reference) * ref_duration / ref_nbins
-      dt = tdelay[i]
-      tstart = ref_start - dt
-      h = v.histogram(ref_nbins, tstart, tstart + ref_duration)
-      sig = h - bg
-      hs.append(h) # total counts, shape (nkeys,nbins)
-      sigs.append(sig) # shape (nkeys,nbins)
-      bgrs.append(bg)
-      a = np.sum(sig) # signal area. Could be zero or negative.
-      areas.append(a)
-      i += 1
-    nn = np.array(hs)
-    ss = np.array(sigs)
-    bb = np.array(bgrs)
-    aa = np.array(areas)
-
-    # evaluate reference signal profile
-    sigsum = np.sum(ss, 0)
-    ref = sigsum / np.sum(sigsum)
-    logging.debug('observed  = {}'.format(nn))
-    logging.debug('signal    = {}'.format(ss))
-    logging.debug('reference = {}'.format(sigsum))
-
-    # compare 
-    chi2 = 0.0
-    for i in range(len(bb)): # loop over detectors
-      for j in range(len(ref)): # loop over time bins
-        if aa[i] > 0:
-          pp = aa[i]*ref[j] + bb[i]
-          if pp > 0:
-            x = nn[i,j] * np.log(pp) - pp - sc.gammaln(nn[i,j] + 1)
-            chi2 += x
-            #logging.debug('  {},{}:  a={}, ref={}, b={}, n={} -> pp={} x={} chi2={}'.format(j,i,aa[i],ref[j],bb[i],nn[i,j],pp,x,chi2))
-    chi2 *= -2.0
-    return chi2
+    return compare_profiles(self.cache, keys, tdelay)
 
   def reevaluate(self, data):
     # get directions to evaluate
@@ -139,14 +165,10 @@ class EvalMap(Node):
       det = self.db.get(k) # Detector object
       pd[i] = det.get_xyz(t0a) # GCRS coordinates at time [m]
       i += 1
-    tdet = pd @ rs / 3.0e8 # time offsets in s, rel to Earth center
-    # shape of tdet should be (nkeys,npix)
 
     # get reference signal profile for each pixel's hypothetical direction
-    m = np.zeros(self.npix)
-    for i in range(self.npix):
-      logging.debug('i={} tdelays = {}'.format(i, tdet[...,i]))
-      m[i] = self.compare(keys, tdet[...,i])
+    pool = PixelPool(self.workers)
+    m = pool.evaluate(compare_block, self.npix, (self.cache, keys, pd), rs)
 
     #logging.debug('{}: map {}'.format(self.name, m))
     chi2_min = m.min()
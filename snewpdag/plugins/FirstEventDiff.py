@@ -50,8 +50,8 @@ class FirstEventDiff(Node):
     tf2 = np.min(tsr2.times)
     dtf = tf1 - tf2
 
-    logging.info('{}: t1 = {}, true = {}, relative = {}'.format(self.name, tf1, true_t1, tf1 - true_t1))
-    logging.info('{}: t2 = {}, true = {}, relative = {}'.format(self.name, tf2, true_t2, tf2 - true_t2))
+    self.log.info('%s: t1 = %s, true = %s, relative = %s', self.name, tf1, true_t1, tf1 - true_t1)
+    self.log.info('%s: t2 = %s, true = %s, relative = %s', self.name, tf2, true_t2, tf2 - true_t2)
 
     # subtract off one of the first times
     base = tf1 if tf1 < tf2 else tf2
@@ -82,7 +82,7 @@ class FirstEventDiff(Node):
 
     # deviation (diff - expected diff)
     dev = dtf - dte
-    logging.debug('{}: dtf = {}, dte = {}, dev = {}'.format(self.name, dtf, dte, dev))
+    self.log.debug('%s: dtf = %s, dte = %s, dev = %s', self.name, dtf, dte, dev)
 
     # uncertainty estimate
     #sigma2 = et1sq + et2sq - et1*et1 - et2*et2
@@ -98,8 +98,8 @@ class FirstEventDiff(Node):
     rms = np.sqrt(sigma2)
     rms_fudge = rms * self.sigma_fudge
     #logging.debug('{}: et1sq = {}, et2sq = {}, et1 = {}, et2 = {}'.format(self.name, et1sq, et2sq, et1, et2))
-    logging.debug('{}: et1sq = {}, et2sq = {}, et1asq = {}'.format(self.name, et1sq, et2sq, et1asq))
-    logging.debug('{}: et1 = {}, et2 = {}, et1a = {}'.format(self.name, et1, et2, et1a))
+    self.log.debug('%s: et1sq = %s, et2sq = %s, et1asq = %s', self.name, et1sq, et2sq, et1asq)
+    self.log.debug('%s: et1 = %s, et2 = %s, et1a = %s', self.name, et1, et2, et1a)
 
     # pull (either self.true_lag or true_dt12 could be zero if not set before)
     dt_true = dev - self.true_lag - true_dt12
@@ -27,12 +27,12 @@ class FirstEventTime(Node):
     ts, valid = fetch_field(data, self.in_field) # TimeSeries
     if not valid:
       return False
-    t1 = np.min(ts.times)
-    logging.debug('t1 = {}'.format(t1))
+    t1 = ts.first()
+    self.log.debug('t1 = %s', t1)
     store_field(data, self.out_field, t1)
     t0, valid = fetch_field(data, self.in_truth_field)
     if valid:
-      logging.debug('t0 = {}'.format(t0))
+      self.log.debug('t0 = %s', t0)
       dt = t1 - t0
       store_field(data, self.out_delta_field, dt)
     return True
@@ -29,15 +29,25 @@ Output json:
     error_sum, error_sum2 (default 0.0)
     (doesn't delete input field, since it's not much data
     and may be part of an aggregate)
+
+The field can be a number or an array of numbers, and a batch of trials
+is filled all at once.  Non-finite values are skipped.  The histogram
+is kept in a values.Hist1D, which is filled with np.bincount and keeps
+numerically stable running moments (mean and std are calculated from
+those rather than from sum and sum2).  Values below xlow are underflow
+(bins are numbered with floor()).
 """
 import sys
 import logging
 import math
+import numbers
 import numpy as np
 
 from snewpdag.dag import Node
+from snewpdag.values import Hist1D
 
 class Histogram1D(Node):
+  batch = True
   def __init__(self, nbins, xlow, xhigh, in_field, **kwargs):
     self.nbins = nbins
     self.xlow = xlow
@@ -54,12 +64,7 @@ class Histogram1D(Node):
     self.clear()
 
   def clear(self):
-    self.bins = np.zeros(self.nbins)
-    self.overflow = 0.0
-    self.underflow = 0.0
-    self.sum = 0.0
-    self.sum2 = 0.0
-    self.count = 0
+    self.hist = Hist1D(self.nbins, self.xlow, self.xhigh)
     self.changed = True
     self.error_sum = 0.0
     self.error_sum2 = 0.0
@@ -68,6 +73,14 @@ class Histogram1D(Node):
     self.sys_sum = 0.0
     self.sys_sum2 = 0.0
 
+  # contents, kept in the Hist1D
+  bins = property(lambda self: self.hist.bins)
+  underflow = property(lambda self: self.hist.underflow)
+  overflow = property(lambda self: self.hist.overflow)
+  sum = property(lambda self: self.hist.sum)
+  sum2 = property(lambda self: self.hist.sum2)
+  count = property(lambda self: self.hist.count)
+
   def fill(self, data):
     if self.field in data:
       if self.index != None:
@@ -76,55 +89,79 @@ class Histogram1D(Node):
             if isinstance(self.index2, int) or self.index2 in data[self.field][self.index]:
               x = data[self.field][self.index][self.index2]
             else:
-              logging.info('{0}: index2 {1} not found in data'.format(
-                           self.name, self.index2))
-              logging.info('data = {}'.format(data[self.field][self.index]))
+              self.log.info('%s: index2 %s not found in data', self.name, self.index2)
+              self.log.info('data = %s', data[self.field][self.index])
               return
           else:
             x = data[self.field][self.index]
         else:
-          logging.info('{0}: index {1} not found in data'.format(
-                       self.name, self.index))
+          self.log.info('%s: index %s not found in data', self.name, self.index)
           return
       else:
         x = data[self.field]
     else:
       # field not in data
-      logging.info('{0}: field {1} not found in data'.format(self.name, self.field))
-      return
-
-    try:
-      # need to protect against invalid values
-      #logging.info('Received in {0}: {1}'.format(self.name, x))
-      #logging.info('Indices {} / {} / {}'.format(self.field, self.index, self.index2))
-      ix = int(self.nbins * (x - self.xlow) / (self.xhigh - self.xlow))
-    except:
-      logging.info('Calculation error in {0}: {1}'.format(self.name, sys.exc_info()))
+      self.log.info('%s: field %s not found in data', self.name, self.field)
       return
 
-    if ix < 0:
-      self.underflow += 1.0
-    elif ix >= self.nbins:
-      self.overflow += 1.0
+    if isinstance(x, numbers.Real) and 'batch' not in data:
+      # a single value, the usual case for one trial per alert
+      if self.hist.fill_one(float(x)) == 0:
+        return
+      ok = None
     else:
-      self.bins[ix] += 1.0
-    self.sum += x
-    self.sum2 += x*x
+      try:
+        # need to protect against invalid values
+        x = np.asarray(x, dtype=np.float64)
+        if 'batch' in data and x.ndim == 0:
+          x = np.broadcast_to(x, (data['batch'],)) # same for every trial
+      except:
+        self.log.info('Calculation error in %s: %s', self.name, sys.exc_info())
+        return
+      ok = np.isfinite(x)
+      if self.hist.fill(x[ok]) == 0:
+        return
 
     if self.field+"_err" in data:
-      x_error = data[self.field+"_err"]
-      self.error_sum += x_error
-      self.error_sum2 += x_error**2
+      x_error = self.values(data[self.field+"_err"], ok)
+      self.error_sum += np.sum(x_error)
+      self.error_sum2 += np.sum(x_error**2)
 
-      x_stats = data[self.field+"_stats"]
-      self.stats_sum += x_stats
-      self.stats_sum2 += x_stats**2
+      x_stats = self.values(data[self.field+"_stats"], ok)
+      self.stats_sum += np.sum(x_stats)
+      self.stats_sum2 += np.sum(x_stats**2)
 
-      x_sys = data[self.field+"_sys"]
-      self.sys_sum += x_sys
-      self.sys_sum2 += x_sys**2
+      x_sys = self.values(data[self.field+"_sys"], ok)
+      self.sys_sum += np.sum(x_sys)
+      self.sys_sum2 += np.sum(x_sys**2)
 
-    self.count += 1
+    self.changed = True
+
+  def values(self, v, ok):
+    """
+    Values of v for the filled values (ok is their mask, or None if
+    a single value was filled).
+    """
+    if ok is None:
+      return v
+    return np.broadcast_to(np.asarray(v, dtype=np.float64), ok.shape)[ok]
+
+  errors = ('error_sum', 'error_sum2', 'stats_sum', 'stats_sum2',
+            'sys_sum', 'sys_sum2')
+
+  def state(self):
+    d = { k: getattr(self, k) for k in Histogram1D.errors }
+    d['hist'] = self.hist.copy()
+    return d
+
+  def merge(self, state):
+    if not self.hist.is_compatible(state['hist']):
+      self.log.warning('%s: cannot merge a histogram with different bins',
+                       self.name)
+      return
+    self.hist.merge(state['hist'])
+    for k in Histogram1D.errors:
+      setattr(self, k, getattr(self, k) + state[k])
     self.changed = True
 
   def summary(self):
@@ -166,15 +203,10 @@ class Histogram1D(Node):
     return d
 
   def mean(self):
-    return math.nan if self.count == 0 else self.sum / self.count
+    return math.nan if self.count == 0 else self.hist.mean()
 
   def variance(self):
-    if self.count == 0:
-      return math.nan
-    else:
-      x = self.sum / self.count
-      xx = self.sum2 / self.count
-      return xx - x*x
+    return math.nan if self.count == 0 else self.hist.variance()
 
   def alert(self, data):
     self.fill(data)
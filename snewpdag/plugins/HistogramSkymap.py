@@ -45,6 +45,12 @@ class HistogramSkymap(Node):
   def revoke(self, data):
     return False
 
+  def state(self):
+    return { 'm': self.m.copy() }
+
+  def merge(self, state):
+    self.m += state['m']
+
   def report(self, data):
     mm = self.m # default copy of references
     me = mm
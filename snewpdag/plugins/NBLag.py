@@ -17,7 +17,7 @@ import logging
 import numpy as np
 import scipy.special as sc
 
-from snewpdag.dag import Node, LogTable
+from snewpdag.dag import Node, LogTable, LagScan
 from snewpdag.values import Hist1D, TimeSeries
 
 class NBLag(Node):
@@ -35,8 +35,10 @@ class NBLag(Node):
     self.fixed_ref = fixed_ref
     self.bg = kwargs.pop('bg', {}) # background rate per second
     self.cache = {} # { <det>: <TimeSeries> }
+    self.scans = {} # { <det>: <LagScan> }
     self.last_burst_report = -1 # only forward one report per burst id
     self.lt = LogTable()
+    self.xcache = {} # { (n, m, a): xprod } kept over one lag scan
     super().__init__(**kwargs)
 
   def xlognm(self, k1, k2, dt):
@@ -53,8 +55,8 @@ class NBLag(Node):
     # are included.  So we'll set the nominal start time 100ms
     # after the first event in w1.  Then when dt varies over its range,
     # both timeseries will start before the signal really turns on.
-    st1 = np.min(w1.times)
-    st2 = np.min(w2.times)
+    st1 = w1.first()
+    st2 = w2.first()
     st = st1 if st1 > st2 else st2
     st = st + 0.100 # 100ms buffer time
     h1, edges = w1.histogram(self.tnbins, st, st + self.twidth)
@@ -119,24 +121,39 @@ class NBLag(Node):
     return x
 
   def xprod(self, n, m, a, b, c):
-    v = np.zeros((n+1, m+1))
-    #ab = - np.log((1.0 + a)*b)
-    #ac = np.log(a / ((1.0 + a)*c))
     la = np.log(a)
     la1 = np.log(a+1.0)
-    for r in range(n+1):
-      #logging.info('{}: n={}, m={}, r={}'.format(self.name, n, m, r))
-      j = np.arange(m+1)
-      #v[r] = j*ac + r*ab + self.lt.logfact(j+r) \
-      #       - self.lt.logfact(r) - self.lt.logfact(n-r) \
-      #       - self.lt.logfact(j) - self.lt.logfact(m-j)
-      v[r] = (j+r)*la1 - j*la - self.lt.logfact(r) - self.lt.logfact(j) \
-             + self.lt.logfact(m+n-j-r) - self.lt.logfact(m-j) \
-             - self.lt.logfact(n-r)
+    r = np.arange(n+1)[:,np.newaxis]
+    j = np.arange(m+1)
+    v = (j+r)*la1 - j*la - self.lt.logfact(r) - self.lt.logfact(j) \
+        + self.lt.logfact(m+n-j-r) - self.lt.logfact(m-j) \
+        - self.lt.logfact(n-r)
     x = sc.logsumexp(v) # sums over all elements
     #logging.info('{}: logsumexp = {}'.format(self.name, x))
     return x
 
+  def xprods(self, h1, h2, a, b, c):
+    """
+    Sum of xprod over time bins for every row of h2.
+    h1:  counts of the first detector, shape (nbins,)
+    h2:  counts of the second detector, shape (nlags, nbins)
+    a:  signal yield ratio for each row, shape (nlags,)
+    Bins sharing the same (n, m, a) are evaluated once,
+    and the values are kept in self.xcache for reuse.
+    """
+    h2 = np.atleast_2d(h2)
+    ns = np.broadcast_to(h1, h2.shape)
+    aa = np.broadcast_to(np.reshape(a, (-1, 1)), h2.shape)
+    keys = np.stack((ns.ravel(), h2.ravel(), aa.ravel()), axis=1)
+    u, inv = np.unique(keys, axis=0, return_inverse=True)
+    vals = np.empty(len(u))
+    for i in range(len(u)):
+      key = (int(u[i,0]), int(u[i,1]), u[i,2])
+      if key not in self.xcache:
+        self.xcache[key] = self.xprod(key[0], key[1], key[2], b, c)
+      vals[i] = self.xcache[key]
+    return np.sum(np.reshape(vals[inv], h2.shape), axis=1)
+
   def xprodnm(self, k1, k2, dt):
     w1 = self.cache[k1]
     w2 = self.cache[k2]
@@ -151,12 +168,21 @@ class NBLag(Node):
     # are included.  So we'll set the nominal start time 100ms
     # after the first event in w1.  Then when dt varies over its range,
     # both timeseries will start before the signal really turns on.
-    st1 = np.min(w1.times)
-    st2 = np.min(w2.times)
+    st1 = w1.first()
+    st2 = w2.first()
     st = st1 if st1 > st2 else st2
     st = st + 0.100 # 100ms buffer time
     h1, edges = w1.histogram(self.tnbins, st, st + self.twidth)
     h2, edges = w2.histogram(self.tnbins, st - dt, st - dt + self.twidth)
+    x = self.xprodh(k1, k2, h1, h2)
+    self.log.debug('%s: dt = %s, x = %s', self.name, dt, x)
+    return x
+
+  def xprodh(self, k1, k2, h1, h2):
+    """
+    Log likelihood summed over time bins, given the histograms
+    h1 of detector k1 and h2 of detector k2.
+    """
     #x = np.sum(sc.gammaln(h1 + h2 + 1.0) - sc.gammaln(h2 + 1.0))
 
     # need to determine a = signal yield ratio for h2/h1,
@@ -168,13 +194,32 @@ class NBLag(Node):
     b = self.bg.get(k1, 0.0) * self.twidth / self.tnbins
     c = self.bg.get(k2, 0.0) * self.twidth / self.tnbins
 
-    x = 0.0
-    for k in range(self.tnbins):
-      s = self.xprod(h1[k], h2[k], a, b, c)
-      #logging.info('{}: time bin = {}, s = {}'.format(self.name, k, s))
-      x = x + s
-    logging.info('{}: dt = {}, x = {}'.format(self.name, dt, x))
-    return x
+    return self.xprods(h1, h2, a, b, c)[0]
+
+  def xprodnm_scan(self, k1, k2, dt):
+    """
+    Log likelihood (as in xprodnm) for an array of lags dt.
+    Each series is binned once for all lags.
+    """
+    ls1 = self.scans[k1]
+    ls2 = self.scans[k2]
+    if len(ls1) == 0 or len(ls2) == 0:
+      logging.error('{}: w1 or w2 empty'.format(self.name))
+      logging.error('{}: k1 = {}, len(w1) = {}'.format(self.name, k1, len(ls1)))
+      logging.error('{}: k2 = {}, len(w2) = {}'.format(self.name, k2, len(ls2)))
+      return np.zeros(len(dt))
+    st = max(ls1.first(), ls2.first()) + 0.100 # 100ms buffer time
+    h1 = ls1.histogram(self.tnbins, st, st + self.twidth)
+    h2 = ls2.histograms(self.tnbins, st - dt, self.twidth)
+
+    # a = signal yield ratio for h2/h1 at each lag,
+    # b is background (per bin) for h1, and c is background for h2.
+    s1 = np.sum(h1) - self.bg.get(k1, 0.0) * self.twidth
+    s2 = np.sum(h2, axis=1) - self.bg.get(k2, 0.0) * self.twidth
+    a = s2 / s1
+    b = self.bg.get(k1, 0.0) * self.twidth / self.tnbins
+    c = self.bg.get(k2, 0.0) * self.twidth / self.tnbins
+    return self.xprods(h1, h2, a, b, c)
 
   def lag(self, k1, kref):
     # find best lag
@@ -187,8 +232,8 @@ class NBLag(Node):
     dt = np.arange(t0, t1, hdt)
     if k1 == kref:
       return { 'dt': 0.0,
-               't1': np.min(self.cache[k1].times), \
-               't2': np.min(self.cache[kref].times), \
+               't1': self.scans[k1].first(), \
+               't2': self.scans[kref].first(), \
                'bias': 0.0, 'var': 0.0, 'dsig1': 0.0, 'dsig2': 0.0, \
                'profile_x': dt, 'profile_y': np.zeros_like(dt) }
 
@@ -198,12 +243,13 @@ class NBLag(Node):
     # but it puts the larger detector first in tests,
     # which is what we need to avoid having to use the weights in logsumexp
     #y = np.array([ self.xlognm(kref, k1, dt[i]) for i in range(len(dt)) ])
-    y = np.array([ self.xprodnm(k1, kref, dt[i]) for i in range(len(dt)) ])
+    self.xcache = {}
+    y = self.xprodnm_scan(k1, kref, dt)
     yb = np.argmax(y)
 
     return { 'dt': dt[yb],
-             't1': np.min(self.cache[k1].times), \
-             't2': np.min(self.cache[kref].times), \
+             't1': self.scans[k1].first(), \
+             't2': self.scans[kref].first(), \
              'bias': 0.0, 'var': 0.0, 'dsig1': 0.0, 'dsig2': 0.0, \
              'profile_x': dt, 'profile_y': y }
 
@@ -224,6 +270,7 @@ class NBLag(Node):
   def alert(self, data):
     if self.in_field in data and self.in_det_field in data:
       self.cache[data[self.in_det_field]] = data[self.in_field]
+      self.scans[data[self.in_det_field]] = LagScan(data[self.in_field])
       if self.in_det_list_field in data:
         if set(self.cache.keys()) == set(data[self.in_det_list_field]):
           return self.reevaluate(data)
@@ -234,12 +281,14 @@ class NBLag(Node):
       k = data[self.in_det_field]
       if k in self.cache:
         del self.cache[k]
+        del self.scans[k]
         return True
     return False
 
   def reset(self, data):
     if len(self.cache) > 0:
       self.cache = {}
+      self.scans = {}
       return True
     else:
       return False
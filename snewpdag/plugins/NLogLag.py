@@ -17,7 +17,7 @@ import logging
 import numpy as np
 import scipy.special as sc
 
-from snewpdag.dag import Node
+from snewpdag.dag import Node, LagScan
 from snewpdag.values import Hist1D, TimeSeries
 
 class NLogLag(Node):
@@ -34,6 +34,7 @@ class NLogLag(Node):
     self.out_lags_field = out_lags_field
     self.fixed_ref = fixed_ref
     self.cache = {} # { <det>: <TimeSeries> }
+    self.scans = {} # { <det>: <LagScan> }
     self.last_burst_report = -1 # only forward one report per burst id
     super().__init__(**kwargs)
 
@@ -45,13 +46,30 @@ class NLogLag(Node):
       logging.error('{}: k1 = {}, len(w1) = {}'.format(self.name, k1, len(w1.times)))
       logging.error('{}: k2 = {}, len(w2) = {}'.format(self.name, k2, len(w2.times)))
       return 0.0
-    st1 = np.min(w1.times) - 0.100 # 100ms lead time
+    st1 = w1.first() - 0.100 # 100ms lead time
     #st1 = np.min(w1.times) - 2.0 # 1100ms lead time (FA)
     h1, edges = w1.histogram(self.tnbins, st1, st1 + self.twidth)
     h2, edges = w2.histogram(self.tnbins, st1 - dt, st1 - dt + self.twidth)
     x = np.sum(sc.gammaln(h1 + h2 + 1.0) - sc.gammaln(h2 + 1.0))
     return x
 
+  def xlognm_scan(self, k1, k2, dt):
+    """
+    Log likelihood (as in xlognm) for an array of lags dt.
+    Each series is binned once for all lags.
+    """
+    s1 = self.scans[k1]
+    s2 = self.scans[k2]
+    if len(s1) == 0 or len(s2) == 0:
+      logging.error('{}: w1 or w2 empty'.format(self.name))
+      logging.error('{}: k1 = {}, len(w1) = {}'.format(self.name, k1, len(s1)))
+      logging.error('{}: k2 = {}, len(w2) = {}'.format(self.name, k2, len(s2)))
+      return np.zeros(len(dt))
+    st1 = s1.first() - 0.100 # 100ms lead time
+    h1 = s1.histogram(self.tnbins, st1, st1 + self.twidth)
+    h2 = s2.histograms(self.tnbins, st1 - dt, self.twidth)
+    return np.sum(sc.gammaln(h1 + h2 + 1.0) - sc.gammaln(h2 + 1.0), axis=1)
+
   def lag(self, k1, kref):
     if k1 == kref:
       return (0.0, 0.0)
@@ -64,12 +82,12 @@ class NLogLag(Node):
     #t1 = 1.0
     dt = np.arange(t0, t1, hdt)
     # estimate the error by calculating the second derivative
-    y = np.array([ self.xlognm(k1, kref, dt[i]) for i in range(len(dt)) ])
+    y = self.xlognm_scan(k1, kref, dt)
     yb = np.argmax(y)
 
     return { 'dt': dt[yb], \
-             't1': np.min(self.cache[k1].times), \
-             't2': np.min(self.cache[kref].times), \
+             't1': self.scans[k1].first(), \
+             't2': self.scans[kref].first(), \
              'bias': 0.0, 'var': 0.0, 'dsig1': 0.0, 'dsig2': 0.0, \
              'profile_x': dt, 'profile_y': y }
 
@@ -90,6 +108,7 @@ class NLogLag(Node):
   def alert(self, data):
     if self.in_field in data and self.in_det_field in data:
       self.cache[data[self.in_det_field]] = data[self.in_field]
+      self.scans[data[self.in_det_field]] = LagScan(data[self.in_field])
       if self.in_det_list_field in data:
         if set(self.cache.keys()) == set(data[self.in_det_list_field]):
           return self.reevaluate(data)
@@ -100,12 +119,14 @@ class NLogLag(Node):
       k = data[self.in_det_field]
       if k in self.cache:
         del self.cache[k]
+        del self.scans[k]
         return True
     return False
 
   def reset(self, data):
     if len(self.cache) > 0:
       self.cache = {}
+      self.scans = {}
       return True
     else:
       return False
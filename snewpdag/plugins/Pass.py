@@ -13,6 +13,8 @@ import logging
 from snewpdag.dag import Node
 
 class Pass(Node):
+  batch = True # counts a batch of trials as that many alerts
+
   def __init__(self, **kwargs):
     self.line = kwargs.pop('line', 100)
     self.dump = kwargs.pop('dump', 0)
@@ -28,8 +30,8 @@ class Pass(Node):
         print('{0}{1}: {2}'.format(indent, k, repr(v)))
 
   def alert(self, data):
-    self.count += 1
-    logging.debug('{}: alert'.format(self.name))
+    self.count += data['batch'] if 'batch' in data else 1
+    self.log.debug('%s: alert', self.name)
     if self.line > 0:
       if self.count == 1 or self.count % self.line == 0:
         print('{0}: received {1} alerts'.format(self.name, self.count))
@@ -41,7 +43,7 @@ class Pass(Node):
     return True
 
   def revoke(self, data):
-    logging.debug('{}: revoke'.format(self.name))
+    self.log.debug('%s: revoke', self.name)
     if self.dump > 0:
       print('>>>> {0} >>>> ({1}) revoke'.format(self.name, self.count))
       self.print_dict('', data)
@@ -49,14 +51,14 @@ class Pass(Node):
     return True
 
   def report(self, data):
-    logging.debug('{}: report'.format(self.name))
+    self.log.debug('%s: report', self.name)
     print('>>>> {0} >>>> ({1}) report'.format(self.name, self.count))
     self.print_dict('', data)
     print('<<<< {} <<<<'.format(self.name))
     return True
 
   def reset(self, data):
-    logging.debug('{}: reset'.format(self.name))
+    self.log.debug('%s: reset', self.name)
     if self.dump > 0:
       print('>>>> {0} >>>> ({1}) reset'.format(self.name, self.count))
       self.print_dict('', data)
@@ -63,15 +63,7 @@ class ShapeComparison(Node):
 
 
   def metric_list(self, values1, values2):
-    mlist = [0.0] * self.dt_N
-
-    hist2 = SHF.fill_hist(self.h_bins, self.h_low, self.h_up, values2, 0.0)
-    hist2 = SHF.remove_flow(hist2)
-    for i in range(self.dt_N):
-      hist1 = SHF.fill_hist(self.h_bins, self.h_low, self.h_up, values1, self.dt0 + i*self.dt_step)
-      hist1 = SHF.remove_flow(hist1)
-      metric = SHF.diff_hist(hist1, hist2, self.scale)
-
-      mlist[i] = metric
-
-    return mlist
+    # metric for all dt shifts at once
+    return SHF.metric_scan(self.h_bins, self.h_low, self.h_up,
+                           values1, values2, self.scale,
+                           self.dt0, self.dt_step, self.dt_N)
@@ -1,38 +1,64 @@
-import math
+"""
+ShapeHistFunctions: histogram and metric functions for shape comparisons
+(ShapeComparison, BayesianBlocks)
+
+Values are binned with np.searchsorted on the bin edges, and
+metric_scan() fills the histograms and evaluates the metric for all
+dt shifts of a scan as 2-D arrays (one row per shift).
+"""
 import numpy as np
 
+chunk_values = 1 << 22 # number of shifted values binned at once
 
-def fill_hist(h_bins, h_low, h_up, values, dt_offset):
-  bin_width = (float(h_up) - float(h_low)) / float(h_bins)
-  hist = [0.0] * (h_bins + 2) #add 2 extra bins for underflow and overflow
-
-  for i in range(0, len(values)):
-    v = values[i] + dt_offset
-    filled = False
-
-    for ii in range(0, h_bins):
-      if v >= (ii * bin_width + h_low) and v < ((ii+1) * bin_width + h_low):
-        hist[ii+1] += 1
-        filled = True
-        break
 
-    if filled == True:
-      continue
-    elif v < h_low:
-      hist[0] += 1
-    elif v >= h_up:
-      hist[len(hist)-1] += 1
+def flow_hists(h_bins, h_low, h_up, values, dt_offsets):
+  """
+  Normalised histograms of values + dt for each dt in dt_offsets,
+  as a 2-D array with one row per offset.  Each row has h_bins bins
+  plus underflow (first) and overflow (last) bins, and is normalised
+  to the number of values which aren't in the flow bins.
+  """
+  bin_width = (float(h_up) - float(h_low)) / float(h_bins)
+  edges = np.arange(h_bins + 1) * bin_width + h_low
+  v = np.asarray(values, dtype=np.float64)
+  dts = np.asarray(dt_offsets, dtype=np.float64)
+  nv = len(v)
+  hists = np.zeros((len(dts), h_bins + 2))
+  step = max(1, chunk_values // max(1, nv))
+  for r0 in range(0, len(dts), step):
+    x = v[np.newaxis, :] + dts[r0:r0+step, np.newaxis]
+    nr = x.shape[0]
+    ix = np.searchsorted(edges, x, side='right') # bin ix-1 if 1 <= ix <= h_bins
+    # values between the last edge and h_up (rounding) aren't filled
+    inside = (ix >= 1) & (ix <= h_bins)
+    rows = np.broadcast_to(np.arange(nr)[:, np.newaxis], x.shape)
+    h = np.bincount(rows[inside] * (h_bins + 2) + ix[inside],
+                    minlength=nr * (h_bins + 2)).reshape(nr, h_bins + 2)
+    h[:, 0] = np.count_nonzero(x < h_low, axis=1)
+    h[:, -1] = np.count_nonzero((x >= h_up) & ~inside, axis=1)
+    hists[r0:r0+nr] = h
+  # normalise excluding flow bins
+  return hists / (float(nv) - hists[:, :1] - hists[:, -1:])
 
-  hist = [float(x)/float(float(len(values))-hist[0]-hist[-1]) for x in hist] #normalise excluding flow bins
 
-  return hist
+def fill_hist(h_bins, h_low, h_up, values, dt_offset):
+  return flow_hists(h_bins, h_low, h_up, values, [ dt_offset ])[0]
 
 
 def remove_flow(hist): #remove the flow bins
-  hist.remove(hist[-1])
-  hist.remove(hist[0])
+  return hist[1:-1]
+
 
-  return hist
+def diff_metric(hists1, hist2, scale):
+  """
+  Metric between each row of hists1 and hist2.
+  """
+  h1 = np.atleast_2d(hists1)
+  h2 = np.asarray(hist2, dtype=np.float64)
+  h1max = np.max(h1, axis=1, keepdims=True) * scale
+  h2max = np.max(h2) * scale
+  sum_hist = np.where((h1 != 0) & (h2 != 0), h1 + h2, h1max + h2max)
+  return np.sum(sum_hist * np.abs(h2 - h1), axis=1)
 
 
 def diff_hist(hist1, hist2, scale):
@@ -40,25 +66,23 @@ def diff_hist(hist1, hist2, scale):
     print("histograms with different number of bins cannot be merged!")
     exit()
 
-  h1max = max(hist1) * scale
-  h2max = max(hist2) * scale
-  sum_hist = [0.0] * len(hist1)
-  for i in range(len(sum_hist)):
-    if hist1[i] != 0 and hist2[i] != 0:
-      sum_hist[i] = hist1[i] + hist2[i]
-    else:
-      sum_hist[i] = h1max + h2max
-  diff_hist = [abs(hist2[ii] - hist1[ii]) for ii in range(len(hist1))]
+  return diff_metric(hist1, hist2, scale)[0]
 
-  metric = 0
-  for iii in range(len(diff_hist)):
-    metric += sum_hist[iii] * diff_hist[iii]
 
-  return metric
+def metric_scan(h_bins, h_low, h_up, values1, values2, scale, dt0, dt_step, dt_N):
+  """
+  Metric between the histogram of values2 and that of values1 shifted by
+  dt0 + i*dt_step, for i in range(dt_N).
+  """
+  dts = dt0 + np.arange(dt_N) * dt_step
+  hist2 = remove_flow(fill_hist(h_bins, h_low, h_up, values2, 0.0))
+  hists1 = flow_hists(h_bins, h_low, h_up, values1, dts)[:, 1:-1]
+  return diff_metric(hists1, hist2, scale)
 
 
 def minimise(mlist, dt0, dt_step, dt_N, polyN, fit_range):
-  dt_list = [(dt0 + i*dt_step) for i in range(dt_N)]
+  dt_list = dt0 + np.arange(dt_N) * dt_step
+  mlist = np.asarray(mlist, dtype=np.float64)
 
   #setting fit range
   i_fit_range = int(fit_range / dt_step) + 1
@@ -71,19 +95,12 @@ def minimise(mlist, dt0, dt_step, dt_N, polyN, fit_range):
     i_up = i_min_metric + i_fit_range
   coeff = np.polyfit(dt_list[i_low:i_up], mlist[i_low:i_up], polyN) #polynomial fit, coeff[0]*x^polyN + coeff[1]*x^(polyN-1) + ...
 
-  min_dt = 0
-  func_prev = 0
-  for ii in range(len(dt_list)):
-    func = 0
-    for iii in range(polyN):
-      func += coeff[iii] * (polyN - iii) * pow(dt_list[ii], polyN-1-iii)
-
-    if ii == 0:
-      func_prev = func
-      continue
-    if func * func_prev <= 0:
-      min_dt = (dt_list[ii] + dt_list[ii-1])/2.0
-      break
-    func_prev = func
-
-  return min_dt
+  # derivative of the fit at each dt, for the first sign change
+  func = np.zeros(dt_N)
+  for iii in range(polyN):
+    func += coeff[iii] * (polyN - iii) * np.power(dt_list, polyN-1-iii)
+  change = np.nonzero(func[1:] * func[:-1] <= 0)[0]
+  if len(change) == 0:
+    return 0
+  ii = change[0] + 1
+  return (dt_list[ii] + dt_list[ii-1])/2.0
@@ -16,6 +16,12 @@ Data assumptions:
     - both time series do not necessary need to start at the same time, but the time t0 from which t1 and t2 are counted should be the same
     - first 1000 bins of each data have not SN emission (they are used for background calculation)
 
+Each source's time distribution is prepared once when it arrives
+(peak time, background, cumulative sums), and the delay of a pair is
+only recalculated when one of its sources changes.  The chi2 for all
+trial delays is calculated at once from the cumulative sums, and the
+delay is refined by a parabola through the minimum and its neighbours.
+
 
 Authors: V. Kulikovskiy (kulikovs@ge.infn.it), M. Colomer, J. Tseng
 The algorithm is adapted from github.com/SNEWS2/lightcurve_match.
@@ -28,6 +34,8 @@ from snewpdag.dag import Node
 class TimeDistDiff(Node):
   def __init__(self, **kwargs):
     self.map = {}
+    self.series = {} # prepared time distribution for each source
+    self.delays = {} # (delay, chi2) for each pair of sources
     super().__init__(**kwargs)
 
   def update(self, data):
@@ -40,6 +48,9 @@ class TimeDistDiff(Node):
         self.map[source] = data.copy()
         self.map[source]['history'] = data['history'].copy() # keep local copy
         self.map[source]['valid'] = True
+        self.series[source] = prepare(data['t_low'], data['t_bins'])
+        self.delays = { k: v for k, v in self.delays.items()
+                        if source not in k }
       else:
         logging.error('[{}] Expected t_low and t_bins arrays in time distribution'.format(self.name))
         return
@@ -71,7 +82,9 @@ class TimeDistDiff(Node):
         for j in self.map:
             if i < j:
                 #here the main time difference calculation comes
-                result = gettdelay(self.map[i]['t_low'],self.map[i]['t_bins'],self.map[j]['t_low'],self.map[j]['t_bins'])
+                if (i, j) not in self.delays:
+                    self.delays[(i, j)] = scan(self.series[i], self.series[j])
+                result = self.delays[(i, j)][0]
     data['tdelay'] = result
     # notify
     # (JCT: notify if have a diff to forward)
@@ -85,77 +98,99 @@ class TimeDistDiff(Node):
       data['history'].combine(hlist)
       self.notify(action_verb, data)
     #print('I notify', data, result)
-      
-#normalise time series for chi2
-#returns err^2 as a second output
-def normalizeforchi2(n1,t1,windowleft,windowright):
-    nerr1 = n1
-    bg = np.mean(n1[0:1000])
-    n1 = n1-bg ##background is considered in the first 1000 points of data
-    mean = np.sum(n1[(windowleft <= t1) & (t1 <= windowright)])
-    if mean < 0: print("WARNING: first 1000 bins of data have abnormal event rate")
-    return n1/mean, nerr1/mean/mean
-
-def gettdelay(t1,n1,t2,n2):
-    t1 = np.array(t1)
-    n1 = np.array(n1)
-
-    t2 = np.array(t2)
-    n2 = np.array(n2) 
 
+scantmax = 100./1e3 #max window scan in [s]
+scanstep = 0.1/1e3 #scanstep
+windowmax   = 300./1e3 #window where matching is performed
+binsize     = 50./1e3 #bin size - should be multiple of 2*windowmax
+
+#prepare a time series for gettdelay, which only depends on the series itself:
+#time step, time of the peak of the running average, background
+#and cumulative sums (with a leading 0) of the raw and background-subtracted counts
+def prepare(t1,n1):
+    t1 = np.array(t1, dtype=np.float64)
+    n1 = np.array(n1, dtype=np.float64)
     tsstep1 = t1[1]-t1[0] #step of the time series
-    tsstep2 = t2[1]-t2[0] #step of the time series
-
-    scantmax = 100./1e3 #max window scan in [s]
-    scanstep = 0.1/1e3 #scanstep
-    windowmax   = 300./1e3 #window where matching is performed
-    binsize     = 50./1e3 #bin size - should be multiple of 2*windowmax
-    nelements   = int(binsize/tsstep1)
+    nelements = int(binsize/tsstep1)
 
     t1conv = np.convolve(t1, np.ones(nelements+1)/(nelements+1), mode='valid') #running averages - we add +1 to have average in the time series time point
     n1conv = np.convolve(n1, np.ones(nelements+1)/(nelements+1), mode='valid')
     maxt1 = np.mean(t1conv[tuple([n1conv == np.amax(n1conv)])])
     idx = (np.abs(t1 - maxt1)).argmin() #find nearest element to this time
-    maxt1 = t1[idx]
-
-    n1,nerr1 = normalizeforchi2(n1,t1,maxt1-windowmax-tsstep1/2.,maxt1+windowmax+tsstep1/2.)
-    n2,nerr2 = normalizeforchi2(n2,t2,maxt1-windowmax-tsstep2/2.,maxt1+windowmax+tsstep2/2.)
-
-    minchi2 = float('nan')
-    mintdelay = float('nan')
-
-    for tdelay in np.linspace(-scantmax, scantmax, num=int(2*scantmax/scanstep)+1):
-        cond1 = tuple([(maxt1 - windowmax + tdelay - tsstep1/2. <= t1) & (t1 <= maxt1 + windowmax + tdelay - tsstep1/2.)])
-        cond2 = tuple([(maxt1 - windowmax - tsstep2/2. <= t2) & (t2 <= maxt1 + windowmax - tsstep2/2.)]) #the second detector window stays fixed to fix its background variation
-        sample1 = n1[cond1]
-        serr1 = nerr1[cond1]
-
-        sample2 = n2[cond2]
-        serr2 = nerr2[cond2]
-
-        #drop excess of the elements
-        minsize = min(len(sample1),len(sample2))
-        minsize = minsize - minsize%nelements
-        if len(sample1) != minsize:
-            print("Warning - dropping",len(sample1) - minsize,"last element(s) from the first data")
-            sample1 = sample1[0:minsize]
-            serr1 = serr1[0:minsize]
-        if len(sample2) != minsize:
-            print("Warning - dropping",len(sample2) - minsize,"last element(s) from the second data")
-            sample2 = sample2[0:minsize]
-            serr2 = serr2[0:minsize]
-
-        sample1 = np.sum(sample1.reshape(-1, nelements), axis=1)
-        serr1 = np.sum(serr1.reshape(-1, nelements), axis=1)
-        sample2 = np.sum(sample2.reshape(-1, nelements), axis=1)
-        serr2 = np.sum(serr2.reshape(-1, nelements), axis=1)
-        errsum = serr1+serr2
-        
-        chi2 = np.divide(np.power(sample1-sample2,2), errsum, out=np.zeros_like(sample1), where=errsum!=0)
-        chi2sum = np.sum(chi2)/len(sample1) #chi2 is normalized to the number of elements since for each shift this can vary
-        if not (minchi2 < chi2sum):
-            mintdelay = tdelay*1000.
-            minchi2   = chi2sum
-    print('This is the deltat:', mintdelay)
-    #exit()
-    return (mintdelay)
+
+    bg = np.mean(n1[0:1000]) ##background is considered in the first 1000 points of data
+    return { 't': t1, 'step': tsstep1, 'nelements': nelements,
+             'peak': t1[idx],
+             'sum': np.concatenate(([0.0], np.cumsum(n1 - bg))),
+             'sumerr': np.concatenate(([0.0], np.cumsum(n1))) }
+
+#normalisation for chi2: signal in the window [windowleft, windowright]
+def normalizeforchi2(s,windowleft,windowright):
+    lo = np.searchsorted(s['t'], windowleft, side='left')
+    hi = np.searchsorted(s['t'], windowright, side='right')
+    mean = s['sum'][hi] - s['sum'][lo]
+    if mean < 0: logging.warning("first 1000 bins of data have abnormal event rate")
+    return mean
+
+#sums of nelements consecutive (normalised) bins of s starting from each of starts,
+#and of their err^2
+def binsums(s,starts,nelements,mean,valid):
+    starts = np.where(valid, starts, 0)
+    ends = np.minimum(starts + nelements, len(s['t']))
+    sample = (s['sum'][ends] - s['sum'][starts]) / mean
+    serr = (s['sumerr'][ends] - s['sumerr'][starts]) / mean / mean
+    return sample, serr
+
+#chi2 for all trial delays of s1 with respect to s2,
+#returns the delay in [ms] with the lowest chi2 and that chi2
+def scan(s1,s2):
+    t1 = s1['t']
+    t2 = s2['t']
+    tsstep1 = s1['step']
+    tsstep2 = s2['step']
+    nelements = s1['nelements']
+    maxt1 = s1['peak']
+
+    mean1 = normalizeforchi2(s1,maxt1-windowmax-tsstep1/2.,maxt1+windowmax+tsstep1/2.)
+    mean2 = normalizeforchi2(s2,maxt1-windowmax-tsstep2/2.,maxt1+windowmax+tsstep2/2.)
+
+    tdelay = np.linspace(-scantmax, scantmax, num=int(2*scantmax/scanstep)+1)
+    lo1 = np.searchsorted(t1, maxt1 - windowmax + tdelay - tsstep1/2., side='left')
+    hi1 = np.searchsorted(t1, maxt1 + windowmax + tdelay - tsstep1/2., side='right')
+    #the second detector window stays fixed to fix its background variation
+    lo2 = np.searchsorted(t2, maxt1 - windowmax - tsstep2/2., side='left')
+    hi2 = np.searchsorted(t2, maxt1 + windowmax - tsstep2/2., side='right')
+
+    #drop excess of the elements, then sum in bins of nelements
+    nbins = np.maximum(np.minimum(hi1 - lo1, hi2 - lo2), 0) // nelements
+    if np.any(nbins * nelements != hi1 - lo1) or np.any(nbins * nelements != hi2 - lo2):
+        logging.debug("dropping last element(s) of the data in chi2 windows")
+    k = np.arange(np.max(nbins)) * nelements
+    valid = k[np.newaxis,:] < (nbins * nelements)[:,np.newaxis]
+    sample1, serr1 = binsums(s1, lo1[:,np.newaxis] + k, nelements, mean1, valid)
+    sample2, serr2 = binsums(s2, lo2 + k, nelements, mean2, valid)
+    errsum = serr1+serr2
+
+    chi2 = np.divide(np.power(sample1-sample2,2), errsum, out=np.zeros_like(sample1), where=valid & (errsum!=0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        chi2sum = np.sum(chi2, axis=1)/nbins #chi2 is normalized to the number of elements since for each shift this can vary
+    chi2sum[np.isnan(chi2sum)] = np.inf
+    if np.all(np.isinf(chi2sum)):
+        return float('nan'), float('nan')
+
+    #last of the lowest values, refined by a parabola through its neighbours
+    i = len(chi2sum) - 1 - np.argmin(chi2sum[::-1])
+    minchi2 = chi2sum[i]
+    mintdelay = tdelay[i]
+    if 0 < i < len(chi2sum) - 1 and np.all(np.isfinite(chi2sum[i-1:i+2])):
+        y0, y1, y2 = chi2sum[i-1:i+2]
+        curv = y0 - 2.*y1 + y2
+        if curv > 0:
+            step = tdelay[i+1] - tdelay[i]
+            mintdelay += np.clip(0.5*(y0-y2)/curv, -0.5, 0.5) * step
+            minchi2 = y1 - 0.125*(y0-y2)**2/curv
+    logging.debug('This is the deltat: {}'.format(mintdelay*1000.))
+    return mintdelay*1000., minchi2
+
+def gettdelay(t1,n1,t2,n2):
+    return scan(prepare(t1,n1), prepare(t2,n2))[0]
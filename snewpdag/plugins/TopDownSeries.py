@@ -9,8 +9,19 @@ Arguments:
   in_field:  input field for a new time series
   in_det_field:  field containing detector identifier
   in_det_list_field:  field containing list of detectors to match
-  method:  'poisson' (default) or 'gaussian' (optional approximation)
+  method:  'poisson' (default) or 'gaussian' (optional approximation),
+    'binbin' or 'binomial-unnorm'
+  debug_pixels:  pixels evaluated (and logged) one at a time with compare()
+    (ignored with adaptive_output 'moc')
+  chunk_size:  number of pixels evaluated at once (default 1024)
+  workers:  number of processes evaluating pixels (default from --workers)
+  adaptive_nside:  if given, evaluate the map at this coarse nside first,
+    then refine only pixels near the minimum down to nside (see AdaptiveMap)
+  adaptive_margin:  refine pixels within this chi2 of the minimum (default 20)
+  adaptive_output:  'map' (default) for a full map at nside,
+    or 'moc' for a multi-order map (moc_uniq and moc_map instead of map)
 """
+import sys
 import logging
 import numpy as np
 import healpy as hp
@@ -19,11 +30,79 @@ from astropy.time import Time
 from astropy import units as u
 from astropy import constants as const
 
-from snewpdag.dag import Node, CelestialPixels
-from snewpdag.dag import DetectorDB
+from snewpdag.dag import Node, CelestialPixels, LagScan, PixelPool
+from snewpdag.dag import DetectorDB, AdaptiveMap
 from snewpdag.values import Hist1D, TimeSeries
 
+def bin_counts(scans, tnbins, twidth, tstart, tdelays):
+  """
+  Bin each detector's series in the window starting at tstart - tdelay.
+  scans = LagScan of each detector, tdelays shape (nkeys, nv)
+  Returns counts, shape (nv, nkeys, tnbins)
+  """
+  return np.stack([ scans[i].windows(tnbins, tstart - tdelays[i],
+                    tstart + twidth - tdelays[i])
+                    for i in range(len(scans)) ], axis=1).astype(np.float64)
+
+def compare_counts(nn, method):
+  """
+  Array version of TopDownSeries.compare() statistics.
+  nn = counts, shape (nv, nkeys, tnbins)
+  Returns chi2-like measure, shape (nv,)
+  """
+  aa = np.sum(nn, axis=2) # shape (nv, nkeys)
+  aa_sum = np.sum(aa, axis=1)
+  sigsum = np.sum(nn, axis=1) # shape (nv, nbins)
+  sigtotal = np.sum(sigsum, axis=1)
+
+  with np.errstate(divide='ignore', invalid='ignore'):
+    f_t = aa / aa_sum[:,np.newaxis]
+    ref = sigsum / sigtotal[:,np.newaxis]
+    pp = aa[:,:,np.newaxis] * ref[:,np.newaxis,:] # predicted area
+    mask = (aa[:,:,np.newaxis] > 0) & (pp > 0)
+
+    if method == 'gaussian':
+      d = nn - pp
+      s = nn + pp
+      x = 0.5 * np.log(2.0 * pp / s)
+      x -= 0.5 * d * d / s
+      x += np.log(sc.erfc( - np.sqrt(2.0 * nn * pp / s) ) /
+                  sc.erfc( - np.sqrt(pp) ))
+    elif method == 'binomial-unnorm':
+      x = nn * np.log(aa[:,:,np.newaxis]) - sc.gammaln(nn + 1.0)
+    elif method == 'binbin':
+      x = nn * np.log(f_t[:,:,np.newaxis] * ref[:,np.newaxis,:]) \
+          - sc.gammaln(nn + 1.0)
+    elif method == 'poisson':
+      x = (pp - nn) * np.log(2.0)
+      x += sc.gammaln(pp + 1.0) - sc.gammaln(nn + 1.0)
+      x += sc.gammaln(pp + nn + 1.0) - sc.gammaln(2.0 * pp + 1.0)
+    else:
+      logging.debug('TopDownSeries: unrecognized method {}'.format(method))
+      x = np.zeros_like(nn) # unrecognized
+
+    chi2 = np.sum(np.where(mask, x, 0.0), axis=(1,2))
+
+    if method == 'binomial-unnorm':
+      chi2 += np.sum(sc.gammaln(sigsum + 1.0), axis=1) \
+              - sigtotal * np.log(sigtotal)
+    elif method == 'binbin':
+      chi2 += sc.gammaln(sigtotal + 1.0)
+
+  return -2.0 * chi2
+
+def compare_block(rs, i0, i1, pd, scans, tnbins, twidth, method, tstart):
+  """
+  Evaluate directions rs (shape (3,nv)) for PixelPool.
+  pd = detector positions (GCRS, m), shape (nkeys, 3)
+  """
+  tdelays = pd @ rs / 3.0e8 # time offsets in s, rel to Earth center
+  return compare_counts(bin_counts(scans, tnbins, twidth, tstart, tdelays),
+                        method)
+
 class TopDownSeries(Node):
+  shared = ('db',)
+
   def __init__(self, detector_location, nside, tnbins, twidth,
                in_field, in_det_field, in_det_list_field,
                method='poisson',
@@ -39,11 +118,31 @@ class TopDownSeries(Node):
     self.in_det_list_field = in_det_list_field
     self.method = method
     self.debug_pixels = debug_pixels
+    self.chunk_size = kwargs.pop('chunk_size', 1024)
+    self.workers = kwargs.pop('workers', None)
+    self.adaptive = None
+    if 'adaptive_nside' in kwargs:
+      try:
+        self.adaptive = AdaptiveMap(nside, kwargs.pop('adaptive_nside'),
+                                    kwargs.pop('adaptive_margin', 20.0))
+      except ValueError as e:
+        logging.error('{}: {}'.format(kwargs.get('name'), e))
+        sys.exit(2)
+    self.adaptive_output = kwargs.pop('adaptive_output', 'map')
+    if self.adaptive_output not in ('map', 'moc'):
+      logging.error('{}: unknown adaptive_output {}'.format(
+                    kwargs.get('name'), self.adaptive_output))
+      sys.exit(2)
+    if self.adaptive != None and self.adaptive_output == 'moc' and \
+       len(self.debug_pixels) > 0:
+      logging.warning('{}: debug_pixels ignored for a multi-order map'.format(
+                      kwargs.get('name')))
     self.cache = {} # { <det> : <TimeSeries> }
+    self.scans = {} # { <det> : <LagScan> }
     super().__init__(**kwargs)
 
   def reference_time(self):
-    tm = [ np.min(self.cache[k].times) for k in self.cache.keys() ]
+    tm = [ self.scans[k].first() for k in self.cache.keys() ]
     return np.min(tm)
 
   def compare(self, keys, tdelays, debug):
@@ -83,16 +182,11 @@ class TopDownSeries(Node):
     ref = sigsum / sigtotal # normalized reference profile
 
     if debug:
-      logging.debug('method = {}, nn ='.format(self.method))
-      logging.debug(nn)
-      logging.debug('aa_sum = {}, aa ='.format(aa_sum))
-      logging.debug(aa)
-      logging.debug('f_t =')
-      logging.debug(f_t)
-      logging.debug('sigtotal = {}, sigsum ='.format(sigtotal))
-      logging.debug(sigsum)
-      logging.debug('ref =')
-      logging.debug(ref)
+      self.log.debug('method = %s, nn =\n%s', self.method, nn)
+      self.log.debug('aa_sum = %s, aa =\n%s', aa_sum, aa)
+      self.log.debug('f_t =\n%s', f_t)
+      self.log.debug('sigtotal = %s, sigsum =\n%s', sigtotal, sigsum)
+      self.log.debug('ref =\n%s', ref)
 
     # compare
     chi2 = 0.0
@@ -144,7 +238,7 @@ class TopDownSeries(Node):
             elif self.method == 'binomial-unnorm':
               x = nn[i,j] * np.log(aa[i]) - sc.gammaln(nn[i,j] + 1.0)
               if debug:
-                logging.debug('  i,j = {}, {}:  nn={}, aa={}, x={}'.format(i,j,nn[i,j],aa[i],x))
+                self.log.debug('  i,j = %s, %s:  nn=%s, aa=%s, x=%s', i, j, nn[i,j], aa[i], x)
 
             # binbin:
             # binomial over all i,j bins,
@@ -152,7 +246,7 @@ class TopDownSeries(Node):
             elif self.method == 'binbin':
               x = nn[i,j] * np.log(f_t[i] * ref[j]) - sc.gammaln(nn[i,j] + 1.0)
               if debug:
-                logging.debug('  i,j = {}, {}:  nn={}, f_t={}, ref={}, x={}'.format(i,j,nn[i,j],f_t[i],ref[j],x))
+                self.log.debug('  i,j = %s, %s:  nn=%s, f_t=%s, ref=%s, x=%s', i, j, nn[i,j], f_t[i], ref[j], x)
 
             # logl5:
             # probability with unknown true value, Poisson, norm to 1 at max
@@ -163,7 +257,7 @@ class TopDownSeries(Node):
 
             else:
               # unrecognized
-              logging.debug('{}: unrecognized method {}'.format(self.name, self.method))
+              self.log.debug('%s: unrecognized method %s', self.name, self.method)
               x = 0.0 # unrecognized
 
             chi2 += x
@@ -175,28 +269,41 @@ class TopDownSeries(Node):
       s2 = np.sum(sc.gammaln(sigsum + 1.0))
       chi2 += s2 - s1
       if debug:
-        logging.debug('  s1 = {}, s2 = {}'.format(s1, s2))
+        self.log.debug('  s1 = %s, s2 = %s', s1, s2)
     elif self.method == 'binbin':
       s1 = sc.gammaln(sigtotal + 1.0)
       chi2 += s1
       if debug:
-        logging.debug('  s1 = {}'.format(s1))
+        self.log.debug('  s1 = %s', s1)
 
     if debug:
-      logging.debug('logP = {}'.format(chi2))
+      self.log.debug('logP = %s', chi2)
 
     chi2 *= -2.0
     return chi2
 
+  def compare_batch(self, keys, tdelays):
+    """
+    Compare timing profiles for many sky positions at once.
+    Same calculation as compare(), but on arrays.
+    keys = list of detectors
+    tdelays = time offsets in s, shape (nkeys, nv)
+    Return chi2-like measure, shape (nv,)
+    """
+    scans = [ self.scans[k] for k in keys ]
+    nn = bin_counts(scans, self.tnbins, self.twidth,
+                    self.reference_time(), tdelays)
+    return compare_counts(nn, self.method)
+
   def reevaluate(self, data):
     """
-    Call compare() for each skymap pixel
+    Evaluate blocks of skymap pixels (see compare_batch()),
+    and call compare() for debug pixels
     """
     # get directions for each pixel
     t0 = self.reference_time()
     t0a = Time(t0, format='unix')
     cp = CelestialPixels()
-    rs = cp.get_map(self.nside, t0) # shape (3,npix)
 
     # get nominal time shifts for each detector for each pixel
     keys = list(self.cache.keys())
@@ -207,52 +314,77 @@ class TopDownSeries(Node):
       det = self.db.get(k) # Detector object
       pd[i] = det.get_xyz(t0a) # GCRS coordinates at time [m]
       i += 1
-    tdet = pd @ rs / 3.0e8 # time offsets in s, rel to Earth center
-    # shape of tdet should be (nkeys,npix)
 
     # get reference signal profile for each pixel's hypothetical direction
-    m = np.zeros(self.npix)
-    for i in range(self.npix):
-      debug = (i in self.debug_pixels)
-      m[i] = self.compare(keys, tdet[...,i], debug)
-      if debug:
-        logging.debug('pixel m[{}] = {}'.format(i, m[i]))
+    scans = [ self.scans[k] for k in keys ]
+    pool = PixelPool(self.workers, self.chunk_size)
+    args = (pd, scans, self.tnbins, self.twidth, self.method,
+            self.reference_time())
+    if self.adaptive == None:
+      rs = cp.get_map(self.nside, t0) # shape (3,npix)
+      m = pool.evaluate(compare_block, self.npix, args, rs)
+    else:
+      m = self.adaptive.evaluate(lambda nside, ipix:
+            pool.evaluate(compare_block, len(ipix), args,
+                          cp.get_pixels(nside, t0, ipix)))
+      self.log.info('%s: %s pixel evaluations', self.name, self.adaptive.nevals)
+
+    moc = self.adaptive != None and self.adaptive_output == 'moc'
+    if len(self.debug_pixels) > 0 and not moc: # not in the multi-order map
+      rs = cp.get_pixels(self.nside, t0, self.debug_pixels)
+      tdet = pd @ rs / 3.0e8 # time offsets in s, rel to Earth center
+      # shape of tdet should be (nkeys,ndebug)
+      # (may be wrapped in a dimensionless Quantity)
+      tdet = tdet.value if hasattr(tdet, 'unit') else tdet
+      for j, i in enumerate(self.debug_pixels):
+        m[i] = self.compare(keys, tdet[...,j], True)
+        self.log.debug('pixel m[%s] = %s', i, m[i])
+
+    map_field = 'map'
+    if moc:
+      data['moc_uniq'], m = self.adaptive.moc()
+      map_field = 'moc_map'
 
     chi2_min = m.min()
-    logging.debug('min = {} ({}), max = {} ({})'.format(chi2_min, np.argmin(m), m.max(), np.argmax(m)))
+    if self.log.isEnabledFor(logging.DEBUG):
+      self.log.debug('min = %s (%s), max = %s (%s)', chi2_min, np.argmin(m),
+                     m.max(), np.argmax(m))
     data['chi2'] = m
     mm = m - chi2_min
-    data['map'] = mm
+    data[map_field] = mm
     data['ndof'] = 2 # need to confirm this
     data['map_zeroes'] = np.flatnonzero(mm == 0.0)
     return data
 
   def alert(self, data):
-    logging.debug('{}: alert'.format(self.name))
-    logging.debug('{}: pre cached {}'.format(self.name, self.cache.keys()))
+    self.log.debug('%s: alert', self.name)
+    self.log.debug('%s: pre cached %s', self.name, self.cache.keys())
     if self.in_field in data and self.in_det_field in data:
       self.cache[data[self.in_det_field]] = data[self.in_field]
-      logging.debug('{}: post cached {}'.format(self.name, self.cache.keys()))
+      self.scans[data[self.in_det_field]] = LagScan(data[self.in_field])
+      self.log.debug('%s: post cached %s', self.name, self.cache.keys())
       if self.in_det_list_field in data:
-        logging.debug('{}: in_det_list_field -> {}'.format(self.name, data[self.in_det_list_field]))
+        self.log.debug('%s: in_det_list_field -> %s', self.name, data[self.in_det_list_field])
         if set(self.cache.keys()) == set(data[self.in_det_list_field]):
           # evaluate skymap if all the detectors in cache
           return self.reevaluate(data)
     return False
 
   def revoke(self, data):
-    logging.debug('{}: revoke'.format(self.name))
+    self.log.debug('%s: revoke', self.name)
     if self.in_det_field in data:
       k = data[self.in_det_field]
       if k in self.cache:
         del self.cache[k]
+        del self.scans[k]
         return True # force reevaluations downstream since there's a change
     return False
 
   def reset(self, data):
-    logging.debug('{}: reset'.format(self.name))
+    self.log.debug('%s: reset', self.name)
     if len(self.cache) > 0:
       self.cache = {}
+      self.scans = {}
       return True
     else:
       return False
@@ -13,6 +13,8 @@ import logging
 from snewpdag.dag import Node
 
 class Write(Node):
+  batch = True # writes the same values for every trial
+
   def __init__(self, write, **kwargs):
     self.writes = []
     for op in write:
@@ -11,6 +11,12 @@ Arguments:
   lead_time:  start time relative to first event time of first time series
   fixed_ref:  default None, otherwise calculate all lags relative to
     identified detector
+  method:  'scan' (default) evaluates the cross covariance at every lag,
+    'fft' bins both series once on a fine grid and computes all lags
+    with one FFT cross-correlation, interpolated to the lag grid
+  lag_range:  (low, high) range of lags to scan (s), default (-0.05, 0.05)
+  lag_step:  lag resolution (s), default 0.0001.  For 'fft', also sets
+    the fine binning (rounded so it evenly divides the histogram bins)
 
 lead_time should be -0.1s for signal-only, to make sure one always includes
 all of the signal.  When we can assume first event is background,
@@ -18,10 +24,12 @@ lead_time can be +0.1s to make sure both start in background.
 
 Default lead_time = -0.1s, i.e., assumes signal-only.
 """
+import sys
 import logging
 import numpy as np
+from scipy import signal
 
-from snewpdag.dag import Node
+from snewpdag.dag import Node, LagScan
 from snewpdag.values import Hist1D, TimeSeries
 
 class XCovLag(Node):
@@ -37,7 +45,15 @@ class XCovLag(Node):
     self.out_lags_field = out_lags_field
     self.lead_time = kwargs.pop('lead_time', -0.1) # 100ms before
     self.fixed_ref = kwargs.pop('fixed_ref', None)
+    self.method = kwargs.pop('method', 'scan')
+    if self.method not in ('scan', 'fft'):
+      logging.error('{}: unrecognized method {}'.format(kwargs.get('name'),
+                    self.method))
+      sys.exit(2)
+    self.lag_range = kwargs.pop('lag_range', (-0.05, 0.05))
+    self.lag_step = kwargs.pop('lag_step', 0.0001)
     self.cache = {} # { <det>: <TimeSeries> }
+    self.scans = {} # { <det>: <LagScan> }
     self.last_burst_report = -1 # only forward one report per burst id
     super().__init__(**kwargs)
 
@@ -46,7 +62,7 @@ class XCovLag(Node):
     w2 = self.cache[kref]
     #st1 = np.min(w1.times) - dt
     #st2 = np.min(w2.times)
-    st1 = np.min(w1.times) + self.lead_time # 100ms lead time
+    st1 = w1.first() + self.lead_time # 100ms lead time
     #st2 = np.min(w2.times)
     #st1 = w1.start - dt
     #st2 = w2.start
@@ -56,22 +72,65 @@ class XCovLag(Node):
     ##h2, edges = w2.histogram(self.tnbins, start, start + self.twidth)
     h1, edges = w1.histogram(self.tnbins, st1, st1 + self.twidth)
     h2, edges = w2.histogram(self.tnbins, st1 - dt, st1 - dt + self.twidth)
-    logging.info('{}: xcov dt = {}'.format(self.name, dt))
-    logging.info('{}: xcov h1 = {}'.format(self.name, h1))
-    logging.info('{}: xcov h2 = {}'.format(self.name, h2))
+    self.log.debug('%s: xcov dt = %s', self.name, dt)
+    self.log.debug('%s: xcov h1 = %s', self.name, h1)
+    self.log.debug('%s: xcov h2 = %s', self.name, h2)
     return np.sum(h1 * h2)
 
+  def xcov_scan(self, k1, kref, dt):
+    """
+    Cross covariance (as in xcov) for an array of lags dt.
+    Each series is binned once for all lags.
+    """
+    s1 = self.scans[k1]
+    s2 = self.scans[kref]
+    st1 = s1.first() + self.lead_time # 100ms lead time
+    h1 = s1.histogram(self.tnbins, st1, st1 + self.twidth)
+    h2 = s2.histograms(self.tnbins, st1 - dt, self.twidth)
+    return np.sum(h1 * h2, axis=1)
+
+  def xcov_fft(self, k1, kref, dt):
+    """
+    Cross covariance (as in xcov) for an array of lags dt,
+    using an FFT cross-correlation on a fine common grid.
+    The fine bin width evenly divides the histogram bin width,
+    so lags on the fine grid are exact up to edge rounding,
+    and lags in between are linearly interpolated.
+    """
+    s1 = self.scans[k1]
+    s2 = self.scans[kref]
+    st1 = s1.first() + self.lead_time # 100ms lead time
+    h1 = s1.histogram(self.tnbins, st1, st1 + self.twidth)
+    w = self.twidth / self.tnbins
+    r = max(1, int(round(w / self.lag_step))) # fine bins per histogram bin
+    f = w / r
+    u1 = np.repeat(h1, r) # h1 weight of each fine bin of the window
+    # fine histogram of kref covering the windows of all lags
+    dt_lo = np.min(dt)
+    dt_hi = np.max(dt)
+    nshift = int(np.ceil((dt_hi - dt_lo) / f)) + 1
+    nfine = len(u1) + nshift - 1
+    t0 = st1 - dt_hi
+    g2 = s2.histogram(nfine, t0, t0 + nfine * f)
+    # correlation is a sum of integer products, so round off FFT noise
+    c = np.rint(signal.correlate(g2, u1, mode='valid', method='fft'))
+    # shift index i corresponds to lag dt_hi - i*f, i.e., decreasing
+    lags = dt_hi - np.arange(nshift) * f
+    return np.interp(dt, lags[::-1], c[::-1])
+
   def lag(self, k1, kref):
     if k1 == kref:
       return (0.0, 0.0)
     # find best lag
-    hdt = 0.0001
-    dt = np.arange(-0.05, 0.05, hdt)
+    dt = np.arange(self.lag_range[0], self.lag_range[1], self.lag_step)
     #x = [ self.xcov(k1, kref, dt[i]) for i in range(len(dt)) ]
     #best = np.argmax(x)
     #logging.info('{}: best = {}, x = {}'.format(self.name, best, x))
     # estimate the error by calculating the second derivative
-    y = np.array([ self.xcov(k1, kref, dt[i]) for i in range(len(dt)) ])
+    if self.method == 'fft':
+      y = self.xcov_fft(k1, kref, dt)
+    else:
+      y = self.xcov_scan(k1, kref, dt)
     yb = np.argmax(y)
     #logging.info('{}: nlog best = {}, y = {}'.format(self.name, yb, y))
     return (dt[yb], 0.0, dt, y)
@@ -93,6 +152,7 @@ class XCovLag(Node):
   def alert(self, data):
     if self.in_field in data and self.in_det_field in data:
       self.cache[data[self.in_det_field]] = data[self.in_field]
+      self.scans[data[self.in_det_field]] = LagScan(data[self.in_field])
       if self.in_det_list_field in data:
         if set(self.cache.keys()) == set(data[self.in_det_list_field]):
           return self.reevaluate(data)
@@ -103,12 +163,14 @@ class XCovLag(Node):
       k = data[self.in_det_field]
       if k in self.cache:
         del self.cache[k]
+        del self.scans[k]
         return True
     return False
 
   def reset(self, data):
     if len(self.cache) > 0:
       self.cache = {}
+      self.scans = {}
       return True
     else:
       return False
@@ -1,74 +1,45 @@
-from .Pass import Pass
-from .Copy import Copy
-from .Write import Write
+"""
+Plugin nodes, each imported on first use
+(see snewpdag.dag.lib.lazy_import)
+"""
+from snewpdag.dag.lib import lazy_import
 
-from .TimeSeriesInput import TimeSeriesInput
-from .TimeDistInput import TimeDistInput
-from .TimeDistFileInput import TimeDistFileInput
-from .SkymapInput import SkymapInput
+__all__ = [
+  'Pass', 'Copy', 'Write',
 
-from .SubtractOffset import SubtractOffset
+  'TimeSeriesInput', 'TimeDistInput', 'TimeDistFileInput', 'SkymapInput',
 
-from .NthTimeDiff import NthTimeDiff
-from .CombineMaps import CombineMaps
-from .TimeDistDiff import TimeDistDiff
-from .ShapeComparison import ShapeComparison
-from .BayesianBlocks import BayesianBlocks
+  'SubtractOffset',
 
-from .Histogram1D import Histogram1D
-from .Histogram1DRebin import Histogram1DRebin
-from .HistogramSkymap import HistogramSkymap
-from .Accumulator import Accumulator
-from .CompareHistograms import CompareHistograms
-from .NormHistogram import NormHistogram
-from .AccHistogram import AccHistogram
+  'NthTimeDiff', 'CombineMaps', 'TimeDistDiff', 'ShapeComparison',
+  'BayesianBlocks',
 
-from .SeriesBinner import SeriesBinner
-from .BinnedAccumulator import BinnedAccumulator
-from .ActionFilter import ActionFilter
+  'Histogram1D', 'Histogram1DRebin', 'HistogramSkymap', 'Accumulator',
+  'CompareHistograms', 'NormHistogram', 'AccHistogram',
 
-from .DistCalc1 import DistCalc1
-from .DistCalc2 import DistCalc2
-from .MeanDist import MeanDist
-from .DistErrCalc import DistErrCalc
-from .ScatterPlot import ScatterPlot
-from .Residual import Residual
+  'SeriesBinner', 'BinnedAccumulator', 'ActionFilter',
 
-from .ValidateKey import ValidateKey
-from .ValidateKeyType import ValidateKeyType
-from .ValidateListType import ValidateListType
-from .ValidateSort import ValidateSort
-from .FilterValue import FilterValue
+  'DistCalc1', 'DistCalc2', 'MeanDist', 'DistErrCalc', 'ScatterPlot',
+  'Residual',
 
-from .TrueVsFit import TrueVsFit
-from .LagPull import LagPull
-from .SmoothPoly import SmoothPoly
-from .PolyError import PolyError
+  'ValidateKey', 'ValidateKeyType', 'ValidateListType', 'ValidateSort',
+  'FilterValue',
 
-from .Chi2Calculator import Chi2Calculator
-from .Chi2CL import Chi2CL
-from .Chi2Prob import Chi2Prob
-from .LogLProb import LogLProb
-from .ProbCL import ProbCL
+  'TrueVsFit', 'LagPull', 'SmoothPoly', 'PolyError',
 
-from .FirstEventTime import FirstEventTime
-from .FirstPairTime import FirstPairTime
-from .BurstTime import BurstTime
-from .BiasTest import BiasTest
-from .FirstEventDebias import FirstEventDebias
-from .CoincSeries import CoincSeries
-from .FirstEventDiff import FirstEventDiff
+  'Chi2Calculator', 'Chi2CL', 'Chi2Prob', 'LogLProb', 'ProbCL',
 
-#from .DtsCalculator import DtsCalculator # needs to be updated
-from .DiffTimes import DiffTimes
-from .DiffPointing import DiffPointing
-#from .EvalMap import EvalMap
-#from .TopDownSeries import TopDownSeries
+  'FirstEventTime', 'FirstPairTime', 'BurstTime', 'BiasTest',
+  'FirstEventDebias', 'CoincSeries', 'FirstEventDiff',
 
-from .XCovLag import XCovLag
-from .NLogLag import NLogLag
-from .NBLag import NBLag
+  #'DtsCalculator', # needs to be updated
+  'DiffTimes', 'DiffPointing',
+  #'EvalMap',
+  #'TopDownSeries',
 
-from .PickleInput import PickleInput
-from .JsonAlertInput import JsonAlertInput
+  'XCovLag', 'NLogLag', 'NBLag',
 
+  'PickleInput', 'JsonAlertInput',
+]
+
+__getattr__, __dir__ = lazy_import(__name__, __all__)
@@ -25,8 +25,8 @@ class GaussianPeak (Node):
     if flag:
       if not isinstance(v, Hist1D) and not isinstance(v, TimeSeries):
         return False # v is neither TimeHist nor TimeSeries
-      nev = Node.rng.poisson(self.event) # Poisson fluctuations
-      u = Node.rng.normal(loc=self.expv, scale=self.stdev, size=nev)
+      nev = self.rng.poisson(self.event) # Poisson fluctuations
+      u = self.rng.normal(loc=self.expv, scale=self.stdev, size=nev)
       v.add(u)
       return True
     else:
@@ -15,6 +15,9 @@ Arguments:
 
 ra,dec in ICRS coordinate system.
 
+For a batch of trials, the smeared times (and anything computed from
+them) are Batches, with the smearing for all trials drawn at once.
+
 Input:
   [epoch_base]: float value of starting time for epoch, in unix epoch
 
@@ -42,8 +45,12 @@ from astropy.coordinates import GCRS, SkyCoord, CartesianRepresentation
 
 from snewpdag.dag import Node, Detector, DetectorDB
 from snewpdag.dag.lib import fetch_field
+from snewpdag.values import Batch
 
 class GenPoint(Node):
+  batch = True
+  shared = ('db', 'tc', 'snr', 'dets', 'geo')
+
   def __init__(self, detector_location, ra, dec, time, **kwargs):
     self.db = DetectorDB(detector_location)
     self.pairs = kwargs.pop('pair_list', ())
@@ -64,11 +71,31 @@ class GenPoint(Node):
     gc = sc.transform_to(GCRS)
     d = gc.represent_as(CartesianRepresentation)
     self.snr = np.array( [ d.x, d.y, d.z ] ) # should be unit length!
-    logging.info('ra(lon) = {}, dec(lat) = {}'.format(self.ra, self.dec))
-    logging.info('SN location = {}'.format(self.snr))
+    logging.info('ra(lon) = %s, dec(lat) = %s', self.ra, self.dec)
+    logging.info('SN location = %s', self.snr)
     self.dets = DetectorDB.dets.keys()
+    self.geo = {} # { det: arrival time rel to Earth center (s) }
     super().__init__(**kwargs)
 
+  def offsets(self):
+    """
+    Arrival time at each detector relative to the center of the Earth (s).
+    These are the same for every trial, so only calculated once
+    (and shared with clones, e.g., the DAGs of FarmTrials chunks).
+    """
+    if len(self.geo) == 0:
+      geo = {}
+      for dname in self.dets:
+        det = self.db.get(dname)
+        pos = det.get_xyz(self.tc) # detector in GCRS at given time
+        self.log.info('pos[%s] = %s', dname, pos)
+        self.log.info('  sn pos = %s', self.snr)
+        dt = - np.dot(pos, self.snr) / const.c # intersect
+        self.log.info('  dt before bias = %s', dt)
+        geo[dname] = dt.to(u.s).value
+      self.geo.update(geo)
+    return self.geo
+
   def alert(self, data):
     # record truth information
     if 'truth' not in data:
@@ -92,40 +119,37 @@ class GenPoint(Node):
       logging.error('{}: unrecognized epoch_base field {}'.format(self.name, self.epoch_base))
       return False
     tc_local = self.tc_unix - t_epoch
+    size = data['batch'] if 'batch' in data else None # None for one trial
 
     # generate times for each detector, including bias.
     # given time is when wavefront arrives at Earth origin.
     ts = {}
     bias = {}
     sigma = {}
-    for dname in self.dets:
-      #c = 3.0e8 # m/s
+    for dname, dt in self.offsets().items():
       det = self.db.get(dname)
-      pos = det.get_xyz(self.tc) # detector in GCRS at given time
-      logging.info('pos[{}] = {}'.format(dname, pos))
-      logging.info('  sn pos = {}'.format(self.snr))
-      dt = - np.dot(det.get_xyz(self.tc), self.snr) / const.c # intersect
-      logging.info('  dt before bias = {}'.format(dt))
       # store unbiased time in data['truth']
-      tcb = tc_local + dt.to(u.s).value
+      tcb = tc_local + dt
       data['truth']['dets'][dname] = { 'true_t': tcb }
 
       # apply bias and smear
-      dt += det.bias * u.s
+      dt = dt + det.bias
       if self.smear:
-        dt += det.sigma * Node.rng.normal() * u.s # smear (s)
-      logging.info('  biased/smeared dt = {}'.format(dt))
-      ts[dname] = tc_local + dt.to(u.s).value
+        dt = dt + det.sigma * self.rng.normal(size=size) # smear (s)
+      self.log.info('  biased/smeared dt = %s', dt)
+      ts[dname] = tc_local + dt
+      if size != None and np.ndim(ts[dname]) > 0:
+        ts[dname] = Batch(ts[dname])
       bias[dname] = det.bias
       sigma[dname] = det.sigma
-      logging.info('  time[{}] = {}'.format(dname, ts[dname]))
+      self.log.info('  time[%s] = %s', dname, ts[dname])
 
     # generate pair times
     if len(self.pairs) > 0:
       dts = {}
       for p in self.pairs:
         dt = ts[p[0]] - ts[p[1]]
-        logging.info('dt[{}] = {}'.format(p, dt))
+        self.log.info('dt[%s] = %s', p, dt)
         dts[p] = {
                    'dt': dt, # s
                    't1': ts[p[0]], # s
@@ -48,6 +48,8 @@ from snewpdag.dag import Node, Detector, DetectorDB
 from snewpdag.dag.lib import fetch_field
 
 class GenPointDts(Node):
+  shared = ('db', 'tc', 'snr', 'pairs')
+
   def __init__(self, detector_location, pairs, ra, dec, time, **kwargs):
     self.db = DetectorDB(detector_location)
     self.ra = np.radians(ra)
@@ -67,8 +69,8 @@ class GenPointDts(Node):
     gc = sc.transform_to(GCRS)
     d = gc.represent_as(CartesianRepresentation)
     self.snr = np.array( [ d.x, d.y, d.z ] ) # should be unit length!
-    logging.info('ra(lon) = {}, dec(lat) = {}'.format(self.ra, self.dec))
-    logging.info('SN location = {}'.format(self.snr))
+    logging.info('ra(lon) = %s, dec(lat) = %s', self.ra, self.dec)
+    logging.info('SN location = %s', self.snr)
     # read pair database
     self.pairs = []
     with open(pairs, 'r') as f:
@@ -125,7 +127,7 @@ class GenPointDts(Node):
       t2 -= p['dtbias'] * u.second
       # smear detector 2 if requested
       if self.smear:
-        t2 += p['dtsig'] * Node.rng.normal() * u.second
+        t2 += p['dtsig'] * self.rng.normal() * u.second
       tt2 = tc_local + t2.to(u.s).value
       data['truth']['dets'][p['det2']] = { 'true_t': tt2 }
 
@@ -27,6 +27,10 @@ configuration:
   A "field specifier" is either a string or tuple of strings
   which navigate into the payload.
 
+For a batch of trials, field is a Batch of TimeSeries or Hist1D,
+and the events for all of them are generated at once.  sig_t0,
+sig_mean and sig_distance fields may then also be Batches.
+
 Originally based on Vladimir's TimeDistFileInput, via TimeDist
 
 Need a generator for SN direction and core bounce times for each detector.
@@ -37,10 +41,11 @@ import numbers
 
 from snewpdag.dag import Node
 from snewpdag.dag.lib import fetch_field
-from snewpdag.values import Hist1D, TimeSeries
+from snewpdag.values import Hist1D, TimeSeries, Batch
 from . import TimeDistSource
 
 class GenTimeDist(TimeDistSource):
+  batch = True
 
   one_series = () # shared time series, if self.sig_once is True
   one_mean = 0 # intended mean of shared time series
@@ -70,19 +75,22 @@ class GenTimeDist(TimeDistSource):
     # if sig_mean is 0 or an empty string, set it to self.area
     if self.sig_mean == 0 or self.sig_mean == "":
       self.sig_mean = self.area
-      logging.info('{}:  mean set to area {}'.format(self.name, self.area))
+      self.log.info('%s:  mean set to area %s', self.name, self.area)
 
     # pre-generate single series
     if self.sig_once and np.shape(GenTimeDist.one_series) == (0,):
-      j = Node.rng.choice(len(self.mu_norm), self.sig_mean,
+      j = self.rng.choice(len(self.mu_norm), self.sig_mean,
                           p=self.mu_norm, replace=True, shuffle=False)
       ta = self.tedges[j]
       dt = self.tedges[j+1] - ta
-      GenTimeDist.one_series = ta + Node.rng.random(self.sig_mean) * dt
+      GenTimeDist.one_series = ta + self.rng.random(self.sig_mean) * dt
       GenTimeDist.one_mean = self.sig_mean
 
   def alert(self, data):
     v, flag = fetch_field(data, self.field)
+    if 'batch' in data and (self.sig_once or not isinstance(v, Batch)):
+      self.split(data)
+      return False
     if flag:
 
       # epoch base
@@ -103,7 +111,7 @@ class GenTimeDist(TimeDistSource):
         t0 = self.sig_t0
 
       offset = t0 - te
-      logging.debug('{}: t0 = {}, ref time {}, offset {}'.format(self.name, t0, te, offset))
+      self.log.debug('%s: t0 = %s, ref time %s, offset %s', self.name, t0, te, offset)
 
       if self.sig_once:
         n = int(self.sig_mean / GenTimeDist.one_mean)
@@ -133,18 +141,27 @@ class GenTimeDist(TimeDistSource):
         mean = mean * f * f
 
         # Poisson fluctuation in mean, if requested
-        nev = Node.rng.poisson(mean) if self.sig_smear else mean
+        if 'batch' in data:
+          mean = np.broadcast_to(mean, len(v))
+        nev = self.rng.poisson(mean) if self.sig_smear else mean
+        if 'batch' in data:
+          nev = np.asarray(nev, dtype=int)
+          offset = np.repeat(np.broadcast_to(offset, len(v)), nev)
 
         # generate time series of offsets, with t=0 at core bounce
-        j = Node.rng.choice(len(self.mu_norm), nev,
+        j = self.rng.choice(len(self.mu_norm), np.sum(nev),
                             p=self.mu_norm, replace=True, shuffle=False)
         ta = self.tedges[j]
         dt = self.tedges[j+1] - ta
-        a = ta + Node.rng.random(nev) * dt
+        a = ta + self.rng.random(np.sum(nev)) * dt
 
       # add offsets in seconds - works for Hist1D or TimeSeries
       a += offset
-      v.add(a)
+      if 'batch' in data:
+        for vi, ai in zip(v, np.split(a, np.cumsum(nev)[:-1])):
+          vi.add(ai)
+      else:
+        v.add(a)
       return data
     else:
       return False
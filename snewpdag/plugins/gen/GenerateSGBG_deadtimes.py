@@ -45,7 +45,7 @@ class GenerateSGBG_deadtimes(TimeDistSource):
     
     #logging.info('times are {}'.format(self.t[-1]))
     new_times = np.arange(self.tmin,self.tmax,0.001)
-    #self.tdelay = int(Node.rng.uniform(-20.0, 20.0))
+    #self.tdelay = int(self.rng.uniform(-20.0, 20.0))
 
     t_true = self.tdelay
     #logging.info('t_true {}'.format(t_true))
@@ -83,13 +83,13 @@ class GenerateSGBG_deadtimes(TimeDistSource):
     #randomise the lightcurve    
     tarea = sum(new_data)
     new_mu = np.array(new_data) / tarea # normalize histogram to unit area
-    nev = Node.rng.poisson(tarea)
+    nev = self.rng.poisson(tarea)
     size = len(new_data)
-    j = Node.rng.choice(size, nev, p=new_mu, replace=True, shuffle=False)
+    j = self.rng.choice(size, nev, p=new_mu, replace=True, shuffle=False)
     t0 = new_times[j-1]
     dt = new_times[j] - t0
     
-    a = Node.rng.random(nev) * dt + t0
+    a = self.rng.random(nev) * dt + t0
     a.flags.writeable = False
     
     ngen = { 'times': a, 't_true': t_true }
@@ -24,6 +24,7 @@ from snewpdag.dag import Node
 from . import TimeDistSource
 
 class Generate_bg_glitch(TimeDistSource):
+  clonable = False # glitch drawn when configured
 
   def __init__(self, bg, detector, **kwargs):
     #logging.info("GenerateSGBG: dist {} bg {}".format(dist, bg))
@@ -37,16 +38,16 @@ class Generate_bg_glitch(TimeDistSource):
     self.tmin = -10
     self.tmax = 10
     self.tdelay = 0 #maybe put as input field?
-    self.glitch_tstart = Node.rng.uniform(-1, 3) #random glitch start between -1 s and 3 s
-    self.glitch_duration = Node.rng.uniform(0.05, 0.5) #random glitch duration between 50 ms and 500 ms
-    self.glitch_amplitude = Node.rng.uniform(1.2, 3.2) #random glitch amplitude between 1.2*bg and 3.2*bg
+    self.glitch_tstart = self.rng.uniform(-1, 3) #random glitch start between -1 s and 3 s
+    self.glitch_duration = self.rng.uniform(0.05, 0.5) #random glitch duration between 50 ms and 500 ms
+    self.glitch_amplitude = self.rng.uniform(1.2, 3.2) #random glitch amplitude between 1.2*bg and 3.2*bg
     print(self.mean, area)
     
   def alert(self, data):
     
     #logging.info('times are {}'.format(self.t[-1]))
     new_times = np.arange(self.tmin,self.tmax,0.001)
-    #self.tdelay = int(Node.rng.uniform(-20.0, 20.0))
+    #self.tdelay = int(self.rng.uniform(-20.0, 20.0))
 
     t_true = self.tdelay
     #logging.info('t_true {}'.format(t_true))
@@ -72,13 +73,13 @@ class Generate_bg_glitch(TimeDistSource):
     #randomise the lightcurve    
     tarea = sum(new_data)
     new_mu = np.array(new_data) / tarea # normalize histogram to unit area
-    nev = Node.rng.poisson(tarea)
+    nev = self.rng.poisson(tarea)
     size = len(new_data)
-    j = Node.rng.choice(size, nev, p=new_mu, replace=True, shuffle=False)
+    j = self.rng.choice(size, nev, p=new_mu, replace=True, shuffle=False)
     t0 = new_times[j-1]
     dt = new_times[j] - t0
 
-    a = Node.rng.random(nev) * dt + t0
+    a = self.rng.random(nev) * dt + t0
     a.flags.writeable = False
     
     ngen = { 'times': a, 't_true': t_true }
@@ -24,6 +24,7 @@ from snewpdag.dag import Node
 from . import TimeDistSource
 
 class Generate_delta_peak(Node):
+  clonable = False # peak drawn when configured
 
   def __init__(self, detector, mean, bg, **kwargs):
     #logging.info("GenerateSGBG: dist {} bg {}".format(dist, bg))
@@ -34,14 +35,14 @@ class Generate_delta_peak(Node):
     self.mean = mean #mean number of events per ms bin
     self.tmin = -10
     self.tmax = 10
-    self.tstart = Node.rng.uniform(-2, 2) #random tstart between -2 and 2 sec
-    self.duration = Node.rng.uniform(0.2, 0.8) #random weight of peak between [200 and 800 ms]
+    self.tstart = self.rng.uniform(-2, 2) #random tstart between -2 and 2 sec
+    self.duration = self.rng.uniform(0.2, 0.8) #random weight of peak between [200 and 800 ms]
     
   def alert(self, data):
     
     #logging.info('times are {}'.format(self.t[-1]))
     new_times = np.arange(self.tmin,self.tmax,0.001)
-    #self.tdelay = int(Node.rng.uniform(-20.0, 20.0))
+    #self.tdelay = int(self.rng.uniform(-20.0, 20.0))
 
     #logging.info('t_true {}'.format(t_true))
     new_data = []
@@ -62,13 +63,13 @@ class Generate_delta_peak(Node):
     #randomise the lightcurve    
     tarea = sum(new_data)
     new_mu = np.array(new_data) / tarea # normalize histogram to unit area
-    nev = Node.rng.poisson(tarea)
+    nev = self.rng.poisson(tarea)
     size = len(new_data)
-    j = Node.rng.choice(size, nev, p=new_mu, replace=True, shuffle=False)
+    j = self.rng.choice(size, nev, p=new_mu, replace=True, shuffle=False)
     t0 = new_times[j-1]
     dt = new_times[j] - t0
 
-    a = Node.rng.random(nev) * dt + t0
+    a = self.rng.random(nev) * dt + t0
     a.flags.writeable = False
     
     ngen = { 'times': a, 't_true': t_true }
@@ -18,6 +18,8 @@ from datetime import datetime
 from snewpdag.dag import Node
 
 class NeutrinoArrivalTime(Node):
+    shared = ('detector_info',)
+
     #Define detector location
     def __init__(self, detector_list, detector_location, **kwargs):
         self.detector_info = {}
@@ -55,9 +57,9 @@ class NeutrinoArrivalTime(Node):
     #costheta gives the polar angle distribution, and delta = pi/2 - polar
     def generate_n(self):
       if self.fixed_n == None:
-        alpha_deg = 360.0 * (Node.rng.random() - 0.5)
+        alpha_deg = 360.0 * (self.rng.random() - 0.5)
         alpha = np.radians(alpha_deg)
-        costheta = 2.0 * (Node.rng.uniform() - 0.5)  #cos(theta) = sin(delta)
+        costheta = 2.0 * (self.rng.uniform() - 0.5)  #cos(theta) = sin(delta)
 
         nx = -np.cos(alpha)*np.sqrt(1-costheta*costheta)
         ny = -np.sin(alpha)*np.sqrt(1-costheta*costheta)
@@ -74,9 +76,9 @@ class NeutrinoArrivalTime(Node):
     def generate_time(self):
       if self.fixed_t == None:
         start_unix = 946713600
-        random_time = Node.rng.integers(0, 31536000) #number of second in a year
+        random_time = self.rng.integers(0, 31536000) #number of second in a year
         s = start_unix + random_time 
-        ns = Node.rng.integers(0, 1000000000)
+        ns = self.rng.integers(0, 1000000000)
         return s + ns / 1.0e9
       else:
         return self.fixed_t[0] + self.fixed_t[1] / 1.0e9
@@ -11,34 +11,41 @@ Output:
   observed/dets/<det_id>/neutrino_time: smeared time (s)
   observed/dets/<det_id>/bias: bias (s), from db
   observed/dets/<det_id>/sigma: sigma (s), from db
+
+For a batch of trials, neutrino_time is a Batch.
 """
 import logging
 import numpy as np
 import healpy as hp
 
 from snewpdag.dag import Node, Detector, DetectorDB
+from snewpdag.values import Batch
 
 class SmearTimes(Node):
+  batch = True
+  shared = ('db',)
+
   def __init__(self, detector_location, **kwargs):
     self.db = DetectorDB(detector_location)
     super().__init__(**kwargs)
 
   def alert(self, data):
-    logging.info('truth/dets = {}'.format(data['truth']['dets']))
+    self.log.info('truth/dets = %s', data['truth']['dets'])
     if 'observed' not in data:
       data['observed'] = { 'dets': {} }
     elif 'dets' not in data['observed']:
       data['observed']['dets'] = {}
     d = data['observed']['dets']
+    size = data['batch'] if 'batch' in data else None # None for one trial
     for k in data['truth']['dets'].keys():
       det = self.db.get(k)
       v = data['truth']['dets'][k]
-      logging.info('k = {}, v = {}'.format(k, v))
+      self.log.info('k = %s, v = %s', k, v)
       t0 = v['true_t'] # (s)
       dt = det.bias # bias (s)
-      dt += det.sigma * Node.rng.normal() # smear (s)
+      dt += det.sigma * self.rng.normal(size=size) # smear (s)
       d[k] = {
-               'neutrino_time': t0 + dt,
+               'neutrino_time': t0 + dt if size == None else Batch(t0 + dt),
                'bias': det.bias,
                'sigma': det.sigma,
              }
@@ -30,7 +30,7 @@ class TimeDist(TimeDistSource):
   def alert(self, data):
     ngen = { 't_low': self.t, # immutable (from TimeDistSource)
              't_high': self.thi, }
-    ngen['t_bins'] = Node.rng.poisson(self.nmu, len(self.nmu))
+    ngen['t_bins'] = self.rng.poisson(self.nmu, len(self.nmu))
     ngen['t_bins'].flags.writeable = False
     if 'gen' in data:
       data['gen'] += (ngen, )
@@ -41,6 +41,8 @@ from snewpdag.dag import Node
 
 class TimeDistSource(Node):
 
+  shared = ('t', 'mu')
+
   def __init__(self, sig_filename, sig_filetype, **kwargs):
     dels = kwargs.pop('sig_delimiter', '')
     tcol = kwargs.pop('sig_t_column', 0)
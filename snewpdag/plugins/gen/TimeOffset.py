@@ -16,6 +16,8 @@ from snewpdag.dag import Node
 from snewpdag.dag import lib
 
 class TimeOffset(Node):
+    shared = ('detector_offset',)
+
     
     #Specify arrivial time uncertainties (s)
     def __init__(self, detector_location, **kwargs):
@@ -44,12 +44,12 @@ class TimeSeries(TimeDistSource):
     nmu.flags.writeable = False
 
     tdelay = data['sig_t_delay'] if 'sig_t_delay' in data else 0
-    nev = Node.rng.poisson(new_mean)
+    nev = self.rng.poisson(new_mean)
     size = len(self.mu)
-    j = Node.rng.choice(size, nev, p=nmu, replace=True, shuffle=False)
+    j = self.rng.choice(size, nev, p=nmu, replace=True, shuffle=False)
     t0 = self.tedges[j]
     dt = self.tedges[j+1] - t0
-    a = Node.rng.random(nev) * dt + t0 + tdelay
+    a = self.rng.random(nev) * dt + t0 + tdelay
     a.flags.writeable = False
 
     ngen = { 'times': a, 'gen_t_delay': tdelay }
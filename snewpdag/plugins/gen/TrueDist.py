@@ -26,7 +26,7 @@ class TrueDist(Node):
     def alert(self, data):
         if self.input == 'Random':
             dist_list = np.linspace(self.d_lo, self.d_hi, num=self.d_no, endpoint=True)
-            sn_distance = Node.rng.choice(dist_list, replace=True, shuffle=False)
+            sn_distance = self.rng.choice(dist_list, replace=True, shuffle=False)
             d2 = { 'd_lo': (self.d_lo), 'd_hi': (self.d_hi), 'd_no': (self.d_no) }
             data.update(d2)
             #logging.info('sn_distance = {0} chosen randomly from {1} values between {2} and {3} inclusively'.format(sn_distance,self.d_no,self.d_lo,self.d_hi))
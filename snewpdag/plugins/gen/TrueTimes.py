@@ -31,6 +31,8 @@ from snewpdag.dag import Node, Detector, DetectorDB
 from snewpdag.dag.lib import fetch_field
 
 class TrueTimes(Node):
+  shared = ('db',)
+
   def __init__(self, detector_location, detectors, ra, dec, time, **kwargs):
     self.db = DetectorDB(detector_location)
     self.ra = np.radians(ra)
@@ -48,8 +50,8 @@ class TrueTimes(Node):
     gc = sc.transform_to(GCRS)
     d = gc.represent_as(CartesianRepresentation)
     self.snr = np.array( [ d.x, d.y, d.z ] ) # should be unit length!
-    logging.info('ra(lon) = {}, dec(lat) = {}'.format(self.ra, self.dec))
-    logging.info('SN location = {}'.format(self.snr))
+    logging.info('ra(lon) = %s, dec(lat) = %s', self.ra, self.dec)
+    logging.info('SN location = %s', self.snr)
     self.dets = set(detectors) # detector names
     super().__init__(**kwargs)
 
@@ -74,8 +76,8 @@ class TrueTimes(Node):
       #c = 3.0e8 # m/s
       det = self.db.get(dname)
       pos = det.get_xyz(self.time) # detector in GCRS at given time
-      logging.info('pos[{}] = {}'.format(dname, pos))
-      logging.info('  sn pos = {}'.format(self.snr))
+      self.log.info('pos[%s] = %s', dname, pos)
+      self.log.info('  sn pos = %s', self.snr)
       dt = - np.dot(det.get_xyz(self.time), self.snr) / const.c # intersect
       t1 = time_base + dt.to(u.s).value
       ts[dname] = {
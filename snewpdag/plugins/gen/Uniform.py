@@ -8,16 +8,20 @@ Arguments:
 
 If tmin/tmax are floats, use the number as a timestamp.
 If they're strings, interpret as a unix time string.
+
+For a batch of trials, field is a Batch of TimeSeries or Hist1D,
+and the events for all of them are generated at once.
 """
 import logging
 import numpy as np
 from astropy.time import Time
 
 from snewpdag.dag import Node
-from snewpdag.values import TimeSeries, Hist1D
+from snewpdag.values import TimeSeries, Hist1D, Batch
 from snewpdag.dag.lib import fetch_field
 
 class Uniform (Node):
+  batch = True
   def __init__(self, field, rate, tmin, tmax, **kwargs):
     self.field = field
     self.rate = rate
@@ -30,6 +34,8 @@ class Uniform (Node):
 
   def alert(self, data):
     v, flag = fetch_field(data, self.field)
+    if flag and 'batch' in data:
+      return self.alert_batch(data, v)
     if flag:
       v = data[self.field]
       if not isinstance(v, TimeSeries) and not isinstance(v, Hist1D):
@@ -39,14 +45,24 @@ class Uniform (Node):
       # suggested optimizations:
       # * Hist1D can be filled bin by bin with Poisson variates
       #   mu = self.rate * v.duration / v.nbins
-      #   v.bins += Node.rng.poisson(mu, v.nbins)
+      #   v.bins += self.rng.poisson(mu, v.nbins)
       #   (but need to adjust means for partial bins at ends)
       # * for Hist1D, and TimeSeries with limits, can restrict generation
       #   to within those limits, rather than over the whole (tmin,tmax) 
 
-      nev = Node.rng.poisson(self.mean_total) # Poisson fluctuations around mean
-      u = (self.tmax - self.tmin) * Node.rng.random(size=nev, dtype=np.float64) + self.tmin
+      nev = self.rng.poisson(self.mean_total) # Poisson fluctuations around mean
+      u = (self.tmax - self.tmin) * self.rng.random(size=nev, dtype=np.float64) + self.tmin
       v.add(u)
       return True
     else:
       return False
+
+  def alert_batch(self, data, vs):
+    if not isinstance(vs, Batch):
+      self.split(data) # one series shared by all the trials
+      return False
+    nev = self.rng.poisson(self.mean_total, len(vs))
+    u = (self.tmax - self.tmin) * self.rng.random(size=nev.sum(), dtype=np.float64) + self.tmin
+    for v, ui in zip(vs, np.split(u, np.cumsum(nev)[:-1])):
+      v.add(ui)
+    return True
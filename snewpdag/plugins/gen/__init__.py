@@ -1,35 +1,28 @@
+"""
+Generator nodes, each imported on first use
+(see snewpdag.dag.lib.lazy_import)
+"""
+from snewpdag.dag.lib import lazy_import
 
-from .TimeDistSource import TimeDistSource
-from .TimeDist import TimeDist
-from .TimeSeries import TimeSeries
-from .GenerateSGBG import GenerateSGBG
-from .Generate_bg_glitch import Generate_bg_glitch
-from .Generate_delta_peak import Generate_delta_peak
-from .GenerateSGBG_deadtimes import GenerateSGBG_deadtimes
+__all__ = [
+  'TimeDistSource', 'TimeDist', 'TimeSeries', 'GenerateSGBG',
+  'Generate_bg_glitch', 'Generate_delta_peak', 'GenerateSGBG_deadtimes',
 
-####validators
-from .DUNE_validator import DUNE_validator
-from .DS20K_validator import DS20K_validator
-from .JUNO_validator import JUNO_validator
-from .Baksan_validator import Baksan_validator
-from .Xenon_validator import Xenon_validator
-from .SNOP_validator import SNOP_validator
-from .IC_validator import IC_validator
-from .KM3_validator import KM3_validator
+  ####validators
+  'DUNE_validator', 'DS20K_validator', 'JUNO_validator', 'Baksan_validator',
+  'Xenon_validator', 'SNOP_validator', 'IC_validator', 'KM3_validator',
 
-from .Combine import Combine
+  'Combine',
 
-from .TrueDist import TrueDist
+  'TrueDist',
 
-from .NeutrinoArrivalTime import NeutrinoArrivalTime
-from .TimeOffset import TimeOffset
-from .DetectorTime import DetectorTime
+  'NeutrinoArrivalTime', 'TimeOffset', 'DetectorTime',
 
-from .GenPoint import GenPoint
-from .GenPointDts import GenPointDts
-from .GenTimeDist import GenTimeDist
+  'GenPoint', 'GenPointDts', 'GenTimeDist',
 
-from .TrueTimes import TrueTimes
-from .SmearTimes import SmearTimes
+  'TrueTimes', 'SmearTimes',
 
-from .Uniform import Uniform
+  'Uniform',
+]
+
+__getattr__, __dir__ = lazy_import(__name__, __all__)
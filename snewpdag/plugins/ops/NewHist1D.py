@@ -11,9 +11,11 @@ import logging
 import numpy as np
 from astropy.time import Time
 from snewpdag.dag import Node
-from snewpdag.values import Hist1D
+from snewpdag.values import Hist1D, Batch
 
 class NewHist1D(Node):
+  batch = True # makes one histogram per trial
+
   def __init__(self, out_field, nbins, start, stop, **kwargs):
     self.out_field = out_field
     self.nbins = nbins
@@ -26,6 +28,10 @@ class NewHist1D(Node):
     super().__init__(**kwargs)
 
   def alert(self, data):
-    data[self.out_field] = Hist1D(self.nbins, self.start, self.stop)
+    if 'batch' in data:
+      data[self.out_field] = Batch.of(lambda: Hist1D(self.nbins, self.start,
+                                      self.stop), data['batch'])
+    else:
+      data[self.out_field] = Hist1D(self.nbins, self.start, self.stop)
     return data
 
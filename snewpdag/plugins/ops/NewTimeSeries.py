@@ -5,15 +5,18 @@ Arguments:
   out_field:  output field name
   start (optional):  float to indicate start time
   stop (optional):  float to indicate stop time
+  indexed (optional):  True to make an IndexedTimeSeries (default False)
 """
 import logging
 import numpy as np
 import numbers
 from astropy.time import Time
 from snewpdag.dag import Node
-from snewpdag.values import TimeSeries
+from snewpdag.values import TimeSeries, IndexedTimeSeries, Batch
 
 class NewTimeSeries(Node):
+  batch = True # makes one series per trial
+
   def __init__(self, out_field, **kwargs):
     self.out_field = out_field
     self.start = kwargs.pop('start', None)
@@ -22,9 +25,19 @@ class NewTimeSeries(Node):
     self.stop = kwargs.pop('stop', None)
     if isinstance(self.stop, str):
       self.stop = Time(self.stop).to_value('unix', 'long')
+    self.indexed = kwargs.pop('indexed', False)
     super().__init__(**kwargs)
 
+  def new_series(self):
+    if self.indexed:
+      return IndexedTimeSeries(self.start, self.stop)
+    else:
+      return TimeSeries(self.start, self.stop)
+
   def alert(self, data):
-    data[self.out_field] = TimeSeries(self.start, self.stop)
+    if 'batch' in data:
+      data[self.out_field] = Batch.of(self.new_series, data['batch'])
+    else:
+      data[self.out_field] = self.new_series()
     return data
 
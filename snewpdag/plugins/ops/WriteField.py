@@ -9,6 +9,7 @@ arguments:
 fieldspec is a tuple (field, subfield, subsubfield, ...)
 """
 import logging
+from collections.abc import Mapping
 
 from snewpdag.dag import Node
 
@@ -23,7 +24,7 @@ class WriteField(Node):
       fields = op[0]
       d = data
       for f in fields[:-1]:
-        if isinstance(d, dict) and f in d:
+        if isinstance(d, Mapping) and f in d:
           d = d[f]
         else:
           d[f] = {}
@@ -1,12 +1,17 @@
+"""
+Payload operation nodes, each imported on first use
+(see snewpdag.dag.lib.lazy_import)
+"""
+from snewpdag.dag.lib import lazy_import
 
-from .NewHist1D import NewHist1D
-from .NewTimeSeries import NewTimeSeries
+__all__ = [
+  'NewHist1D', 'NewTimeSeries',
 
-from .TimeSeriesToHist1D import TimeSeriesToHist1D
+  'TimeSeriesToHist1D',
 
-from .WriteField import WriteField
-from .CopyField import CopyField
-from .BiasField import BiasField
+  'WriteField', 'CopyField', 'BiasField',
 
-from .FillHist1D import FillHist1D
+  'FillHist1D',
+]
 
+__getattr__, __dir__ = lazy_import(__name__, __all__)
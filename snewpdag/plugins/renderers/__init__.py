@@ -1,16 +1,17 @@
+"""
+Renderer nodes, each imported on first use
+(see snewpdag.dag.lib.lazy_import)
+"""
+from snewpdag.dag.lib import lazy_import
 
-from .Histogram1D import Histogram1D
-from .TimeProfile import TimeProfile
+__all__ = [
+  'Histogram1D', 'TimeProfile',
 
-from .Skymap import Skymap
-from .FitsSkymap import FitsSkymap
-from .Mollview import Mollview
+  'Skymap', 'FitsSkymap', 'Mollview',
 
-from .DistErrPlot import DistErrPlot
-from .ScatterPlot import ScatterPlot
+  'DistErrPlot', 'ScatterPlot',
 
-from .Hist1D import Hist1D
-from .MultiPlot import MultiPlot
-from .PickleOutput import PickleOutput
-from .JsonOutput import JsonOutput
+  'Hist1D', 'MultiPlot', 'PickleOutput', 'JsonOutput',
+]
 
+__getattr__, __dir__ = lazy_import(__name__, __all__)
@@ -0,0 +1,77 @@
+"""
+Unit tests for AdaptiveMap
+"""
+import unittest
+import numpy as np
+import healpy as hp
+from snewpdag.dag import AdaptiveMap
+from snewpdag.plugins import DiffPointing
+
+def distance(nside, ipix):
+  # squared distance to a fixed direction, smooth with a single minimum
+  v = np.array(hp.pix2vec(nside, ipix, nest=True))
+  return 100.0 * np.sum((v - np.array([[0.6],[0.0],[0.8]]))**2, axis=0)
+
+class TestAdaptiveMap(unittest.TestCase):
+
+  def test_bad_nside(self):
+    with self.assertRaises(ValueError):
+      AdaptiveMap(8, 16, 1.0)
+    with self.assertRaises(ValueError):
+      AdaptiveMap(12, 8, 1.0)
+
+  def test_no_refinement(self):
+    am = AdaptiveMap(8, 8, 1.0)
+    m = am.evaluate(distance)
+    full = distance(8, np.arange(hp.nside2npix(8)))
+    self.assertTrue(np.allclose(m, full))
+    self.assertEqual(am.nevals, hp.nside2npix(8))
+
+  def test_refinement(self):
+    nside = 32
+    am = AdaptiveMap(nside, 4, 5.0)
+    m = am.evaluate(distance)
+    full = distance(nside, np.arange(hp.nside2npix(nside)))
+    self.assertEqual(len(m), hp.nside2npix(nside))
+    self.assertLess(am.nevals, hp.nside2npix(nside))
+    self.assertEqual(np.argmin(m), np.argmin(full))
+    self.assertEqual(np.min(m), np.min(full))
+    # everything within margin of the minimum is at full resolution
+    near = full - np.min(full) <= 5.0
+    self.assertTrue(np.allclose(m[near], full[near]))
+
+  def test_moc(self):
+    am = AdaptiveMap(16, 2, 3.0)
+    m = am.evaluate(distance)
+    uniq, vals = am.moc()
+    self.assertEqual(len(uniq), len(vals))
+    self.assertEqual(len(np.unique(uniq)), len(uniq))
+    # pixel areas add up to the whole sky
+    order = np.floor(np.log2(uniq / 4) / 2).astype(int)
+    nsides = 2**order
+    self.assertAlmostEqual(np.sum(1.0 / (12 * nsides * nsides)), 1.0)
+    self.assertEqual(np.min(vals), np.min(m))
+
+  def test_diffpointing(self):
+    t = 1600000000.0
+    dts = { ('IC','SK'): { 'dt': 0.011, 't1': t, 't2': t - 0.011 },
+            ('SK','JUNO'): { 'dt': -0.004, 't1': t - 0.011, 't2': t - 0.007 },
+            ('KM3','IC'): { 'dt': 0.021, 't1': t + 0.021, 't2': t },
+          }
+    full = DiffPointing('snewpdag/data/detector_location.csv', 16, 3,
+                        name='full')
+    ad = DiffPointing('snewpdag/data/detector_location.csv', 16, 3,
+                      adaptive_nside=4, adaptive_margin=50.0, name='ad')
+    moc = DiffPointing('snewpdag/data/detector_location.csv', 16, 3,
+                       adaptive_nside=4, adaptive_output='moc', name='moc')
+    m0 = full.alert({ 'action': 'alert', 'dts': dts })['map']
+    m1 = ad.alert({ 'action': 'alert', 'dts': dts })['map']
+    self.assertEqual(np.argmin(m1), np.argmin(m0))
+    near = m0 <= 50.0
+    self.assertTrue(np.allclose(m1[near], m0[near]))
+    d = moc.alert({ 'action': 'alert', 'dts': dts })
+    self.assertNotIn('map', d)
+    self.assertEqual(len(d['moc_uniq']), len(d['moc_map']))
+    self.assertEqual(np.min(d['moc_map']), 0.0)
+    self.assertIn(np.argmin(d['moc_map']), d['map_zeroes'])
+
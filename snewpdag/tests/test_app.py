@@ -2,7 +2,10 @@
 Unit tests for app methods for configuration and injection.
 """
 import unittest
-from snewpdag.dag.app import configure, inject
+import io, json, logging, os, tempfile
+import numpy as np
+from snewpdag.dag import Node, Trace, Profile
+from snewpdag.dag.app import configure, inject, get_dag, DagStore
 
 class TestApp(unittest.TestCase):
 
@@ -126,3 +129,165 @@ class TestApp(unittest.TestCase):
     self.assertEqual(cm.output, [
         'ERROR:root:Diff1 observing itself' ])
 
+
+  def test_clone(self):
+    spec = [
+      { 'class': 'TimeSeriesInput', 'name': 'Input1' },
+      { 'class': 'TimeSeriesInput', 'name': 'Input2' },
+      { 'class': 'NthTimeDiff',
+        'name': 'Diff1',
+        'kwargs': { 'nth': 1 },
+        'observe': [ 'Input2', 'Input1' ] },
+      { 'class': 'DiffTimes',
+        'name': 'Dts',
+        'kwargs': { 'detector_location': 'snewpdag/data/detector_location.csv' },
+        'observe': [ 'Diff1' ] },
+      ]
+    data = [
+      { 'name': 'Input1', 'action': 'alert', 'burst_id': 1,
+        'times': [ -0.1, 0.1, 0.2, 0.5 ] },
+      { 'name': 'Input2', 'action': 'alert', 'burst_id': 1,
+        'times': [ -0.5, 0.3, 0.6, 1.0 ] },
+      { 'name': 'Input1', 'action': 'alert', 'burst_id': 2,
+        'times': [ 0.0, 0.1 ] },
+      ]
+    dags = {}
+    inject(dags, data, spec)
+    d1, d2 = dags[1], dags[2]
+    self.assertAlmostEqual(d1['Diff1'].last_data['dt'], -0.4)
+    self.assertFalse(d2['Diff1'].valid[0])
+    self.assertTrue(d2['Diff1'].valid[1])
+    # same structure, but separate nodes
+    self.assertEqual([ n.name for n in d2['Diff1'].watch_list ],
+                     [ 'Input2', 'Input1' ])
+    self.assertIsNot(d1['Diff1'], d2['Diff1'])
+    self.assertIs(d2['Input1'].observers[0], d2['Diff1'])
+    # detector table shared, not copied
+    self.assertIs(d1['Dts'].db, d2['Dts'].db)
+
+  def test_not_clonable(self):
+    # Generate_delta_peak draws its peak when configured,
+    # so each burst should get its own draw, as if configured for it
+    spec = [
+      { 'class': 'Pass', 'name': 'Control' },
+      { 'class': 'gen.Generate_delta_peak', 'name': 'Peak',
+        'kwargs': { 'detector': 'IC', 'mean': 10, 'bg': 1 },
+        'observe': [ 'Control' ] },
+      ]
+    saved = Node.rng
+    try:
+      Node.rng = np.random.default_rng(5)
+      ref = [ configure(spec)['Peak'] for i in range(3) ]
+      Node.rng = np.random.default_rng(5)
+      dags = {}
+      peaks = [ get_dag(dags, i, spec)['Peak'] for i in range(3) ]
+    finally:
+      Node.rng = saved
+    self.assertEqual(len(set([ p.tstart for p in peaks ])), 3)
+    self.assertEqual([ (p.tstart, p.duration) for p in peaks ],
+                     [ (p.tstart, p.duration) for p in ref ])
+
+  def test_evict(self):
+    spec = [ { 'class': 'Pass', 'name': 'Control', 'kwargs': { 'line': 0 } } ]
+    dags = DagStore(max_dags=2)
+    for i in range(4):
+      inject(dags, { 'name': 'Control', 'action': 'alert', 'burst_id': i },
+             spec)
+    self.assertEqual(sorted(dags.keys()), [ 2, 3 ])
+    dags = DagStore(max_idle=0.0)
+    inject(dags, { 'name': 'Control', 'action': 'alert', 'burst_id': 0 }, spec)
+    inject(dags, { 'name': 'Control', 'action': 'alert', 'burst_id': 1 }, spec)
+    self.assertEqual(list(dags.keys()), [ 1 ])
+    busy = { 0 } # e.g. still being processed by Ingest
+    dags = DagStore(max_dags=1, busy=lambda k: k in busy)
+    for i in range(3):
+      inject(dags, { 'name': 'Control', 'action': 'alert', 'burst_id': i },
+             spec)
+    self.assertEqual(sorted(dags.keys()), [ 0, 2 ])
+
+  def test_log_trace(self):
+    spec = [
+      { 'class': 'Pass', 'name': 'Log1', 'kwargs': { 'line': 0 },
+        'log': 'debug' },
+      { 'class': 'Pass', 'name': 'Log2', 'kwargs': { 'line': 0 },
+        'observe': [ 'Log1' ] },
+      ]
+    nodes = configure(spec)
+    self.assertEqual(nodes['Log1'].log.level, logging.DEBUG)
+    self.assertEqual(nodes['Log2'].log.level, logging.NOTSET)
+    self.assertIsNone(configure([ { 'class': 'Pass', 'name': 'Log3',
+                                    'log': 'chatty' } ]))
+
+    Node.trace = Trace(3)
+    try:
+      nodes['Log1'].update({ 'action': 'alert' })
+    finally:
+      trace = Node.trace
+      Node.trace = None
+    self.assertEqual([ e[1:] for e in trace.events ],
+                     [ ('Log1', 'notify', 'alert'),
+                       ('Log2', 'update', 'alert'),
+                       ('Log2', 'notify', 'alert') ])
+    f = io.StringIO()
+    trace.dump(f)
+    events = [ json.loads(x) for x in f.getvalue().splitlines() ]
+    self.assertEqual(events[0]['node'], 'Log1')
+    self.assertEqual(events[0]['event'], 'notify')
+
+  def test_profile(self):
+    spec = [
+      { 'class': 'Pass', 'name': 'Prof1', 'kwargs': { 'line': 0 } },
+      { 'class': 'Pass', 'name': 'Prof2', 'kwargs': { 'line': 0 },
+        'observe': [ 'Prof1' ] },
+      { 'class': 'Pass', 'name': 'Prof3', 'kwargs': { 'line': 0 },
+        'observe': [ 'Prof1' ] },
+      ]
+    nodes = configure(spec)
+    p = Profile()
+    Node.profile = p
+    try:
+      for i in range(2):
+        p.call(nodes['Prof1'], { 'action': 'alert', 'x': i })
+    finally:
+      Node.profile = None
+    rows = { r['node']: r for r in p.rows() }
+    self.assertEqual(rows['Prof1']['calls'], 2)
+    self.assertEqual(rows['Prof1']['forwarded'], 4)
+    self.assertEqual(rows['Prof1']['fields'], 4)
+    self.assertEqual(rows['Prof2']['calls'], 2)
+    self.assertEqual(rows['Prof2']['fields'], 6) # plus history
+    self.assertLessEqual(rows['Prof1']['self'], rows['Prof1']['total'])
+    self.assertEqual(sorted(p.stacks), [ 'Prof1', 'Prof1;Prof2', 'Prof1;Prof3' ])
+
+    with tempfile.TemporaryDirectory() as d:
+      p.dump(os.path.join(d, 'p.csv'))
+      with open(os.path.join(d, 'p.csv')) as f:
+        self.assertEqual(len(f.readlines()), 4)
+      p.dump_stacks(os.path.join(d, 'p.txt'))
+      with open(os.path.join(d, 'p.txt')) as f:
+        self.assertEqual(f.readline().split()[0], 'Prof1')
+
+  def test_journal(self):
+    from snewpdag.dag import app, Journal
+    spec = [ { 'class': 'Pass', 'name': 'Control', 'kwargs': { 'line': 0 } } ]
+    with tempfile.TemporaryDirectory() as d:
+      fn = os.path.join(d, 'msgs', 'j.jsonl')
+      app.journal = Journal(fn, sync=0)
+      try:
+        for i in range(3):
+          m = app.save_message({ '_id': '{}_SNEWS-ALERT_x'.format(i),
+                                 'sub list number': i % 2,
+                                 'detector_names': [ 'JUNO', 'IC' ] })
+          self.assertEqual(m['coinc_id'], 'coinc{}'.format(i % 2))
+      finally:
+        app.journal.close()
+        app.journal = None
+      # replay, as with --jsonlines
+      dags = {}
+      with open(fn) as f:
+        lines = f.readlines()
+        for line in lines:
+          inject(dags, json.loads(line), spec)
+    self.assertEqual(len(lines), 3)
+    self.assertEqual(sorted(dags), [ 'dag_coinc0', 'dag_coinc1' ])
+    self.assertEqual(dags['dag_coinc0']['Control'].last_data['number_of_coinc_dets'], 2)
@@ -0,0 +1,138 @@
+"""
+Unit tests for batches of MC trials
+"""
+import unittest
+import numpy as np
+from snewpdag.dag import Node
+from snewpdag.values import Batch, TimeSeries
+from snewpdag.values.Batch import unbatch
+from snewpdag.plugins import Histogram1D, Accumulator
+from snewpdag.plugins.gen import Uniform
+from snewpdag.trials.SimpleTrials import run_trials, batch_safe
+
+class Record(Node):
+  """
+  Record the actions and x values received, one trial at a time.
+  """
+  def __init__(self, **kwargs):
+    self.seen = []
+    super().__init__(**kwargs)
+
+  def alert(self, data):
+    self.seen.append(('alert', data['x']))
+    return False
+
+  def reset(self, data):
+    self.seen.append(('reset', None))
+    return False
+
+class Source(Node):
+  """
+  Batch source which sets a field (its name) to the trial_id.
+  """
+  batch = True
+  def alert(self, data):
+    data[self.name] = data['trial_id'] * 1.0
+    return True
+
+class Join(Node):
+  """
+  Record the pairs of values from two inputs, one trial at a time.
+  """
+  def __init__(self, **kwargs):
+    self.pairs = []
+    self.values = {}
+    super().__init__(**kwargs)
+
+  def alert(self, data):
+    src = self.last_source
+    self.values[src] = data[src]
+    if len(self.values) == 2:
+      self.pairs.append((self.values['A'], self.values['B']))
+    return False
+
+  def reset(self, data):
+    self.values = {}
+    return False
+
+class TestBatch(unittest.TestCase):
+
+  def test_unbatch(self):
+    b = Batch([1.0, 2.0, 3.0])
+    self.assertIsInstance(b * 2.0, Batch)
+    self.assertNotIsInstance(np.sum(b), Batch)
+    ps = unbatch({ 'batch': 3, 'x': b, 'y': { 'z': b + 1.0, 'c': 'c' } })
+    self.assertEqual(len(ps), 3)
+    self.assertEqual(ps[1], { 'x': 2.0, 'y': { 'z': 3.0, 'c': 'c' } })
+    ts = Batch.of(TimeSeries, 2)
+    self.assertIsInstance(ts[0], TimeSeries)
+    self.assertIsNot(ts[0], ts[1])
+
+  def test_split(self):
+    n = Record(name='rec')
+    n.update({ 'action': 'alert', 'batch': 3, 'x': Batch([1.0, 2.0, 3.0]) })
+    self.assertEqual(n.seen, [ ('alert', 1.0), ('reset', None),
+                               ('alert', 2.0), ('reset', None),
+                               ('alert', 3.0) ])
+
+  def join(self, split):
+    nodes = { 'Control': Source(name='Control'),
+              'A': Source(name='A'), 'B': Source(name='B'),
+              'Join': Join(name='Join') }
+    if split:
+      nodes['A'].batch = False # split before the join, then fork
+      nodes['Control'].attach(nodes['A'])
+      nodes['A'].attach(nodes['B'])
+      nodes['A'].attach(nodes['Join'])
+      nodes['B'].attach(nodes['Join'])
+    else:
+      for k in 'AB':
+        nodes['Control'].attach(nodes[k])
+        nodes[k].attach(nodes['Join'])
+    return nodes
+
+  def test_join(self):
+    nodes = self.join(False)
+    self.assertFalse(batch_safe(nodes))
+    with self.assertLogs(level='WARNING'):
+      run_trials({ 0: nodes }, [], 0, 3, batch=3)
+    self.assertEqual(nodes['Join'].pairs, [ (0.0, 0.0), (1.0, 1.0), (2.0, 2.0) ])
+    nodes = self.join(True)
+    self.assertTrue(batch_safe(nodes))
+    run_trials({ 0: nodes }, [], 0, 3, batch=3)
+    self.assertEqual(nodes['Join'].pairs, [ (0.0, 0.0), (1.0, 1.0), (2.0, 2.0) ])
+
+  def test_histogram(self):
+    x = np.array([ -2.0, -0.5, 0.2, 0.7, 5.0, np.nan, 0.2 ])
+    h1 = Histogram1D(nbins=4, xlow=0.0, xhigh=1.0, in_field='x', name='h1')
+    h2 = Histogram1D(nbins=4, xlow=0.0, xhigh=1.0, in_field='x', name='h2')
+    for xi in x:
+      h1.update({ 'action': 'alert', 'x': xi })
+    h2.update({ 'action': 'alert', 'batch': len(x), 'x': Batch(x) })
+    h3 = Histogram1D(nbins=4, xlow=0.0, xhigh=1.0, in_field='x', name='h3')
+    h3.update({ 'action': 'alert', 'x': x }) # an array in one alert
+    for h in [ h2, h3 ]:
+      self.assertTrue(np.array_equal(h1.bins, h.bins))
+      self.assertEqual(h1.underflow, h.underflow)
+      self.assertEqual(h1.overflow, h.overflow)
+      self.assertEqual(h1.count, h.count)
+      self.assertAlmostEqual(h1.sum2, h.sum2)
+    self.assertEqual(h1.underflow, 2)
+
+  def test_accumulator(self):
+    a1 = Accumulator(title='a', in_field='x', clear_on=[], name='a1')
+    a2 = Accumulator(title='a', in_field='x', name='a2')
+    for a in [ a1, a2 ]:
+      a.update({ 'action': 'alert', 'batch': 3, 'x': Batch([1.0, 2.0, 3.0]) })
+    self.assertEqual(a1.series, [ 1.0, 2.0, 3.0 ])
+    self.assertEqual(a2.series, [ 3.0 ]) # cleared by the resets
+
+  def test_uniform(self):
+    Node.rng = np.random.default_rng(7)
+    u = Uniform(field='ts', rate=1000.0, tmin=0.0, tmax=1.0, name='u')
+    ts = Batch.of(TimeSeries, 50)
+    u.update({ 'action': 'alert', 'batch': 50, 'ts': ts })
+    n = np.array([ len(t.times) for t in ts ])
+    self.assertAlmostEqual(n.mean(), 1000.0, delta=30.0)
+    self.assertTrue(all([ t.times.min() >= 0.0 and t.times.max() < 1.0
+                          for t in ts ]))
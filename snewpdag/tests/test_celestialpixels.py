@@ -0,0 +1,76 @@
+"""
+Unit tests for CelestialPixels
+"""
+import unittest
+import numpy as np
+import healpy as hp
+from astropy.time import Time
+from astropy.coordinates import get_sun
+from snewpdag.dag import CelestialPixels
+
+class TestCelestialPixels(unittest.TestCase):
+
+  def setUp(self):
+    self.cp = CelestialPixels()
+    self.cp.delete_all_maps()
+    self.saved = (CelestialPixels.max_maps, CelestialPixels.max_bytes)
+
+  def tearDown(self):
+    CelestialPixels.max_maps, CelestialPixels.max_bytes = self.saved
+    self.cp.delete_all_maps()
+
+  def test_fast_map(self):
+    t = 1600000000.5
+    rs = self.cp.make_map(8, int(t))
+    ref = self.cp.transform_map(8, int(t))
+    self.assertEqual(rs.shape, (3, hp.nside2npix(8)))
+    self.assertTrue(np.allclose(np.sum(rs * rs, axis=0), 1.0))
+    # agrees with astropy much better than the ~1e-4 rad aberration
+    self.assertLess(np.max(np.abs(rs - ref)), 1e-7)
+
+  def test_fast_flag(self):
+    saved = CelestialPixels.fast
+    try:
+      for t in [ 1500000000, 1600000000, 1700000000 ]:
+        CelestialPixels.fast = True
+        rs = self.cp.get_map(32, t)
+        self.cp.delete_all_maps()
+        CelestialPixels.fast = False
+        ref = self.cp.get_map(32, t)
+        self.cp.delete_all_maps()
+        sun = get_sun(Time(t, format='unix')).cartesian.xyz.value
+        sun /= np.linalg.norm(sun)
+        disk = sun @ ref > np.cos(np.radians(0.3)) # behind the Sun
+        d = np.linalg.norm(rs - ref, axis=0)
+        self.assertLess(np.max(d[~disk]), 1e-14)
+        self.assertLess(np.max(d), 4e-7)
+    finally:
+      CelestialPixels.fast = saved
+
+  def test_pixels(self):
+    t = 1600000000
+    ipix = np.array([ 5, 17, 700 ])
+    rs = self.cp.get_pixels(8, t, ipix)
+    self.assertEqual(len(self.cp.list_maps()), 0) # no map made
+    self.assertTrue(np.array_equal(rs, self.cp.get_map(8, t)[:,ipix]))
+    self.assertTrue(np.array_equal(self.cp.get_pixels(8, t, ipix), rs))
+
+  def test_lru(self):
+    CelestialPixels.max_maps = 2
+    hits, misses = CelestialPixels.hits, CelestialPixels.misses
+    r1 = self.cp.get_map(4, 1600000000.2)
+    self.cp.get_map(4, 1600000001)
+    self.assertIs(self.cp.get_map(4, 1600000000.9), r1) # same second
+    self.cp.get_map(4, 1600000002) # evicts 1600000001
+    self.assertEqual(list(self.cp.list_maps()),
+                     [ (4, 1600000000), (4, 1600000002) ])
+    self.assertEqual(CelestialPixels.hits - hits, 1)
+    self.assertEqual(CelestialPixels.misses - misses, 3)
+
+  def test_max_bytes(self):
+    CelestialPixels.max_bytes = 1
+    self.cp.get_map(4, 1600000000)
+    self.cp.get_map(4, 1600000001)
+    self.assertEqual(list(self.cp.list_maps()), [ (4, 1600000001) ])
+    self.assertEqual(self.cp.stats()['maps'], 1)
+
@@ -0,0 +1,35 @@
+"""
+Unit tests for Chi2Calculator node
+"""
+import unittest
+import numpy as np
+import healpy as hp
+from snewpdag.plugins import Chi2Calculator
+
+class TestChi2Calculator(unittest.TestCase):
+
+  def test_generate_map(self):
+    dets = [ 'IC', 'SK', 'JUNO', 'KM3' ]
+    node = Chi2Calculator(dets, 'snewpdag/data/detector_location.csv',
+                          4, name='chi2')
+    node.measured_times = { 'IC': (1600000000, 1000000),
+                            'SK': (1600000000, 13000000),
+                            'JUNO': (1600000000, 9000000),
+                            'KM3': (1600000000, 25000000) }
+    measured, info, t0, info0 = node.get_time_dicts()
+    node.arrival = (1600000000, 12000000)
+    node.precision_matrix = node.generatePrecisionMatrix(info, info0)
+    m = node.generate_map(measured, info, t0, info0)
+
+    # reference: original per-pixel evaluation
+    ref = np.zeros(node.NPIX)
+    for i in range(node.NPIX):
+      delta, alpha = hp.pixelfunc.pix2ang(node.NSIDE, i, nest=True)
+      n = -1 * node.angles_to_unit_vec(alpha - np.pi, delta - np.pi/2)
+      ref[i] = node.chi2(node.d_vec(n, measured, info, t0, info0))
+    ref -= ref.min()
+
+    self.assertEqual(len(m), hp.nside2npix(4))
+    self.assertTrue(np.allclose(m, ref, rtol=1e-9, atol=1e-9))
+    self.assertEqual(np.min(m), 0.0)
+
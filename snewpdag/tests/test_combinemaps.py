@@ -274,3 +274,43 @@ class TestCombineMaps(unittest.TestCase):
     td1 = d1 * hp.ud_grade(rv.cdf(d2), 4, order_in='NESTED', order_out='NESTED')
     self.assertListEqual(tdata['cl'].tolist(), td1.tolist())
 
+
+  def test_incremental(self):
+    spec = [ { 'class': 'CombineMaps', 'name': 'Node1',
+               'kwargs': { 'force_cl': False } } ]
+    nodes = {}
+    nodes[0] = configure(spec)
+    node = nodes[0]['Node1']
+    rng = np.random.default_rng(2)
+    npix = hp.nside2npix(4)
+    ds = [ rng.uniform(0.0, 5.0, hp.nside2npix(2 if i % 2 else 4))
+           for i in range(5) ]
+    data = [ { 'name': 'Node1', 'action': 'alert',
+               'history': History(('Input{}'.format(i),)),
+               'ndof': 2, 'chi2': d.tolist() } for i, d in enumerate(ds) ]
+    inject(nodes, data, spec)
+    up = [ hp.ud_grade(d, 4, order_in='NESTED', order_out='NESTED')
+           for d in ds ]
+    self.assertTrue(np.allclose(node.last_data['chi2'], np.sum(up, axis=0)))
+    self.assertEqual(node.last_data['ndof'], 10)
+    self.assertEqual(node.total['sources'], [ 'Input{}'.format(i)
+                                              for i in range(5) ])
+
+    # a CL map switches the output to CL, revoking it switches back
+    d5 = rng.uniform(0.0, 1.0, npix)
+    inject(nodes, [ { 'name': 'Node1', 'action': 'alert',
+                      'history': History(('Input5',)),
+                      'cl': d5.tolist() } ], spec)
+    cl = np.prod([ chi2(2).cdf(u) for u in up ], axis=0) * d5
+    self.assertTrue(np.allclose(node.last_data['cl'], cl))
+    inject(nodes, [ { 'name': 'Node1', 'action': 'revoke',
+                      'history': History(('Input5',)) } ], spec)
+    self.assertTrue(np.allclose(node.last_data['chi2'], np.sum(up, axis=0)))
+    self.assertEqual(node.last_data['ndof'], 10)
+
+    # output isn't the combined map kept by the node
+    node.last_data['chi2'][:] = 0.0
+    inject(nodes, [ { 'name': 'Node1', 'action': 'revoke',
+                      'history': History(('Input0',)) } ], spec)
+    self.assertTrue(np.allclose(node.last_data['chi2'],
+                                np.sum(up[1:], axis=0)))
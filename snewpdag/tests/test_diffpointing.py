@@ -0,0 +1,64 @@
+"""
+Unit tests for DiffPointing node
+"""
+import unittest
+import numpy as np
+import healpy as hp
+from snewpdag.plugins import DiffPointing
+
+class TestDiffPointing(unittest.TestCase):
+
+  def setUp(self):
+    self.node = DiffPointing('snewpdag/data/detector_location.csv', 4, 100,
+                             name='diff')
+    t = 1600000000.0
+    dts = { ('IC','SK'): { 'dt': 0.011, 't1': t, 't2': t - 0.011 },
+            ('SK','JUNO'): { 'dt': -0.004, 't1': t - 0.011, 't2': t - 0.007,
+                             'dsig1': 0.002, 'dsig2': -0.0015 },
+            ('KM3','IC'): { 'dt': 0.021, 't1': t + 0.021, 't2': t },
+            ('KM3','JUNO'): { 'dt': 0.028, 't1': t + 0.021, 't2': t - 0.007 },
+          }
+    self.node.alert({ 'action': 'alert', 'dts': dts })
+    self.keys = list(self.node.cache.keys())
+
+  def test_weight_matrix(self):
+    w = self.node.weight_matrix(self.keys)
+    # reference: covariance built pair by pair
+    n = len(self.keys)
+    v = np.zeros([n, n])
+    for i, k1 in enumerate(self.keys):
+      d1 = self.node.cache[k1]
+      for j, k2 in enumerate(self.keys):
+        d2 = self.node.cache[k2]
+        if i == j:
+          v[i,j] = d2['var']
+        elif k1[0] == k2[0]:
+          v[i,j] = d1['dsig1'] * d2['dsig1']
+        elif k1[1] == k2[1]:
+          v[i,j] = d1['dsig2'] * d2['dsig2']
+        elif k1[0] == k2[1]:
+          v[i,j] = d1['dsig1'] * d2['dsig2']
+        elif k1[1] == k2[0]:
+          v[i,j] = d1['dsig2'] * d2['dsig1']
+    self.assertTrue(np.allclose(w, np.linalg.inv(v)))
+
+  def test_chi2_map(self):
+    w = self.node.weight_matrix(self.keys)
+    rs = hp.pix2vec(4, np.arange(hp.nside2npix(4)), nest=True)
+    rs = np.array(rs)
+    d = self.node.d_vectors(self.keys, rs)
+    ref = np.array([ np.dot(d[i] @ w, d[i]) for i in range(len(d)) ])
+    m = self.node.chi2_map(self.keys, w, rs)
+    self.assertTrue(np.allclose(m, ref))
+    self.node.chunk_size = 7
+    mc = self.node.chi2_map(self.keys, w, rs)
+    self.assertTrue(np.allclose(mc, ref))
+
+  def test_reevaluate(self):
+    self.node.chunk_size = 50
+    data = self.node.reevaluate({})
+    self.assertEqual(len(data['map']), hp.nside2npix(4))
+    self.assertEqual(np.min(data['map']), 0.0)
+    self.assertEqual(data['ndof'], 2)
+    self.assertIn(np.argmin(data['map']), data['map_zeroes'])
+
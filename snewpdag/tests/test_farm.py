@@ -0,0 +1,89 @@
+"""
+Unit tests for FarmTrials and merging of accumulated node state
+"""
+import unittest
+import sys
+import numpy as np
+sys.argv = [ 'snewpdag', 'test' ] # app parses arguments on import
+from snewpdag.plugins import Histogram1D, Accumulator
+from snewpdag.trials.FarmTrials import farm
+from snewpdag.trials.SimpleTrials import trials
+
+def spec():
+  dl = 'snewpdag/data/detector_location.csv'
+  return [
+    { 'name': 'Control', 'class': 'Pass', 'kwargs': { 'line': 0 } },
+    { 'name': 'Gen', 'class': 'gen.GenPoint', 'observe': [ 'Control' ],
+      'kwargs': { 'detector_location': dl, 'ra': -60.0, 'dec': -30.0,
+                  'time': '2021-11-01 05:22:36.328',
+                  'pair_list': [ ('IC', 'JUNO') ] } },
+    { 'name': 'Dt', 'class': 'Histogram1D', 'observe': [ 'Gen' ],
+      'kwargs': { 'nbins': 20, 'xlow': -0.1, 'xhigh': 0.1, 'in_field': 'dts',
+                  'in_index': ('IC', 'JUNO'), 'in_index2': 'dt' } },
+    { 'name': 'Series', 'class': 'Accumulator', 'observe': [ 'Gen' ],
+      'kwargs': { 'title': 'dt', 'clear_on': [], 'in_field': 'dts',
+                  'in_index': ('IC', 'JUNO') } },
+  ]
+
+class TestFarm(unittest.TestCase):
+
+  def test_merge(self):
+    h = [ Histogram1D(nbins=4, xlow=0.0, xhigh=1.0, in_field='x',
+                      name='h{}'.format(i)) for i in range(3) ]
+    for x in [ 0.1, 0.6, 2.0 ]:
+      h[0].update({ 'action': 'alert', 'x': x })
+      h[1 if x < 0.5 else 2].update({ 'action': 'alert', 'x': x })
+    h[1].merge(h[2].state())
+    self.assertTrue(np.array_equal(h[0].bins, h[1].bins))
+    self.assertEqual(h[0].overflow, h[1].overflow)
+    self.assertEqual(h[0].count, h[1].count)
+    self.assertAlmostEqual(h[0].sum2, h[1].sum2)
+
+    a1 = Accumulator(title='a', in_field='x', clear_on=[], name='a1')
+    a2 = Accumulator(title='a', in_field='x', name='a2')
+    a1.series = [ 1, 2 ]
+    a2.merge({ 'series': [ 3 ] })
+    a1.merge(a2.state())
+    self.assertEqual(a1.series, [ 1, 2, 3 ])
+
+  def test_farm(self):
+    s = spec()
+    serial = farm(s, 50, seed=3, workers=1, chunk=10)
+    pooled = farm(s, 50, seed=3, workers=3, chunk=10)
+    self.assertEqual(serial['Dt'].count, 50)
+    self.assertTrue(np.array_equal(serial['Dt'].bins, pooled['Dt'].bins))
+    self.assertEqual(serial['Dt'].sum, pooled['Dt'].sum)
+    self.assertEqual(len(pooled['Series'].series), 50)
+    self.assertEqual([ d['dt'] for d in serial['Series'].series ],
+                     [ d['dt'] for d in pooled['Series'].series ])
+    other = farm(s, 50, seed=4, workers=1, chunk=10)
+    self.assertNotEqual(serial['Dt'].sum, other['Dt'].sum)
+    batched = farm(s, 50, seed=3, workers=2, chunk=10, batch=5)
+    self.assertEqual(batched['Dt'].count, 50)
+
+  def test_serial(self):
+    s = spec()
+    for batch in [ None, 5 ]:
+      serial = trials(s, 50, seed=3, batch=batch)
+      pooled = farm(s, 50, seed=3, workers=3, chunk=10, batch=batch)
+      self.assertTrue(np.array_equal(serial['Dt'].bins, pooled['Dt'].bins))
+      self.assertEqual(serial['Dt'].sum, pooled['Dt'].sum)
+      self.assertTrue(np.array_equal(
+                        np.hstack([ d['dt'] for d in serial['Series'].series ]),
+                        np.hstack([ d['dt'] for d in pooled['Series'].series ])))
+
+  def test_configure_rng(self):
+    # Generate_delta_peak draws its peak when it's configured
+    s = [ { 'name': 'Control', 'class': 'Pass' },
+          { 'name': 'Peak', 'class': 'gen.Generate_delta_peak',
+            'observe': [ 'Control' ],
+            'kwargs': { 'detector': 'IC', 'mean': 10, 'bg': 1 } },
+          { 'name': 'Hist', 'class': 'Histogram1D', 'observe': [ 'Peak' ],
+            'kwargs': { 'nbins': 10, 'xlow': -0.01, 'xhigh': 0.01,
+                        'in_field': 'gen', 'in_index': 0,
+                        'in_index2': 't_true' } } ]
+    serial = trials(s, 4, seed=1)
+    pooled = farm(s, 4, seed=1, workers=2, chunk=2)
+    self.assertEqual(serial['Peak'].tstart, pooled['Peak'].tstart)
+    self.assertEqual(serial['Hist'].count, 4)
+    self.assertEqual(serial['Hist'].sum, pooled['Hist'].sum)
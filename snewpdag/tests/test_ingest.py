@@ -0,0 +1,43 @@
+"""
+Unit tests for asyncio ingestion
+"""
+import unittest
+import asyncio, io, json, os, tempfile, threading, time
+from snewpdag.dag import Ingest
+from snewpdag.dag.Ingest import from_iterable, tail
+
+class TestIngest(unittest.TestCase):
+
+  def test_concurrent(self):
+    done = []
+    busy = []
+    lock = threading.Lock()
+    def process(data):
+      if data['burst_id'] == 1:
+        time.sleep(0.2) # slow burst
+      with lock:
+        done.append((data['burst_id'], data['n']))
+        busy.append(ingest.busy(data['burst_id']))
+    msgs = [ { 'burst_id': 1, 'n': 0 }, { 'burst_id': 1, 'n': 1 },
+             { 'burst_id': 2, 'n': 2 }, { 'burst_id': 2, 'n': 3 } ]
+    f = io.StringIO()
+    ingest = Ingest(lambda d: d['burst_id'], process, 4, f)
+    asyncio.run(ingest.run(from_iterable(msgs)))
+    # burst 2 isn't held up by burst 1, and each burst stays in order
+    self.assertEqual(done, [ (2, 2), (2, 3), (1, 0), (1, 1) ])
+    recs = [ json.loads(line) for line in f.getvalue().splitlines() ]
+    self.assertEqual(len(recs), 4)
+    self.assertGreater(recs[-1]['latency'], 0.35)
+    self.assertEqual(ingest.tasks, {})
+    self.assertTrue(all(busy)) # while being processed
+    self.assertFalse(ingest.busy(1))
+
+  def test_tail(self):
+    with tempfile.TemporaryDirectory() as d:
+      fn = os.path.join(d, 'in.jsonl')
+      with open(fn, 'w') as f:
+        f.write('{"burst_id": 0, "x": 1}\nnot json\n{"burst_id": 3, "x": 2}\n')
+      seen = []
+      ingest = Ingest(lambda d: d['burst_id'], seen.append)
+      asyncio.run(ingest.run(tail(fn, follow=False)))
+    self.assertEqual(sorted([ d['x'] for d in seen ]), [ 1, 2 ])
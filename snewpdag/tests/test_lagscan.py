@@ -0,0 +1,114 @@
+"""
+Unit tests for LagScan and the lag plugins which use it
+"""
+import unittest
+import numpy as np
+import scipy.special as sc
+from snewpdag.dag import LagScan, LogTable
+from snewpdag.values import TimeSeries
+from snewpdag.plugins import XCovLag, NLogLag, NBLag
+
+def make_series(rng, n, t0, tau, bg=0.0, span=0.5):
+  s = TimeSeries()
+  s.add(t0 + rng.exponential(tau, n))
+  if bg > 0.0:
+    s.add(t0 - 0.2 + rng.uniform(0.0, span, rng.poisson(bg * span)))
+  return s
+
+class TestLagScan(unittest.TestCase):
+
+  def setUp(self):
+    rng = np.random.default_rng(12)
+    self.s1 = make_series(rng, 300, 10.003, 0.02, 100.0)
+    self.s2 = make_series(rng, 600, 10.0, 0.02, 200.0)
+    self.dt = np.arange(-0.05, 0.05, 0.0001)
+
+  def test_histograms(self):
+    ls = LagScan(self.s2)
+    self.assertEqual(ls.first(), np.min(self.s2.times))
+    st = np.min(self.s1.times) - 0.1
+    hs = ls.histograms(50, st - self.dt, 0.2)
+    self.assertEqual(hs.shape, (len(self.dt), 50))
+    for i in range(len(self.dt)):
+      h, edges = self.s2.histogram(50, st - self.dt[i],
+                                   st - self.dt[i] + 0.2)
+      self.assertListEqual(hs[i].tolist(), h.tolist())
+    # event exactly on the upper edge goes into the last bin
+    ls = LagScan([0.0, 0.5, 1.0, 1.5])
+    self.assertListEqual(ls.histogram(2, 0.0, 1.0).tolist(), [1, 2])
+    self.assertEqual(LagScan([]).first(), None)
+
+  def alert(self, node):
+    node.alert({ 'action': 'alert', 'series': self.s1, 'det': 'A' })
+    node.alert({ 'action': 'alert', 'series': self.s2, 'det': 'B' })
+
+  def test_xcovlag(self):
+    node = XCovLag(50, 0.2, 'series', 'det', 'dets', 'lags', name='xcov')
+    self.alert(node)
+    y = node.xcov_scan('A', 'B', self.dt)
+    ref = [ node.xcov('A', 'B', t) for t in self.dt ]
+    self.assertListEqual(y.tolist(), ref)
+
+  def test_xcovlag_fft(self):
+    node = XCovLag(50, 0.2, 'series', 'det', 'dets', 'lags', method='fft',
+                   fixed_ref='B', name='xcov')
+    self.alert(node)
+    # fine grid divides the histogram bins, so lags agree with the scan
+    y = node.xcov_fft('A', 'B', self.dt)
+    ref = node.xcov_scan('A', 'B', self.dt)
+    self.assertTrue(np.allclose(y, ref, atol=1e-6))
+    data = node.reevaluate({})
+    # (several lags may share the maximum)
+    i = np.argmin(np.abs(self.dt - data['lags'][('A','B')][0]))
+    self.assertEqual(ref[i], np.max(ref))
+    # a wide lag range only costs a longer FFT
+    node.lag_range = (-1.0, 1.0)
+    dt, e, x, y = node.lag('A', 'B')
+    self.assertEqual(len(y), len(x))
+    self.assertEqual(len(x), 20000)
+    ref = node.xcov_scan('A', 'B', x)
+    self.assertTrue(np.allclose(y, ref, atol=1e-6))
+    self.assertEqual(ref[np.argmin(np.abs(x - dt))], np.max(ref))
+
+  def test_nloglag(self):
+    node = NLogLag(50, 0.2, 'series', 'det', 'dets', 'lags', fixed_ref='B',
+                   name='nlog')
+    self.alert(node)
+    y = node.xlognm_scan('A', 'B', self.dt)
+    ref = [ node.xlognm('A', 'B', t) for t in self.dt ]
+    self.assertTrue(np.allclose(y, ref, rtol=1e-12))
+    data = node.reevaluate({})
+    self.assertEqual(data['lags'][('A','B')]['dt'], self.dt[np.argmax(ref)])
+
+  def test_nblag(self):
+    node = NBLag(20, 0.2, 'series', 'det', 'dets', 'lags',
+                 bg={ 'A': 100.0, 'B': 200.0 }, name='nb')
+    self.alert(node)
+    dt = np.arange(-0.05, 0.05, 0.005)
+    y = node.xprodnm_scan('A', 'B', dt)
+    ref = [ node.xprodnm('A', 'B', t) for t in dt ]
+    self.assertTrue(np.allclose(y, ref, rtol=1e-12))
+
+  def test_nblag_xprod(self):
+    node = NBLag(20, 0.2, 'series', 'det', 'dets', 'lags', name='nb')
+    lt = LogTable()
+    def xprod_ref(n, m, a):
+      v = np.zeros((n+1, m+1))
+      for r in range(n+1):
+        j = np.arange(m+1)
+        v[r] = (j+r)*np.log(a+1.0) - j*np.log(a) - lt.logfact(r) \
+               - lt.logfact(j) + lt.logfact(m+n-j-r) - lt.logfact(m-j) \
+               - lt.logfact(n-r)
+      return sc.logsumexp(v)
+    for n, m, a in [ (0, 0, 1.0), (3, 7, 0.4), (12, 5, 2.5), (30, 41, 1.3) ]:
+      self.assertAlmostEqual(node.xprod(n, m, a, 0.0, 0.0),
+                             xprod_ref(n, m, a), places=10)
+    # all bins of all lags at once, with repeated (n, m, a)
+    h1 = np.array([ 3, 0, 5, 3, 1 ])
+    h2 = np.array([ [ 2, 4, 1, 2, 0 ], [ 1, 1, 1, 1, 1 ], [ 2, 4, 1, 2, 0 ] ])
+    a = np.array([ 0.5, 0.8, 0.5 ])
+    x = node.xprods(h1, h2, a, 0.0, 0.0)
+    ref = [ sum(xprod_ref(h1[k], h2[i,k], a[i]) for k in range(len(h1)))
+            for i in range(len(h2)) ]
+    self.assertTrue(np.allclose(x, ref, rtol=1e-12))
+    self.assertEqual(len(node.xcache), 8)
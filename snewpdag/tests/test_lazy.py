@@ -0,0 +1,29 @@
+"""
+Unit tests for lazy plugin loading
+"""
+import unittest
+import subprocess
+import sys
+
+class TestLazy(unittest.TestCase):
+
+  def test_not_loaded(self):
+    # importing the packages shouldn't import any plugin (or healpy)
+    code = ('import sys, snewpdag.plugins, snewpdag.plugins.gen, '
+            'snewpdag.plugins.renderers, snewpdag.dag; '
+            'print("healpy" in sys.modules, '
+            '"snewpdag.plugins.DiffPointing" in sys.modules)')
+    out = subprocess.run([ sys.executable, '-c', code ],
+                         stdout=subprocess.PIPE, text=True).stdout
+    self.assertEqual(out.split(), [ 'False', 'False' ])
+
+  def test_class(self):
+    import snewpdag.plugins
+    from snewpdag.plugins import Pass
+    import snewpdag.plugins.Copy
+    from snewpdag.plugins import Copy
+    self.assertTrue(isinstance(Pass, type))
+    self.assertTrue(isinstance(Copy, type)) # not the module
+    self.assertIn('Histogram1D', dir(snewpdag.plugins))
+    with self.assertRaises(AttributeError):
+      snewpdag.plugins.NoSuchPlugin
@@ -0,0 +1,75 @@
+"""
+Unit tests for PixelPool
+"""
+import unittest
+import numpy as np
+import healpy as hp
+from snewpdag.dag import PixelPool
+from snewpdag.plugins import DiffPointing
+
+def dot_block(rs, i0, i1, v):
+  return v @ rs
+
+def index_block(rs, i0, i1, scale):
+  return scale * np.arange(i0, i1)
+
+class Loaded:
+  """
+  Counts how many times it's been unpickled in this process.
+  """
+  loads = 0
+  def __reduce__(self):
+    return (load, ())
+
+def load():
+  Loaded.loads += 1
+  return Loaded()
+
+def loads_block(rs, i0, i1, x):
+  return np.full(i1 - i0, float(Loaded.loads))
+
+class TestPixelPool(unittest.TestCase):
+
+  def test_serial(self):
+    rs = np.array(hp.pix2vec(4, np.arange(hp.nside2npix(4)), nest=True))
+    v = np.array([ 0.1, -0.4, 0.7 ])
+    pool = PixelPool(1, chunk_size=10)
+    self.assertEqual(len(pool.chunks(hp.nside2npix(4), 1)), 20)
+    m = pool.evaluate(dot_block, rs.shape[1], (v,), rs)
+    self.assertTrue(np.allclose(m, v @ rs))
+
+  def test_workers(self):
+    npix = hp.nside2npix(8)
+    rs = np.array(hp.pix2vec(8, np.arange(npix), nest=True))
+    v = np.array([ 0.1, -0.4, 0.7 ])
+    pool = PixelPool(2)
+    m = pool.evaluate(dot_block, npix, (v,), rs)
+    self.assertListEqual(m.tolist(), (v @ rs).tolist())
+    # a second evaluation uses new directions
+    m = pool.evaluate(dot_block, npix, (v,), -rs)
+    self.assertListEqual(m.tolist(), (-v @ rs).tolist())
+    # no directions at all
+    m = PixelPool(2, chunk_size=100).evaluate(index_block, npix, (2.0,))
+    self.assertListEqual(m.tolist(), (2.0 * np.arange(npix)).tolist())
+
+  def test_args_once(self):
+    # args are unpickled once per evaluation in each worker, not per chunk
+    pool = PixelPool(2, chunk_size=10)
+    m = pool.evaluate(loads_block, 500, (Loaded(),))
+    m2 = pool.evaluate(loads_block, 500, (Loaded(),))
+    self.assertEqual(np.max(m), 1.0) # 50 chunks
+    self.assertEqual(np.max(m2), 2.0)
+
+  def test_diffpointing(self):
+    t = 1600000000.0
+    dts = { ('IC','SK'): { 'dt': 0.011, 't1': t, 't2': t - 0.011 },
+            ('SK','JUNO'): { 'dt': -0.004, 't1': t - 0.011, 't2': t - 0.007 },
+            ('KM3','IC'): { 'dt': 0.021, 't1': t + 0.021, 't2': t } }
+    maps = []
+    for workers in [ 1, 3 ]:
+      node = DiffPointing('snewpdag/data/detector_location.csv', 8, 3,
+                          workers=workers, name='diff')
+      data = node.alert({ 'action': 'alert', 'dts': dts })
+      maps.append(data['map'])
+    self.assertTrue(np.allclose(maps[0], maps[1]))
+
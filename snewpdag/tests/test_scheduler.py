@@ -0,0 +1,89 @@
+"""
+Unit tests for Scheduler
+"""
+import unittest
+from snewpdag.dag import Node, Scheduler
+from snewpdag.dag.Scheduler import order, seed_nodes
+
+class Draw(Node):
+  """
+  Add a random number to the payload.
+  """
+  def alert(self, data):
+    data[self.name] = self.rng.random()
+    return True
+
+class Collect(Node):
+  """
+  Record the payloads received.
+  """
+  def __init__(self, **kwargs):
+    self.seen = []
+    super().__init__(**kwargs)
+
+  def alert(self, data):
+    d = dict(data)
+    d['history'] = data['history'].emit()
+    self.seen.append(d)
+    return False
+
+  def reset(self, data):
+    self.seen.clear()
+    return False
+
+def make_dag():
+  # two branches from one input, joined at the end
+  nodes = { name: Draw(name=name) for name in
+            [ 'in', 'a1', 'a2', 'a3', 'b1', 'b2' ] }
+  nodes['out'] = Collect(name='out')
+  for src, obs in [ ('in', 'a1'), ('a1', 'a2'), ('a2', 'a3'), ('in', 'b1'),
+                    ('b1', 'b2'), ('a3', 'out'), ('b2', 'out') ]:
+    nodes[src].attach(nodes[obs])
+  order(nodes)
+  return nodes
+
+class TestScheduler(unittest.TestCase):
+
+  def test_order(self):
+    nodes = make_dag()
+    self.assertEqual(nodes['in'].rank, 0)
+    self.assertEqual(nodes['b2'].rank, 2)
+    self.assertEqual(nodes['out'].rank, 4)
+    self.assertEqual(nodes['out'].ancestors,
+                     { 'in', 'a1', 'a2', 'a3', 'b1', 'b2' })
+    self.assertEqual(order(nodes)[:2], [ 'in', 'a1' ])
+
+  def test_deterministic(self):
+    results = []
+    for threads in [ 0, 1, 4 ]:
+      nodes = make_dag()
+      seed_nodes(nodes, 1234)
+      for i in range(5):
+        data = { 'action': 'alert' }
+        if threads == 0:
+          nodes['in'].update(data) # recursive
+        else:
+          Scheduler(threads).run(nodes['in'], data)
+      results.append(nodes['out'].seen)
+    self.assertEqual(len(results[0]), 10)
+    self.assertNotEqual(results[0][0]['in'], results[0][2]['in'])
+    # the scheduler delivers the branch from the lower-ranked sender first
+    self.assertEqual(results[1][0]['history'], ('in', 'b1', 'b2'))
+    self.assertEqual(results[1], results[2])
+    key = lambda d: d['history']
+    self.assertEqual(sorted(results[0], key=key), sorted(results[1], key=key))
+
+  def test_deep(self):
+    # deeper than the recursion limit
+    nodes = { 'n0': Node(name='n0') }
+    for i in range(1, 3000):
+      nodes['n{}'.format(i)] = Node(name='n{}'.format(i))
+      nodes['n{}'.format(i - 1)].attach(nodes['n{}'.format(i)])
+    c = Collect(name='end')
+    nodes['n2999'].attach(c)
+    nodes['end'] = c
+    order(nodes)
+    Scheduler().run(nodes['n0'], { 'action': 'alert', 'x': 1 })
+    self.assertEqual(len(c.seen), 1)
+    self.assertEqual(c.seen[0]['x'], 1)
+    self.assertIsNone(Node.scheduler)
@@ -0,0 +1,79 @@
+"""
+Unit tests for ShapeHistFunctions
+"""
+import unittest
+import numpy as np
+from snewpdag.plugins import ShapeHistFunctions as SHF
+from snewpdag.plugins import ShapeComparison, BayesianBlocks
+from snewpdag.plugins.BayesianBlocks import blocks
+
+def loop_hist(h_bins, h_low, h_up, values, dt_offset):
+  # bin by bin, as a check
+  bin_width = (float(h_up) - float(h_low)) / float(h_bins)
+  hist = [0.0] * (h_bins + 2)
+  for v in values:
+    v = v + dt_offset
+    for ii in range(h_bins):
+      if v >= (ii * bin_width + h_low) and v < ((ii+1) * bin_width + h_low):
+        hist[ii+1] += 1
+        break
+    else:
+      if v < h_low:
+        hist[0] += 1
+      elif v >= h_up:
+        hist[-1] += 1
+  return [ x / (len(values) - hist[0] - hist[-1]) for x in hist ]
+
+def loop_metric(hist1, hist2, scale):
+  h1max = max(hist1) * scale
+  h2max = max(hist2) * scale
+  metric = 0
+  for a, b in zip(hist1, hist2):
+    s = a + b if a != 0 and b != 0 else h1max + h2max
+    metric += s * abs(b - a)
+  return metric
+
+class TestShapeHist(unittest.TestCase):
+
+  def test_fill(self):
+    values = [ -0.3, -0.2, 0.0, 0.01, 0.1, 0.1, 0.29999, 0.3, 0.5 ]
+    h = SHF.fill_hist(50, -0.2, 0.3, values, 0.02)
+    self.assertTrue(np.array_equal(h, loop_hist(50, -0.2, 0.3, values, 0.02)))
+    self.assertEqual(len(SHF.remove_flow(h)), 50)
+
+  def test_scan(self):
+    rng = np.random.default_rng(11)
+    v1 = np.append(rng.normal(0.10, 0.05, 200), rng.uniform(-0.3, 0.4, 40))
+    v2 = np.append(rng.normal(0.12, 0.05, 200), rng.uniform(-0.3, 0.4, 40))
+    args = (100, -0.2, 0.3)
+    hist2 = loop_hist(*args, v2, 0.0)[1:-1]
+    mlist = [ loop_metric(loop_hist(*args, v1, -0.04 + i*0.001)[1:-1],
+                          hist2, 5.0) for i in range(80) ]
+    m = SHF.metric_scan(*args, v1, v2, 5.0, -0.04, 0.001, 80)
+    self.assertTrue(np.allclose(m, mlist, rtol=1e-12, atol=0.0))
+    self.assertAlmostEqual(SHF.diff_hist(SHF.remove_flow(
+                             SHF.fill_hist(*args, v1, -0.04)), hist2, 5.0),
+                           mlist[0], delta=1e-12)
+    dt = SHF.minimise(m, -0.04, 0.001, 80, 4, 0.01)
+    self.assertEqual(dt, SHF.minimise(mlist, -0.04, 0.001, 80, 4, 0.01))
+
+  def test_blocks(self):
+    rng = np.random.default_rng(4)
+    v = np.sort(np.append(rng.normal(0.0, 0.1, 150), rng.uniform(-1, 1, 50)))
+    e, c = blocks(v, np.log(0.01))
+    self.assertEqual(np.sum(c), 200)
+    self.assertGreater(len(c), 1)
+    e2, c2 = blocks(v, np.log(0.01), prune=True)
+    self.assertTrue(np.array_equal(e, e2))
+    self.assertTrue(np.array_equal(c, c2))
+
+  def test_block_hist(self):
+    shape = ShapeComparison(100, -0.2, 0.3, 5.0, -0.04, 0.001, 80, 4, 0.01,
+                            name='shape')
+    bb = BayesianBlocks(100, -0.2, 0.3, shape, 0.001, 0.0, name='bb')
+    rng = np.random.default_rng(5)
+    v = np.append(rng.normal(0.1, 0.03, 100), rng.uniform(-0.15, 0.0, 20))
+    h = bb.block_hist(bb.bayesian_block(list(v) + [ 0.5 ]), [ 0.0, 0.01 ])
+    self.assertEqual(h.shape, (2, 100))
+    self.assertAlmostEqual(np.sum(h[0]), 1.0) # all inside the histogram
+    self.assertEqual(len(bb.metric_list(v, v + 0.01)), 80)
@@ -7,11 +7,38 @@ import healpy as hp
 from snewpdag.dag import Node
 from snewpdag.dag.app import configure, inject
 from snewpdag.plugins import TimeDistFileInput, TimeDistDiff
+from snewpdag.plugins.TimeDistDiff import gettdelay
 
 import os
 
 class TestTimeDistDiff(unittest.TestCase):
 
+  def curve(self, rng, t, t0, scale, bg):
+    r = bg + scale * np.where(t > t0, np.exp(-(t - t0) / 0.3) *
+                                      (1 - np.exp(-(t - t0) / 0.02)), 0)
+    return rng.poisson(r * 1e-4).astype(float)
+
+  def test_scan(self):
+    rng = np.random.default_rng(1)
+    t = np.arange(20000) * 1e-4 # 0.1 ms bins
+    n1 = self.curve(rng, t, 0.51, 3e6, 1.5e6)
+    n2 = self.curve(rng, t, 0.5, 3e4, 0.0)
+    self.assertAlmostEqual(gettdelay(t, n1, t, n2), 10.0, delta=1.0)
+
+    node = TimeDistDiff(name='Diff')
+    out = Node(name='Output')
+    node.attach(out)
+    ins = [ Node(name='In{}'.format(i)) for i in range(3) ]
+    for i, n in enumerate(ins):
+      n.attach(node)
+      n.notify('alert', { 't_low': t, 't_bins': [ n1, n2, n2 ][i] })
+    self.assertEqual(len(node.delays), 3)
+    d01 = node.delays[('In0', 'In1')]
+    self.assertAlmostEqual(d01[0], 10.0, delta=1.0)
+    ins[2].notify('alert', { 't_low': t, 't_bins': n1 })
+    self.assertIs(node.delays[('In0', 'In1')], d01) # not recalculated
+    self.assertAlmostEqual(out.last_data['tdelay'], -10.0, delta=1.0)
+
   def test_inputs(self):
     OutputNode = Node(name='Output')
     TimeDistDiffNode = TimeDistDiff(name='TimeDistDiffNode')
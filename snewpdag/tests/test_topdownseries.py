@@ -0,0 +1,62 @@
+"""
+Unit tests for TopDownSeries node
+"""
+import unittest
+import numpy as np
+import healpy as hp
+from snewpdag.values import TimeSeries
+from snewpdag.plugins.TopDownSeries import TopDownSeries
+
+class TestTopDownSeries(unittest.TestCase):
+
+  def setUp(self):
+    rng = np.random.default_rng(5)
+    self.series = {}
+    for det, n, t0 in [ ('SK', 500, 10.000), ('IC', 5000, 10.012),
+                        ('JUNO', 300, 10.021) ]:
+      s = TimeSeries()
+      s.add(t0 + rng.exponential(0.05, n))
+      self.series[det] = s
+    self.tdelays = rng.uniform(-0.04, 0.04, (3, 40))
+
+  def make_node(self, method, **kwargs):
+    node = TopDownSeries('snewpdag/data/detector_location.csv', 2, 20, 0.3,
+                         'series', 'det', 'dets', method=method,
+                         name='td', **kwargs)
+    for k in self.series:
+      node.alert({ 'action': 'alert', 'series': self.series[k], 'det': k })
+    return node
+
+  def test_compare_batch(self):
+    for method in [ 'poisson', 'gaussian', 'binbin', 'binomial-unnorm' ]:
+      node = self.make_node(method)
+      keys = list(node.cache.keys())
+      m = node.compare_batch(keys, self.tdelays)
+      ref = [ node.compare(keys, self.tdelays[:,i], False)
+              for i in range(self.tdelays.shape[1]) ]
+      self.assertTrue(np.allclose(m, ref, rtol=1e-10), method)
+
+  def test_reevaluate(self):
+    node = self.make_node('poisson', chunk_size=7, debug_pixels=[3])
+    data = node.alert({ 'action': 'alert', 'series': self.series['SK'],
+                        'det': 'SK', 'dets': [ 'SK', 'IC', 'JUNO' ] })
+    self.assertEqual(len(data['map']), hp.nside2npix(2))
+    self.assertEqual(np.min(data['map']), 0.0)
+    self.assertEqual(np.argmin(data['chi2']), data['map_zeroes'][0])
+
+
+  def test_adaptive(self):
+    node = self.make_node('poisson', adaptive_nside=1, adaptive_margin=1e9,
+                          debug_pixels=[3])
+    full = self.make_node('poisson')
+    msg = { 'action': 'alert', 'series': self.series['SK'], 'det': 'SK',
+            'dets': [ 'SK', 'IC', 'JUNO' ] }
+    m0 = full.alert(dict(msg))['map']
+    m1 = node.alert(dict(msg))['map']
+    # margin covers the whole sky, so every pixel is refined
+    self.assertTrue(np.allclose(m1, m0))
+    node.adaptive_output = 'moc'
+    node.compare = None # debug pixels aren't evaluated for a multi-order map
+    data = node.alert(dict(msg))
+    self.assertEqual(len(data['moc_map']), hp.nside2npix(2))
+    self.assertTrue(np.all(data['moc_uniq'] >= 16))
@@ -2,8 +2,9 @@
 Unit tests for value objects
 """
 import unittest
+import pickle
 import numpy as np
-from snewpdag.values import Hist1D, TimeSeries
+from snewpdag.values import Hist1D, TimeSeries, IndexedTimeSeries, History, Payload
 
 class TestHist1D(unittest.TestCase):
 
@@ -25,6 +26,26 @@ class TestHist1D(unittest.TestCase):
     self.assertEqual(h.overflow, 1.0)
     self.assertEqual(h.underflow, 1.0)
 
+  def test_moments(self):
+    rng = np.random.default_rng(3)
+    x = rng.normal(1.0e6, 1.0, 10000) # large offset, small spread
+    h1 = Hist1D(10, 1.0e6 - 3.0, 1.0e6 + 3.0)
+    for c in np.split(x, 100):
+      h1.fill(c)
+    h2 = Hist1D(10, 1.0e6 - 3.0, 1.0e6 + 3.0)
+    h3 = Hist1D(10, 1.0e6 - 3.0, 1.0e6 + 3.0)
+    h2.fill(x[:3000])
+    h3.fill(np.append(x[3000:], np.nan)) # nan skipped
+    h2.merge(h3)
+    for h in [ h1, h2 ]:
+      self.assertEqual(h.count, 10000)
+      self.assertAlmostEqual(h.mean(), np.mean(x), delta=1e-8)
+      self.assertAlmostEqual(h.variance(), np.var(x), delta=1e-9)
+      self.assertAlmostEqual(h.skewness(), np.mean((x - np.mean(x))**3),
+                             delta=1e-9)
+      self.assertAlmostEqual(h.sum, np.sum(x), delta=1e-3)
+    self.assertTrue(np.array_equal(h1.bins, h2.bins))
+
   def test_timeseries(self):
     s = TimeSeries() # no limits
     s.add([1000, 200, 400])
@@ -39,3 +60,85 @@ class TestHist1D(unittest.TestCase):
     self.assertEqual(s.times[2], 400)
     self.assertEqual(s.times[3], 1000)
 
+
+  def test_integral(self):
+    s = TimeSeries(100, 1000)
+    s.add(np.array([50, 1000, 200, 400, 999]))
+    self.assertEqual(s.integral(), 3)
+    self.assertEqual(s.integral(200, 400), 1)
+    s = TimeSeries()
+    s.add([1000, 200, 400])
+    self.assertEqual(s.integral(), 3)
+    self.assertEqual(s.first(), 200)
+    self.assertEqual(s.last(), 1000)
+
+  def test_indexed(self):
+    rng = np.random.default_rng(3)
+    ts = rng.uniform(0.0, 10.0, 1000)
+    s = TimeSeries(1.0, 9.0)
+    si = IndexedTimeSeries(1.0, 9.0, capacity=2)
+    for i in range(0, 1000, 100):
+      s.add(ts[i:i+100])
+      si.add(ts[i:i+100])
+    si.add(np.sort(ts[:10]) + 10.0) # in order, beyond stop
+    self.assertTrue(np.all(np.diff(si.times) >= 0.0))
+    self.assertTrue(np.array_equal(si.times, np.sort(s.times)))
+    self.assertEqual(si.first(), np.min(s.times))
+    self.assertEqual(si.last(), np.max(s.times))
+    self.assertEqual(si.integral(), s.integral())
+    self.assertEqual(si.integral(2.0, 3.5), s.integral(2.0, 3.5))
+    for args in [ (20, 2.0, 4.0), (7, None, None), (5, 0.0, 10.0) ]:
+      h, e = s.histogram(*args)
+      hi, ei = si.histogram(*args)
+      self.assertTrue(np.array_equal(h, hi))
+      self.assertTrue(np.allclose(e, ei))
+
+  def test_indexed_append(self):
+    s = IndexedTimeSeries(capacity=1)
+    s.add(3.0)
+    s.add([4.0, 5.0])
+    s.add([1.0, 4.5])
+    s.add(6.0)
+    self.assertTrue(np.array_equal(s.times, [1.0, 3.0, 4.0, 4.5, 5.0, 6.0]))
+    self.assertEqual(s.min(), 1.0)
+    self.assertEqual(s.to_dict()['times'], list(s.times))
+    self.assertIsNone(IndexedTimeSeries().first())
+
+  def test_history(self):
+    h = History(['a', 'b'])
+    h2 = h.copy()
+    h.append('c')
+    h2.append('d')
+    self.assertEqual(h.emit(), ('a', 'b', 'c'))
+    self.assertEqual(h2.emit(), ('a', 'b', 'd'))
+    self.assertEqual(h2.last(), 'd')
+    h.combine([h, h2])
+    self.assertEqual(h.emit(), ((('a', 'b', 'c'), ('a', 'b', 'd')),))
+
+  def test_payload(self):
+    p = Payload({ 'x': 1, 'y': 2 })
+    q = p.copy()
+    q['z'] = 3
+    del q['x']
+    p['y'] = 4
+    self.assertEqual(p, { 'x': 1, 'y': 4 })
+    self.assertEqual(q, { 'y': 2, 'z': 3 })
+    self.assertNotIn('x', q)
+    self.assertRaises(KeyError, q.__getitem__, 'x')
+    self.assertEqual(sorted(q), ['y', 'z'])
+    self.assertEqual(pickle.loads(pickle.dumps(q)), q)
+
+  def test_payload_layers(self):
+    p = Payload({ 'f{}'.format(i): i for i in range(100) })
+    ps = [ p ]
+    for i in range(3 * Payload.max_depth):
+      ps.append(ps[-1].copy())
+      ps[-1]['g{}'.format(i)] = i
+      ps[-1]['f0'] = -i
+    self.assertLessEqual(ps[-1].layers[2], Payload.max_depth)
+    self.assertEqual(len(ps[-1]), 100 + 3 * Payload.max_depth)
+    self.assertEqual(ps[-1]['f0'], 1 - 3 * Payload.max_depth)
+    self.assertEqual(ps[1]['f0'], 0)
+    self.assertNotIn('g1', ps[1])
+    self.assertIsInstance(Payload.of({ 'x': 1 }), dict)
+    self.assertIsInstance(Payload.of(dict(p)), Payload)
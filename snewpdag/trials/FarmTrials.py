@@ -0,0 +1,136 @@
+"""
+FarmTrials - run MC trials in several processes and merge the results
+
+A single process uses one core.  farm() splits the trials into chunks
+of consecutive trial_ids and runs each chunk in a separate copy of the DAG,
+on a pool of worker processes.  As in SimpleTrials, the random numbers
+of each alert are seeded with the seed and the alert's (first) trial_id.
+After the last chunk, what the accumulating nodes (Histogram1D,
+Accumulator, AccHistogram, HistogramSkymap, BinnedAccumulator)
+have collected is merged, in chunk order, into the DAG in this process
+(see Node.state() and Node.merge()), and that DAG gets the report,
+so renderers run only once.
+
+So the results are the same as those of SimpleTrials.trials() with
+the same seed, whatever the number of workers and the chunk size
+(with batch, as long as chunk is a multiple of batch).
+
+Workers are forked, so they start with the modules already loaded.
+
+From python,
+
+  from snewpdag.trials.FarmTrials import farm
+  dag = farm(spec, 100000, seed=1, workers=8)
+
+or from the command line,
+
+  python -m snewpdag.trials.FarmTrials config.csv -n 100000 --workers 8 --seed 1
+"""
+import sys, os, argparse, ast, logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+worker = {} # spec, seed and batch of the trials run by this process
+
+def init_worker(spec, seed, batch):
+  worker['spec'] = spec
+  worker['seed'] = seed
+  worker['batch'] = batch
+
+def run_chunk(k, first, ntrials):
+  """
+  Run trials first, ..., first + ntrials - 1 (chunk k) in a new DAG.
+  Returns { node name: state } of the nodes with something to merge.
+  """
+  from snewpdag.dag import Node
+  from snewpdag.dag.app import instantiate
+  from snewpdag.trials.SimpleTrials import run_trials
+  spec = worker['spec']
+  # random numbers drawn while configuring are the same as in farm()
+  Node.rng = np.random.default_rng(np.random.SeedSequence(worker['seed']))
+  nodes = instantiate(spec)
+  run_trials({ 0: nodes }, spec, first, ntrials, worker['batch'],
+             worker['seed'])
+  states = {}
+  for name, node in nodes.items():
+    s = node.state()
+    if s is not None:
+      states[name] = s
+  return states
+
+def farm(spec, ntrials=1000, seed=None, workers=1, chunk=1000, batch=None):
+  """
+  Configure nodes using spec (a list of dictionaries), run ntrials
+  alert/reset pairs in chunks of chunk trials on workers processes,
+  merge the results and send a report.
+  batch:  if given, inject up to this many trials in each alert
+          (see SimpleTrials.trials()).
+  Returns the DAG which received the report.
+  """
+  from snewpdag.dag import Node
+  from snewpdag.dag.app import configure, inject
+  if seed == None:
+    seed = np.random.SeedSequence().entropy
+    logging.info('FarmTrials: seed {}'.format(seed))
+  # for random numbers drawn while configuring (as in SimpleTrials)
+  Node.rng = np.random.default_rng(np.random.SeedSequence(seed))
+
+  nodes = configure(spec)
+  if nodes == None:
+    logging.error('Invalid configuration specified')
+    return
+
+  chunks = [ (k, i, min(chunk, ntrials - i))
+             for k, i in enumerate(range(0, ntrials, chunk)) ]
+  if workers <= 1 or len(chunks) <= 1:
+    init_worker(spec, seed, batch)
+    results = map(lambda c: run_chunk(*c), chunks)
+    executor = None
+  else:
+    executor = ProcessPoolExecutor(workers,
+                 mp_context=multiprocessing.get_context('fork'),
+                 initializer=init_worker, initargs=(spec, seed, batch))
+    results = executor.map(run_chunk, *zip(*chunks))
+  try:
+    for states in results: # in chunk order
+      for name, s in states.items():
+        nodes[name].merge(s)
+  finally:
+    if executor != None:
+      executor.shutdown()
+
+  dags = { 0: nodes }
+  data = [ { 'action': 'report', 'burst_id': 0, 'name': 'Control' } ]
+  inject(dags, data, spec)
+  return nodes
+
+def run():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('config', help='configuration py/csv file')
+  parser.add_argument('-n', '--number', type=int, default=1000,
+                      help='number of trials')
+  parser.add_argument('--seed', type=int, help='random number seed')
+  parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                      help='number of worker processes (default all cores)')
+  parser.add_argument('--chunk', type=int, default=1000,
+                      help='number of trials per task (default 1000)')
+  parser.add_argument('--batch', type=int,
+                      help='number of trials per alert')
+  parser.add_argument('--log', help='logging level')
+  args = parser.parse_args()
+
+  if args.log:
+    logging.basicConfig(level=getattr(logging, args.log.upper()))
+  # app parses the command line when it's imported
+  sys.argv = [ sys.argv[0], args.config ]
+  from snewpdag.dag.app import csv_eval
+  with open(args.config, 'r') as f:
+    if os.path.splitext(args.config)[1] == '.csv':
+      spec = csv_eval(f)
+    else:
+      spec = ast.literal_eval(f.read())
+  farm(spec, args.number, args.seed, args.workers, args.chunk, args.batch)
+
+if __name__ == '__main__':
+  run()
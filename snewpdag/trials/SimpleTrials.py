@@ -26,36 +26,113 @@ Note that trial_id keeps track of which trial is being run.
 burst_id is always 0.  The reason for this is that a new burst_id
 would trigger inject() to create a new DAG from scratch.
 So we keep burst_id the same, but count using trial_id.
+
+With batch, each alert carries a batch of trials, and trial_id is
+a Batch of trial numbers.  Generators and accumulators which can
+handle batches (e.g., gen.Uniform, gen.GenPoint, gen.SmearTimes,
+gen.GenTimeDist, Histogram1D, Accumulator) then work on whole arrays
+of trials at a time, which is much faster than one trial per alert.
+Nodes which can't handle batches get the trials one by one (Node.split()),
+which keeps the trials together as long as no node joins the trials of
+two inputs which were split separately.  If one does, the trials are
+run one per alert instead (see batch_safe()).
+
+The random numbers of each alert come from a generator seeded with
+the seed and the (first) trial_id of the alert, so a trial gives the same
+result however the trials are split up (e.g., by FarmTrials).
 """
 import sys
+import logging
 import numpy as np
 from snewpdag.dag import Node
 from snewpdag.dag.app import configure, inject
+from snewpdag.values import Batch
 
-def trials(spec, ntrials=1000, seed=None):
+def trials(spec, ntrials=1000, seed=None, batch=None):
   """
   Configure nodes using spec (a list of dictionaries).
   Then run alert/reset pairs for as many times as given in ntrials,
   followed by a report action.
+  batch:  if given, inject up to this many trials in each alert
+          (see snewpdag/values/Batch.py).  Nodes which can't handle
+          a batch get the trials one by one.
+  Returns the DAG the trials ran in.
   """
   if seed == None:
-    Node.rng = np.random.default_rng()
-  else:
-    Node.rng = np.random.default_rng(seed)
+    seed = np.random.SeedSequence().entropy
+    logging.info('SimpleTrials: seed {}'.format(seed))
+  # for random numbers drawn while configuring
+  Node.rng = np.random.default_rng(np.random.SeedSequence(seed))
 
   nodes = configure(spec)
   if nodes == None:
     logging.error('Invalid configuration specified')
     return
 
-  i = 0
-  while i < ntrials:
-    data = [ { 'action': 'alert', 'burst_id': 0, 'trial_id': i,
-               'name': 'Control' },
-             { 'action': 'reset', 'burst_id': 0, 'trial_id': i,
-               'name': 'Control' } ]
-    inject(nodes, data, spec)
-    i += 1
+  dags = { 0: nodes }
+  run_trials(dags, spec, 0, ntrials, batch, seed)
   data = [ { 'action': 'report', 'burst_id': 0, 'name': 'Control' } ]
-  inject(nodes, data, spec)
+  inject(dags, data, spec)
+  return dags[0]
 
+def batch_safe(nodes, name='Control'):
+  """
+  True if batches injected at nodes[name] keep the trials together.
+  A node which can't handle batches splits them into trials, and the
+  nodes downstream of it get each trial in turn.  But a node joining
+  two inputs which split the batch separately would get all the trials
+  from one input before those of the other, and pair up the wrong trials.
+  """
+  reach = set()
+  todo = [ nodes[name] ]
+  while len(todo) > 0:
+    n = todo.pop()
+    if n not in reach:
+      reach.add(n)
+      todo.extend(n.observers)
+  out = {} # { node: 'batch', or node which split the batch, or None if mixed }
+  def emits(n):
+    if n not in out:
+      if n is nodes[name]:
+        ins = [ 'batch' ]
+      else:
+        ins = [ emits(p) for p in n.watch_list if p in reach ]
+      if len(set(ins)) != 1 or ins[0] is None:
+        out[n] = None
+      elif ins[0] == 'batch' and not n.batch:
+        out[n] = n if len(ins) == 1 else None
+      else:
+        out[n] = ins[0]
+    return out[n]
+  return all([ emits(n) is not None for n in reach ])
+
+def run_trials(dags, spec, first, ntrials, batch=None, seed=None):
+  """
+  Inject alert/reset pairs for trials first, ..., first + ntrials - 1.
+  Each alert's random numbers are seeded with seed and its first trial_id.
+  """
+  if batch and not all([ batch_safe(nodes) for nodes in dags.values() ]):
+    logging.warning('SimpleTrials: a node joins trials split separately, '
+                    'running one trial per alert')
+    batch = None
+  i = first
+  end = first + ntrials
+  while i < end:
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(i,)))
+    for nodes in dags.values():
+      for node in nodes.values():
+        node.rng = rng
+    if batch:
+      n = min(batch, end - i)
+      data = [ { 'action': 'alert', 'burst_id': 0, 'batch': n,
+                 'trial_id': Batch(np.arange(i, i + n)), 'name': 'Control' },
+               { 'action': 'reset', 'burst_id': 0, 'trial_id': i + n - 1,
+                 'name': 'Control' } ]
+    else:
+      n = 1
+      data = [ { 'action': 'alert', 'burst_id': 0, 'trial_id': i,
+                 'name': 'Control' },
+               { 'action': 'reset', 'burst_id': 0, 'trial_id': i,
+                 'name': 'Control' } ]
+    inject(dags, data, spec)
+    i += n
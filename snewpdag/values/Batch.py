@@ -0,0 +1,62 @@
+"""
+Batch - values of one field for a batch of MC trials
+
+A payload with data['batch'] = n carries n trials at once.  Fields which
+differ from trial to trial hold a Batch, a numpy array whose first axis
+is the trial (an object array for things like TimeSeries); fields which
+are the same for every trial hold ordinary values.  Arithmetic on
+a Batch gives a Batch, so most calculations work on a whole batch as
+they would on one trial.  Reductions (sum, mean, ...) over a whole Batch
+give ordinary numbers.
+
+Nodes which can handle a batch set batch = True.  Node.update() splits
+a batch into single trials for the others, with unbatch().
+A node joining inputs which were split separately wouldn't get the
+trials of its inputs together, so SimpleTrials doesn't batch the trials
+of such a DAG (see SimpleTrials.batch_safe()).
+"""
+import numpy as np
+from collections.abc import Mapping
+
+class Batch(np.ndarray):
+  def __new__(cls, values, dtype=None):
+    return np.asarray(values, dtype=dtype).view(cls)
+
+  @staticmethod
+  def of(factory, n):
+    """
+    Batch of n objects made by calling factory(), e.g., Batch.of(TimeSeries, n)
+    """
+    b = np.empty(n, dtype=object)
+    for i in range(n):
+      b[i] = factory()
+    return b.view(Batch)
+
+  def __array_wrap__(self, arr, context=None, *args):
+    if arr.ndim == 0:
+      return arr[()]
+    return super().__array_wrap__(arr, context, *args)
+
+def select(data, i):
+  """
+  Copy of dictionary data, with each Batch replaced by its i-th element.
+  """
+  d = {}
+  for k, v in data.items():
+    if isinstance(v, Batch):
+      x = v[i]
+      d[k] = np.asarray(x) if isinstance(x, np.ndarray) else x
+    elif isinstance(v, Mapping):
+      d[k] = select(v, i)
+    else:
+      d[k] = v
+  return d
+
+def unbatch(data):
+  """
+  Split a batch payload into a list of payloads, one per trial.
+  """
+  ps = [ select(data, i) for i in range(data['batch']) ]
+  for p in ps:
+    del p['batch']
+  return ps
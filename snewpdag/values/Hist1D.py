@@ -1,6 +1,23 @@
 """
 Hist1D - a 1D histogram value with evenly-spaced bins
+
+fill() takes a scalar or an array of values, binned all at once with
+np.bincount.  Non-finite values are skipped.  Besides the bins, it keeps
+  count:  number (or total weight) of values filled, including
+          underflow and overflow
+  sum, sum2, sum3:  sums of x, x^2, x^3, compensated (Neumaier/Kahan)
+                    so rounding errors don't build up over many fills
+  mu, m2, m3:  running mean and sums of 2nd and 3rd powers of
+               deviations from it, updated per fill with the pairwise
+               (Welford/Chan) formulas, from which mean(), variance()
+               and skewness() are calculated without the cancellation
+               of sum2/count - mean^2.
+merge() adds another histogram with the same binning, e.g., one filled
+in another process, as if its values had been filled here.
 """
+import sys
+import math
+import numbers
 import logging
 import numpy as np
 
@@ -19,7 +36,12 @@ class Hist1D:
     self.sum = 0.0
     self.sum2 = 0.0
     self.sum3 = 0.0
+    self.raw = [ 0.0, 0.0, 0.0 ] # uncompensated sum, sum2, sum3
+    self.comp = [ 0.0, 0.0, 0.0 ] # their compensation
     self.count = 0
+    self.mu = 0.0
+    self.m2 = 0.0
+    self.m3 = 0.0
 
   def copy(self):
     h = Hist1D(self.nbins, self.xlow, self.xhigh)
@@ -29,7 +51,12 @@ class Hist1D:
     h.sum = self.sum
     h.sum2 = self.sum2
     h.sum3 = self.sum3
+    h.raw = list(self.raw)
+    h.comp = list(self.comp)
     h.count = self.count
+    h.mu = self.mu
+    h.m2 = self.m2
+    h.m3 = self.m3
     return h
 
   def is_compatible(self, other):
@@ -52,6 +79,7 @@ class Hist1D:
           'overflow': self.overflow,
           'bins': self.bins.copy()
         }
+    return d
 
   def bin_index(self, x):
     """
@@ -61,7 +89,7 @@ class Hist1D:
     and overflow is a number >= nbins
     """
     try:
-      return np.int(self.nbins * (x - self.xlow) / self.xwidth)
+      return int(np.floor(self.nbins * (x - self.xlow) / self.xwidth))
     except:
       logging.info('Hist1D.bin: index calc error {}'.format(sys.exc_info()))
       return None
@@ -76,23 +104,98 @@ class Hist1D:
   def fill(self, x, weight=1.0):
     """
     fill histogram.  x can be a scalar or an array of fill values.
+    Returns the number of (finite) values filled.
     """
-    v = np.array(x)
+    if isinstance(x, numbers.Real):
+      return self.fill_one(float(x), weight)
     try:
-      ix = self.nbins * (v - self.xlow) / self.xwidth
+      v = np.asarray(x, dtype=np.float64).ravel()
+      v = v[np.isfinite(v)]
+      ix = np.floor(self.nbins * (v - self.xlow) / self.xwidth)
     except:
       logging.info('Hist1D: index calculation error {}'.format(sys.exc_info()))
-      return
-    h, bin_edges = np.histogram(ix, bins=self.nbins, range=(0, self.nbins))
-    self.bins += h
-    self.underflow += weight * np.sum(ix < 0)
-    self.overflow += weight * np.sum(ix >= self.nbins)
-    self.sum += np.sum(v)
+      return 0
+    if len(v) == 0:
+      return 0
+    under = ix < 0
+    over = ix >= self.nbins
+    inside = ~(under | over)
+    self.bins += weight * np.bincount(ix[inside].astype(np.intp),
+                                      minlength=self.nbins)
+    self.underflow += weight * np.count_nonzero(under)
+    self.overflow += weight * np.count_nonzero(over)
     v2 = v * v
-    v3 = v * v2
-    self.sum2 += np.sum(v2)
-    self.sum3 += np.sum(v3)
-    self.count += weight * v.size
+    self.add_sums([ weight * np.sum(v), weight * np.sum(v2),
+                    weight * np.sum(v * v2) ])
+    mu = np.mean(v)
+    d = v - mu
+    d2 = d * d
+    n = len(v) if weight == 1.0 else weight * len(v)
+    self.add_moments(n, mu,
+                     weight * np.sum(d2), weight * np.sum(d * d2))
+    return len(v)
+
+  def fill_one(self, x, weight=1.0):
+    """
+    fill with a single value, without the overhead of numpy arrays.
+    """
+    if not math.isfinite(x):
+      return 0
+    ix = math.floor(self.nbins * (x - self.xlow) / self.xwidth)
+    if ix < 0:
+      self.underflow += weight
+    elif ix >= self.nbins:
+      self.overflow += weight
+    else:
+      self.bins[ix] += weight
+    x2 = x * x
+    self.add_sums([ weight * x, weight * x2, weight * x * x2 ])
+    self.add_moments(1 if weight == 1.0 else weight, x, 0.0, 0.0)
+    return 1
+
+  def add_sums(self, s):
+    """
+    Add s = [ sum, sum2, sum3 ] to the running sums, with Neumaier's
+    compensated summation.
+    """
+    for i in range(3):
+      a = self.raw[i]
+      b = float(s[i])
+      t = a + b
+      self.comp[i] += (a - t) + b if abs(a) >= abs(b) else (b - t) + a
+      self.raw[i] = t
+    self.sum = self.raw[0] + self.comp[0]
+    self.sum2 = self.raw[1] + self.comp[1]
+    self.sum3 = self.raw[2] + self.comp[2]
+
+  def add_moments(self, n, mu, m2, m3):
+    """
+    Combine the running moments with those of another set of n values
+    (mean mu, sums of squared and cubed deviations m2 and m3).
+    """
+    na = self.count
+    nt = na + n
+    if nt == 0:
+      return
+    delta = mu - self.mu
+    self.m3 += m3 + delta**3 * na * n * (na - n) / (nt * nt) + \
+               3.0 * delta * (na * m2 - n * self.m2) / nt
+    self.m2 += m2 + delta * delta * na * n / nt
+    self.mu += delta * n / nt
+    self.count = nt
+
+  def merge(self, other):
+    """
+    Add the contents of another compatible histogram to this one.
+    """
+    if not self.is_compatible(other):
+      logging.warning('Hist1D.merge: incompatible histograms')
+      return
+    self.bins += other.bins
+    self.underflow += other.underflow
+    self.overflow += other.overflow
+    self.add_sums([ other.sum, other.sum2, other.sum3 ])
+    self.add_moments(other.count, other.mu, other.m2, other.m3)
 
   def add(self, x, weight=1.0):
     """
@@ -123,28 +226,17 @@ class Hist1D:
     return np.argmax(self.bins)
 
   def mean(self):
-    return 0.0 if self.count == 0 else self.sum / self.count
+    return 0.0 if self.count == 0 else self.mu
 
   def variance(self):
-    if self.count == 0:
-      return 0.0
-    else:
-      x = self.mean()
-      xx = self.sum2 / self.count
-      return xx - x*x
+    return 0.0 if self.count == 0 else self.m2 / self.count
 
   def skewness(self):
     """
     return skewness (unnormalized).
     To get normalized skewness, divide by variance^1.5
     """
-    if self.count == 0:
-      return 0.0
-    else:
-      x = self.mean()
-      v = self.variance()
-      xx = self.sum3 / self.count - 3.0*x*v
-      return xx - x*x*x
+    return 0.0 if self.count == 0 else self.m3 / self.count
 
   def histogram(self, nbins, xlow=None, xhigh=None):
     """
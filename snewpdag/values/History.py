@@ -1,27 +1,44 @@
 """
 History - a history object. Mostly for defining operations.
+
+Items are kept in a persistent linked list, (item, previous), so that
+copy() shares the list rather than copying it, and append() only
+creates a new head.  A copy and the original can be appended to
+independently.
 """
 import logging
 
 class History:
   def __init__(self, val = []):
-    self.val = list(val)
+    self.head = None # (last item, rest of list)
+    for item in val:
+      self.head = (item, self.head)
+
+  @property
+  def val(self):
+    v = []
+    h = self.head
+    while h != None:
+      v.append(h[0])
+      h = h[1]
+    v.reverse()
+    return v
 
   def copy(self):
     o = History()
-    o.val = self.val.copy()
+    o.head = self.head
     return o
 
   def clear(self):
-    self.val = []
+    self.head = None
 
   # append a string to the history
   def append(self, item):
-    self.val.append(item)
+    self.head = (item, self.head)
 
   # replace history with a single item which is a list of History objects
   def combine(self, hists):
-    self.val = [ tuple( h.emit() for h in hists ) ]
+    self.head = (tuple( h.emit() for h in hists ), None)
 
   # emit as a tuple
   def emit(self):
@@ -29,8 +46,8 @@ class History:
     return t
 
   def last(self):
-    if len(self.val) > 0:
-      return self.val[-1]
+    if self.head != None:
+      return self.head[0]
     else:
       return None
 
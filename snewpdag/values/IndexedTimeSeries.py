@@ -0,0 +1,121 @@
+"""
+IndexedTimeSeries - a series of events, kept sorted
+
+Same interface as TimeSeries, but times are always in increasing order,
+so first()/last() are O(1) and integral() and histogram() over a fixed
+range use binary search instead of scanning the whole series.
+Times are kept in a buffer which doubles in size when full, so adding
+events in time order is amortized O(1) per event.  Events which arrive
+out of order are merged into place.
+"""
+import logging
+import numpy as np
+
+from .TimeSeries import TimeSeries
+
+class IndexedTimeSeries(TimeSeries):
+  def __init__(self, start=None, stop=None, capacity=16):
+    """
+    start:  start time (float), or None if no minimum time
+    stop:  stop time (float), or None if no maximum time
+    capacity:  initial size of the buffer
+    """
+    self.buffer = np.empty(max(1, capacity), dtype=np.float64)
+    self.n = 0
+    super().__init__(start, stop)
+
+  @property
+  def times(self):
+    """
+    Sorted times (a view of the buffer; don't modify it in place).
+    """
+    return self.buffer[:self.n]
+
+  @times.setter
+  def times(self, times):
+    ts = np.sort(np.asarray(times, dtype=np.float64).ravel())
+    self.buffer = np.empty(max(len(self.buffer), len(ts)), dtype=np.float64)
+    self.buffer[:len(ts)] = ts
+    self.n = len(ts)
+
+  def sort(self):
+    """
+    Times are already sorted.
+    """
+    pass
+
+  def add(self, times):
+    """
+    Add times to series.
+    times:  an array of timestamps, assumed to be seconds unless
+            it's an array of Quantity, in which case convert to seconds.
+    """
+    ts = np.sort(np.atleast_1d(np.asarray(self.select(times),
+                                          dtype=np.float64)))
+    if len(ts) == 0:
+      return
+    if self.n > 0 and ts[0] < self.buffer[self.n - 1]:
+      # out of order, so merge
+      i = np.searchsorted(self.times, ts, side='right')
+      self.times = np.insert(self.times, i, ts)
+      return
+    n = self.n + len(ts)
+    if n > len(self.buffer):
+      size = len(self.buffer)
+      while size < n:
+        size *= 2
+      buf = np.empty(size, dtype=np.float64)
+      buf[:self.n] = self.buffer[:self.n]
+      self.buffer = buf
+    self.buffer[self.n:n] = ts
+    self.n = n
+
+  def first(self):
+    """
+    Earliest time in the series, or None if it's empty.
+    """
+    return self.buffer[0] if self.n > 0 else None
+
+  def last(self):
+    """
+    Latest time in the series, or None if it's empty.
+    """
+    return self.buffer[self.n - 1] if self.n > 0 else None
+
+  min = first
+  max = last
+
+  def index(self, start=None, stop=None):
+    """
+    Index range [i0, i1) of times with start <= t < stop.
+    """
+    i0 = 0 if start == None else np.searchsorted(self.times, start, 'left')
+    i1 = self.n if stop == None else np.searchsorted(self.times, stop, 'left')
+    return i0, max(i0, i1)
+
+  def histogram(self, nbins, start=None, stop=None):
+    """
+    Make a histogram out of the time series.
+    """
+    t0 = self.start if start == None else start
+    t1 = self.stop if stop == None else stop
+    if t0 == None or t1 == None:
+      # range from the data, as in TimeSeries
+      i0, i1 = self.index(t0, t1)
+      return np.histogram(self.times[i0:i1], bins=nbins)
+    edges = np.linspace(t0, t1, nbins + 1)
+    # bins include their lower edge, and the last bin its upper edge
+    n = np.searchsorted(self.times, edges, 'left')
+    n[-1] = np.searchsorted(self.times, edges[-1], 'right')
+    return np.diff(n), edges
+
+  def integral(self, start=None, stop=None):
+    """
+    Count the events between the start and stop times.
+    By default this returns the total number of events.
+    """
+    t0 = self.start if start == None else start
+    t1 = self.stop if stop == None else stop
+    i0, i1 = self.index(t0, t1)
+    return i1 - i0
+
@@ -0,0 +1,155 @@
+"""
+Payload - a copy-on-write dictionary for data passed between nodes
+
+Each node works on its own copy of the payload, but most nodes only
+read it, or add a field or two.  So rather than copying every field
+at every hop, a Payload keeps its own changes in a small dictionary
+on top of a chain of layers shared with the payloads it was copied from.
+copy() only copies the changes; once there are more than max_top of
+them, they become a new (never modified) layer shared by the copy and
+the original.  Either one can be modified afterwards without the other
+seeing it.  The chain is flattened into a single layer when it gets
+deep, so lookups stay fast.
+
+Copying a small dict is cheaper than the bookkeeping, so Payload.of()
+only switches to a Payload for dicts of more than min_fields fields.
+
+A Payload can be read and written like a dict.  dict(payload) gives
+an ordinary dictionary.  (Values themselves are not copied, as with
+dict.copy(), so mutable values like lists shouldn't be modified in place.)
+"""
+import logging
+from collections.abc import MutableMapping
+
+class Deleted:
+  """
+  Marks a field deleted in a layer above one which has it.
+  """
+  def __repr__(self):
+    return 'DELETED'
+
+DELETED = Deleted()
+
+class Payload(MutableMapping):
+
+  max_top = 8 # share changes as a layer when there are more than this
+  max_depth = 8 # flatten chains of more layers than this
+  min_fields = 64 # smaller dicts are just copied by of()
+
+  __slots__ = ('top', 'layers')
+
+  def __init__(self, data=None):
+    """
+    data:  dictionary (or Payload) of initial contents, which is copied
+    """
+    self.top = {} # changes since the last copy
+    self.layers = None # (dict, next layer, depth) - never modified
+    if data != None:
+      if isinstance(data, Payload):
+        self.layers = data.share()
+      else:
+        self.top.update(data)
+
+  @staticmethod
+  def of(data):
+    """
+    Shallow copy of a dict or Payload, as a Payload if it's large.
+    """
+    if isinstance(data, Payload):
+      return data.copy()
+    if len(data) > Payload.min_fields:
+      return Payload(data)
+    return data.copy()
+
+  def share(self):
+    """
+    Move changes into a new shared layer, and return the chain.
+    """
+    if len(self.top) > 0:
+      depth = 1 if self.layers == None else self.layers[2] + 1
+      if depth > Payload.max_depth:
+        self.layers = (self.flat(), None, 1)
+      else:
+        self.layers = (self.top, self.layers, depth)
+      self.top = {}
+    return self.layers
+
+  def copy(self):
+    p = Payload()
+    if len(self.top) > Payload.max_top:
+      p.layers = self.share()
+    else:
+      p.top = self.top.copy()
+      p.layers = self.layers
+    return p
+
+  def flat(self):
+    """
+    Return contents as a new dict.
+    """
+    chain = []
+    layer = self.layers
+    while layer != None:
+      chain.append(layer[0])
+      layer = layer[1]
+    d = {}
+    for layer in reversed(chain):
+      d.update(layer)
+    d.update(self.top)
+    return { k: v for k, v in d.items() if v is not DELETED }
+
+  def __getitem__(self, key):
+    top = self.top
+    if key in top:
+      v = top[key]
+    else:
+      layer = self.layers
+      while layer != None:
+        if key in layer[0]:
+          v = layer[0][key]
+          break
+        layer = layer[1]
+      else:
+        raise KeyError(key)
+    if v is DELETED:
+      raise KeyError(key)
+    return v
+
+  def __contains__(self, key):
+    if key in self.top:
+      return self.top[key] is not DELETED
+    layer = self.layers
+    while layer != None:
+      if key in layer[0]:
+        return layer[0][key] is not DELETED
+      layer = layer[1]
+    return False
+
+  def __setitem__(self, key, value):
+    self.top[key] = value
+
+  def __delitem__(self, key):
+    if key not in self:
+      raise KeyError(key)
+    if self.layers == None:
+      del self.top[key]
+    else:
+      self.top[key] = DELETED
+
+  def __iter__(self):
+    return iter(self.flat())
+
+  def __len__(self):
+    return len(self.flat())
+
+  def __eq__(self, other):
+    if isinstance(other, (Payload, dict)):
+      return self.flat() == dict(other)
+    return NotImplemented
+
+  def __reduce__(self):
+    return (Payload, (self.flat(),))
+
+  def __repr__(self):
+    return 'Payload({})'.format(self.flat())
+
@@ -29,20 +29,43 @@ class TimeSeries:
     """
     self.times.sort()
 
-  def add(self, times):
+  def select(self, times):
     """
-    Add times to series.
+    Return the times which fall between start and stop.
     times:  an array of timestamps, assumed to be seconds unless
             it's an array of Quantity, in which case convert to seconds.
     """
     ts = times.to(u.s).value if hasattr(times, 'unit') else times
     if self.start == self.stop: # also includes both being None
-      self.times = np.append(self.times, ts)
-    else:
-      m = np.full_like(ts, True) if self.start == None else (ts >= self.start)
-      if self.stop != None:
-        m &= (ts < self.stop)
-      self.times = np.append(self.times, ts[m])
+      return ts
+    ts = np.asarray(ts)
+    m = np.full(ts.shape, True) if self.start == None else (ts >= self.start)
+    if self.stop != None:
+      m &= (ts < self.stop)
+    return ts[m]
+
+  def add(self, times):
+    """
+    Add times to series.
+    times:  an array of timestamps, assumed to be seconds unless
+            it's an array of Quantity, in which case convert to seconds.
+    """
+    self.times = np.append(self.times, self.select(times))
+
+  def first(self):
+    """
+    Earliest time in the series, or None if it's empty.
+    """
+    return np.min(self.times) if len(self.times) > 0 else None
+
+  def last(self):
+    """
+    Latest time in the series, or None if it's empty.
+    """
+    return np.max(self.times) if len(self.times) > 0 else None
+
+  min = first
+  max = last
 
   def histogram(self, nbins, start=None, stop=None):
     """
@@ -73,7 +96,7 @@ class TimeSeries:
     t1 = self.stop if stop == None else stop
     if t0 == None:
       if t1 == None: # no limits
-        return np.times.size
+        return self.times.size
       else: # only upper limit
         return np.sum(self.times < t1)
     else:
@@ -1,7 +1,15 @@
+"""
+Value objects, each imported on first use
+(see snewpdag.dag.lib.lazy_import)
+"""
+from snewpdag.dag.lib import lazy_import
 
-from .History import History
-from .Hist1D import Hist1D
-from .LMap import LMap
+__all__ = [
+  'History', 'Hist1D', 'LMap', 'Payload', 'Batch',
 
-from .TimeSeries import TimeSeries
+  'TimeSeries',
 
+  'IndexedTimeSeries',
+]
+
+__getattr__, __dir__ = lazy_import(__name__, __all__)